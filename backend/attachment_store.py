@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import urllib.parse
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from sqlalchemy import text
+
+# Attachment bytes. Uploads are streamed from the request body to a staging file in
+# ATTACHMENT_CHUNK_SIZE pieces (writes and hashing happen in a thread, so neither the event
+# loop nor worker memory sees more than one chunk), then moved into the backend under a
+# content-addressed key, <tenant_id>/<sha[:2]>/<sha256>. Identical scans within a tenant are
+# stored once; every upload still gets its own Attachment row. Blobs are never shared across
+# tenants, so a tenant purge can drop the whole <tenant_id>/ prefix.
+#   ATTACHMENT_BACKEND         "local" (default) or "s3" (any S3-compatible store, e.g. MinIO)
+#   ATTACHMENT_DIR             local blob root; staging files live in <root>/.staging
+#   ATTACHMENT_MAX_BYTES       largest accepted upload (413 above)
+#   ATTACHMENT_ACCEL_REDIRECT  local only: internal nginx location mapped to ATTACHMENT_DIR.
+#                              Downloads then answer with X-Accel-Redirect and nginx serves
+#                              the file (sendfile, Range) without the worker touching the bytes.
+#   ATTACHMENT_S3_BUCKET / ATTACHMENT_S3_ENDPOINT / ATTACHMENT_S3_URL_TTL
+#                              s3 only: downloads redirect to a presigned URL, the store
+#                              serves Range / ETag itself. Needs boto3.
+
+ATTACHMENT_BACKEND = os.getenv("ATTACHMENT_BACKEND", "local")
+ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", "attachment_store")
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(1024 * 1024 * 1024)))
+ATTACHMENT_CHUNK_SIZE = int(os.getenv("ATTACHMENT_CHUNK_SIZE", str(1024 * 1024)))
+ATTACHMENT_ACCEL_REDIRECT = os.getenv("ATTACHMENT_ACCEL_REDIRECT")
+ATTACHMENT_S3_BUCKET = os.getenv("ATTACHMENT_S3_BUCKET", "attachments")
+ATTACHMENT_S3_ENDPOINT = os.getenv("ATTACHMENT_S3_ENDPOINT")
+ATTACHMENT_S3_URL_TTL = int(os.getenv("ATTACHMENT_S3_URL_TTL", "300"))
+
+# Blobs never change under a key, so clients may cache them for good
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+@dataclass
+class StagedUpload:
+    path: str
+    sha256: str
+    size: int
+
+
+def storage_key(tenant_id: str, sha256: str) -> str:
+    return f"{tenant_id}/{sha256[:2]}/{sha256}"
+
+
+def _content_disposition(file_name: str) -> str:
+    quoted = urllib.parse.quote(file_name or "attachment")
+    return f"inline; filename*=utf-8''{quoted}"
+
+
+# --- Backends ---
+
+class LocalBackend:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self._path(key))
+
+    async def put(self, staged_path: str, key: str):
+        def move():
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(staged_path, path)  # same filesystem as the staging dir: a rename
+        await asyncio.to_thread(move)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(_remove, self._path(key))
+
+    async def delete_prefix(self, prefix: str):
+        await asyncio.to_thread(shutil.rmtree, self._path(prefix), True)
+
+    def download(self, key: str, file_name: str, content_type: str, etag: str) -> Response:
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Content-Disposition": _content_disposition(file_name)}
+        if ATTACHMENT_ACCEL_REDIRECT:
+            headers["X-Accel-Redirect"] = f"{ATTACHMENT_ACCEL_REDIRECT.rstrip('/')}/{key}"
+            return Response(media_type=content_type, headers=headers)
+        # Starlette answers Range / If-Range itself and hands the path to the server
+        # (http.response.pathsend) when the server supports zero-copy sends
+        return FileResponse(self._path(key), media_type=content_type, headers=headers)
+
+
+class S3Backend:
+    def __init__(self, bucket: str, endpoint_url: str = None):
+        import boto3  # only needed for this backend
+
+        self.bucket = bucket
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    async def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    async def put(self, staged_path: str, key: str):
+        # upload_file streams from disk and switches to multipart for large files
+        try:
+            await asyncio.to_thread(self.client.upload_file, staged_path, self.bucket, key)
+        finally:
+            await asyncio.to_thread(_remove, staged_path)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    async def delete_prefix(self, prefix: str):
+        def delete_all():
+            paginator = self.client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{prefix}/"):
+                objects = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+                if objects:
+                    self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects})
+        await asyncio.to_thread(delete_all)
+
+    def download(self, key: str, file_name: str, content_type: str, etag: str) -> Response:
+        url = self.client.generate_presigned_url("get_object", ExpiresIn=ATTACHMENT_S3_URL_TTL, Params={
+            "Bucket": self.bucket, "Key": key,
+            "ResponseContentType": content_type,
+            "ResponseContentDisposition": _content_disposition(file_name),
+        })
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": "no-store"})
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if ATTACHMENT_BACKEND == "s3":
+            _backend = S3Backend(ATTACHMENT_S3_BUCKET, ATTACHMENT_S3_ENDPOINT)
+        else:
+            _backend = LocalBackend(ATTACHMENT_DIR)
+    return _backend
+
+
+# --- Upload / download ---
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_chunk(f, hasher, chunk: bytes):
+    f.write(chunk)
+    hasher.update(chunk)  # hashlib releases the GIL for large buffers
+
+
+async def stage_upload(chunks, content_length: int = None) -> StagedUpload:
+    """Stream an async iterator of byte chunks to a staging file, hashing as it goes."""
+    if content_length is not None and content_length > ATTACHMENT_MAX_BYTES:
+        raise HTTPException(413, f"Attachments are limited to {ATTACHMENT_MAX_BYTES} bytes")
+
+    staging_dir = os.path.join(ATTACHMENT_DIR, ".staging")
+    await asyncio.to_thread(os.makedirs, staging_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=staging_dir)
+    hasher, size, buffer = hashlib.sha256(), 0, bytearray()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > ATTACHMENT_MAX_BYTES:
+                    raise HTTPException(413, f"Attachments are limited to {ATTACHMENT_MAX_BYTES} bytes")
+                buffer += chunk
+                if len(buffer) >= ATTACHMENT_CHUNK_SIZE:
+                    await asyncio.to_thread(_write_chunk, f, hasher, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await asyncio.to_thread(_write_chunk, f, hasher, bytes(buffer))
+        if size == 0:
+            raise HTTPException(400, "Empty upload")
+    except BaseException:
+        await asyncio.to_thread(_remove, path)
+        raise
+    return StagedUpload(path=path, sha256=hasher.hexdigest(), size=size)
+
+
+async def save(tenant_id: str, staged: StagedUpload):
+    """Move a staged upload into the backend unless the tenant already has these bytes.
+
+    Returns (key, created): `created` is False when the blob was already stored; the staged
+    copy is then kept (see ensure_stored) until the caller calls remove_staged.
+    """
+    key = storage_key(tenant_id, staged.sha256)
+    backend = get_backend()
+    if await backend.exists(key):
+        return key, False
+    await backend.put(staged.path, key)
+    return key, True
+
+
+# Blobs are shared by identical uploads, so "is any row using this blob" and "delete it" must
+# not interleave with another upload committing a row for it. Both sides hold a transaction
+# advisory lock on the key: the failed upload while it checks and deletes, the succeeding
+# one from re-checking that its blob exists until its row commits.
+
+async def lock_blob(db, key: str):
+    """Lock `key` until the end of db's current transaction."""
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": key})
+
+
+async def ensure_stored(key: str, staged: StagedUpload) -> bool:
+    """Under lock_blob: store the staged copy again if the blob was discarded since save().
+    Returns True if it had to (the caller now owns the blob, as if save() had created it)."""
+    backend = get_backend()
+    if await backend.exists(key):
+        return False
+    await backend.put(staged.path, key)
+    return True
+
+
+async def remove_staged(staged: StagedUpload):
+    await asyncio.to_thread(_remove, staged.path)
+
+
+async def discard(key: str):
+    """Under lock_blob, once no Attachment row uses it: delete a blob this upload created."""
+    await get_backend().delete(key)
+
+
+def download(attachment, if_none_match: str = None) -> Response:
+    etag = f'"{attachment.sha256}"'
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    content_type = attachment.content_type or "application/octet-stream"
+    return get_backend().download(attachment.storage_key, attachment.file_name, content_type, etag)
+
+
+async def delete_tenant(tenant_id: str):
+    await get_backend().delete_prefix(tenant_id)
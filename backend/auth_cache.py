@@ -0,0 +1,70 @@
+import os
+import time
+
+# In-process cache of authenticated principals, keyed by token subject (username).
+# Saves the User lookup + Tenant lookup that every protected endpoint used to pay.
+# Entries expire after PRINCIPAL_CACHE_TTL seconds so other workers' writes are picked up,
+# and the user/tenant management endpoints invalidate explicitly for their own worker.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+
+
+class Principal:
+    """Detached snapshot of the logged-in user and the tenant flags handlers need."""
+    __slots__ = ("id", "username", "tenant_id", "roles", "is_active", "is_super_admin")
+
+    def __init__(self, id, username, tenant_id, roles, is_active, is_super_admin):
+        self.id = id
+        self.username = username
+        self.tenant_id = tenant_id
+        self.roles = list(roles or [])
+        self.is_active = bool(is_active)
+        self.is_super_admin = bool(is_super_admin)
+
+
+_cache = {}  # username -> (expires_at, Principal)
+
+
+def get_principal(username: str):
+    entry = _cache.get(username)
+    if entry is None:
+        return None
+    expires_at, principal = entry
+    if expires_at < time.monotonic():
+        _cache.pop(username, None)
+        return None
+    return principal
+
+
+def put_principal(principal: Principal):
+    if PRINCIPAL_CACHE_TTL <= 0:
+        return
+    if len(_cache) >= PRINCIPAL_CACHE_MAX_ENTRIES:
+        _evict()
+    _cache[principal.username] = (time.monotonic() + PRINCIPAL_CACHE_TTL, principal)
+
+
+def invalidate_user(username: str):
+    _cache.pop(username, None)
+
+
+def invalidate_tenant(tenant_id: str):
+    for username, (_, principal) in list(_cache.items()):
+        if principal.tenant_id == tenant_id:
+            _cache.pop(username, None)
+
+
+def clear():
+    _cache.clear()
+
+
+def _evict():
+    # 1. Drop everything that has already expired
+    now = time.monotonic()
+    for username, (expires_at, _) in list(_cache.items()):
+        if expires_at < now:
+            _cache.pop(username, None)
+    # 2. Still full: drop the oldest inserts (dicts keep insertion order)
+    overflow = len(_cache) - PRINCIPAL_CACHE_MAX_ENTRIES + 1
+    for username in list(_cache)[:max(overflow, 0)]:
+        _cache.pop(username, None)
@@ -0,0 +1,111 @@
+"""
+Bulk import throughput: COPY pipeline vs. one ORM insert + commit per row (what looping
+over POST /patients does).
+
+Requires a local Postgres (DATABASE_URL). From backend/:
+    python -m benchmarks.bench_bulk_import --rows 100000 --baseline-rows 2000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import delete, select, text
+
+from database import SessionLocal, engine
+from import_service import import_stream, iter_rows
+from models import Tenant, Patient, ClinicalRecord
+
+TENANT_ID = "bench-import"
+
+
+def write_patients_csv(path, rows):
+    rng = random.Random(7)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "mobile", "gender", "dob", "blood_group", "allergies"])
+        for i in range(rows):
+            writer.writerow([
+                f"Patient {i}", f"9{i:09d}", rng.choice(["Male", "Female"]),
+                f"{rng.randint(1940, 2020)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                rng.choice(["A+", "B+", "O+", "AB-", ""]), rng.choice(["", "Penicillin", "Penicillin;Sulfa"]),
+            ])
+
+
+def write_records_ndjson(path, mrns, per_patient):
+    rng = random.Random(11)
+    with open(path, "w") as f:
+        for mrn in mrns:
+            for _ in range(per_patient):
+                f.write(json.dumps({
+                    "mrn": mrn, "type": "Vitals", "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T09:00:00",
+                    "data": {"bp": f"{rng.randint(100, 150)}/{rng.randint(60, 95)}", "hr": rng.randint(55, 110)},
+                }) + "\n")
+
+
+async def reset_tenant():
+    async with SessionLocal() as db:
+        # Each deleted patient's foreign-key check probes every clinical_records partition:
+        # ~1 min for 100k patients, over the app's statement_timeout
+        await db.execute(text("SET LOCAL statement_timeout = 0"))
+        await db.execute(delete(ClinicalRecord).where(ClinicalRecord.tenant_id == TENANT_ID))
+        await db.execute(delete(Patient).where(Patient.tenant_id == TENANT_ID))
+        if not await db.get(Tenant, TENANT_ID):
+            db.add(Tenant(id=TENANT_ID, name=TENANT_ID, domain=f"{TENANT_ID}.bench"))
+        await db.commit()
+
+
+async def baseline(rows):
+    started = time.perf_counter()
+    async with SessionLocal() as db:
+        for i in range(rows):
+            db.add(Patient(tenant_id=TENANT_ID, mrn=f"BL-{i:06d}", name=f"Baseline {i}", mobile=f"8{i:09d}", gender="Male", allergies=[]))
+            await db.commit()
+    elapsed = time.perf_counter() - started
+    return {"rows": rows, "seconds": round(elapsed, 3), "rows_per_second": round(rows / elapsed, 1)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--records-per-patient", type=int, default=5)
+    parser.add_argument("--baseline-rows", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    await reset_tenant()
+    report = {"baseline_orm_per_row": await baseline(args.baseline_rows)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        patients_csv = os.path.join(tmp, "patients.csv")
+        write_patients_csv(patients_csv, args.rows)
+        with open(patients_csv, "rb") as f:
+            patients = await import_stream("patients", TENANT_ID, iter_rows(f, "csv"), chunk_size=args.chunk_size)
+        patients.pop("errors")
+        report["copy_patients"] = patients
+
+        async with SessionLocal() as db:
+            res = await db.execute(select(Patient.mrn).where(Patient.tenant_id == TENANT_ID).limit(args.rows // 10 or 1))
+            mrns = list(res.scalars())
+        records_ndjson = os.path.join(tmp, "records.ndjson")
+        write_records_ndjson(records_ndjson, mrns, args.records_per_patient)
+        with open(records_ndjson, "rb") as f:
+            records = await import_stream("records", TENANT_ID, iter_rows(f, "ndjson"), chunk_size=args.chunk_size)
+        records.pop("errors")
+        report["copy_records"] = records
+
+    await reset_tenant()
+    await engine.dispose()
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
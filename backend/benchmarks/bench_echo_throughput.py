@@ -0,0 +1,105 @@
+"""
+Request throughput with SQL echo on vs off.
+
+Starts the API twice (DB_ECHO=1, then DB_ECHO=0) as a uvicorn subprocess on --port,
+hammers one endpoint with --concurrency clients for --duration seconds each, and
+reports requests/second and latency percentiles for both runs.  The server's stdout/stderr
+(where echo writes) go to --server-log, as they would to a log file in production.
+
+From backend/ (Postgres running, DATABASE_URL set as for the app):
+    python -m benchmarks.bench_echo_throughput --username admin --password admin
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import summarize
+
+
+async def wait_ready(client, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            await client.get("/docs")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("API did not start")
+
+
+async def worker(client, path, headers, deadline, samples, errors):
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        resp = await client.get(path, headers=headers)
+        samples.append(time.perf_counter() - t0)
+        if resp.status_code >= 400:
+            errors[resp.status_code] = errors.get(resp.status_code, 0) + 1
+
+
+async def run_load(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+        await wait_ready(client)
+        resp = await client.post("/token", data={"username": args.username, "password": args.password})
+        resp.raise_for_status()
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        # Warm-up: fill the pool, the principal cache and psycopg's prepared statements
+        warm_deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(*[worker(client, args.path, headers, warm_deadline, [], {}) for _ in range(args.concurrency)])
+
+        samples, errors = [], {}
+        t0 = time.perf_counter()
+        deadline = t0 + args.duration
+        await asyncio.gather(*[worker(client, args.path, headers, deadline, samples, errors) for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - t0
+    return {"requests_per_s": round(len(samples) / elapsed, 1), "latency": summarize(samples), "errors": errors}
+
+
+async def run_config(args, echo: bool, log):
+    env = dict(os.environ, DB_ECHO="1" if echo else "0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    try:
+        return await run_load(args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--path", default="/patients?limit=50", help="endpoint to load")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per configuration")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--server-log", default="bench_echo_server.log")
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = {"path": args.path, "concurrency": args.concurrency}
+    with open(args.server_log, "w") as log:
+        report["echo_on"] = await run_config(args, True, log)
+        report["echo_off"] = await run_config(args, False, log)
+    on, off = report["echo_on"]["requests_per_s"], report["echo_off"]["requests_per_s"]
+    report["speedup"] = round(off / on, 2) if on else None
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""
+Latency of an unrelated endpoint while a burst of logins is running.
+
+Start the API first, once per configuration you want to compare:
+    PASSWORD_HASH_WORKERS=0 uvicorn main:app --port 8000   # bcrypt inline on the event loop
+    uvicorn main:app --port 8000                            # bcrypt in the hashing pool
+
+Then from backend/:
+    python -m benchmarks.bench_login_latency --username admin --password admin
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.common import summarize
+
+
+async def login_loop(client, args, deadline, samples, statuses):
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        resp = await client.post("/token", data={"username": args.username, "password": args.password})
+        samples.append(time.perf_counter() - t0)
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+
+async def probe_loop(client, args, deadline, samples, headers):
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        await client.get(args.probe, headers=headers)
+        samples.append(time.perf_counter() - t0)
+        await asyncio.sleep(args.probe_interval)
+
+
+async def run_phase(client, args, logins: bool, headers):
+    deadline = time.perf_counter() + args.duration
+    probe_samples, login_samples, statuses = [], [], {}
+    tasks = [probe_loop(client, args, deadline, probe_samples, headers) for _ in range(args.probes)]
+    if logins:
+        tasks += [login_loop(client, args, deadline, login_samples, statuses) for _ in range(args.concurrency)]
+    await asyncio.gather(*tasks)
+    result = {"probe": summarize(probe_samples)}
+    if logins:
+        result["login"] = summarize(login_samples)
+        result["login_status_codes"] = statuses
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--probe", default="/users/me", help="unrelated endpoint to time")
+    parser.add_argument("--probes", type=int, default=4, help="concurrent probe loops")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent login loops")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per phase")
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency + args.probes + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        resp = await client.post("/token", data={"username": args.username, "password": args.password})
+        resp.raise_for_status()
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        report = {
+            "probe_endpoint": args.probe,
+            "login_concurrency": args.concurrency,
+            "idle": await run_phase(client, args, logins=False, headers=headers),
+            "under_login_load": await run_phase(client, args, logins=True, headers=headers),
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+"""
+Patient search: legacy ILIKE '%q%' scan vs. search_service on a large synthetic dataset.
+
+Requires a local Postgres (DATABASE_URL) migrated with `python migrate.py`. From backend/:
+    python -m benchmarks.bench_patient_search --seed            # 1M patients / 500 tenants, then run
+    python -m benchmarks.bench_patient_search                   # re-run against existing data
+    python -m benchmarks.bench_patient_search --cleanup         # drop the synthetic rows
+
+Tenants are skewed (a few very large clinics, a long tail of small ones); queries are
+issued against the largest tenant, which is the worst case for the legacy scan.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from sqlalchemy import select, or_, text
+
+from benchmarks.common import summarize
+from database import SessionLocal, engine
+from models import Patient
+from search_service import search_patients
+
+TENANT_PREFIX = "bench-search-"
+
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Sneha", "Arjun", "Kavya", "Rahul", "Meera",
+               "Sanjay", "Divya", "Amit", "Pooja", "Karan", "Neha", "Ravi", "Isha", "Suresh", "Lakshmi"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Nair", "Gupta", "Mehta", "Joshi", "Rao", "Kulkarni",
+              "Singh", "Das", "Menon", "Pillai", "Bose", "Chopra", "Verma", "Shetty", "Kapoor", "Desai"]
+
+
+async def seed(tenants: int, patients: int, chunk: int):
+    first = "ARRAY[" + ",".join(f"'{n}'" for n in FIRST_NAMES) + "]"
+    last = "ARRAY[" + ",".join(f"'{n}'" for n in LAST_NAMES) + "]"
+    async with engine.begin() as conn:
+        await conn.execute(text("""
+            INSERT INTO tenants (id, name, domain, created_at, is_super_admin)
+            SELECT :prefix || g, :prefix || g, :prefix || g || '.bench', now(), false
+            FROM generate_series(1, :n) g
+            ON CONFLICT DO NOTHING
+        """), {"prefix": TENANT_PREFIX, "n": tenants})
+
+    for start in range(0, patients, chunk):
+        stop = min(start + chunk, patients)
+        async with engine.begin() as conn:
+            # power(random(), 3) skews patients towards the first tenants
+            await conn.execute(text(f"""
+                INSERT INTO patients (id, tenant_id, mrn, name, gender, mobile, allergies, created_at)
+                SELECT
+                    'bench-p-' || g,
+                    :prefix || (1 + floor(:tenants * power(random(), 3)))::int,
+                    'PT-' || upper(substr(md5(g::text), 1, 6)),
+                    ({first})[1 + (g % {len(FIRST_NAMES)})] || ' ' || ({last})[1 + ((g / {len(FIRST_NAMES)}) % {len(LAST_NAMES)})] || ' ' || g,
+                    CASE WHEN g % 2 = 0 THEN 'Female' ELSE 'Male' END,
+                    '9' || lpad(g::text, 9, '0'),
+                    '[]'::jsonb,
+                    now() - (random() * interval '5 years')
+                FROM generate_series(:start, :stop - 1) g
+                ON CONFLICT DO NOTHING
+            """), {"prefix": TENANT_PREFIX, "tenants": tenants, "start": start, "stop": stop})
+        print(f"seeded {stop}/{patients} patients")
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE patients"))
+
+
+async def cleanup():
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM patients WHERE tenant_id LIKE :p"), {"p": TENANT_PREFIX + "%"})
+        await conn.execute(text("DELETE FROM tenants WHERE id LIKE :p"), {"p": TENANT_PREFIX + "%"})
+
+
+async def legacy_search(db, tenant_id, q, limit):
+    term = f"%{q}%"
+    res = await db.execute(
+        select(Patient).where(Patient.tenant_id == tenant_id)
+        .where(or_(Patient.name.ilike(term), Patient.mrn.ilike(term)))
+        .limit(limit)
+    )
+    return res.scalars().all()
+
+
+async def pick_terms(db, tenant_id, n):
+    res = await db.execute(
+        select(Patient.name, Patient.mrn, Patient.mobile)
+        .where(Patient.tenant_id == tenant_id).order_by(Patient.id).limit(2000)
+    )
+    rows = res.all()
+    rng = random.Random(42)
+    sample = [rng.choice(rows) for _ in range(n)]
+    return {
+        "name_prefix_2": [r.name[:2] for r in sample],
+        "name_substring": [r.name.split(" ")[1][1:5] for r in sample],
+        "full_name": [r.name for r in sample],
+        "mrn_exact": [r.mrn for r in sample],
+        "mobile_exact": [r.mobile for r in sample],
+    }
+
+
+async def run(iterations: int, limit: int):
+    async with SessionLocal() as db:
+        tenant_id = (await db.execute(text(
+            "SELECT tenant_id FROM patients WHERE tenant_id LIKE :p GROUP BY tenant_id ORDER BY count(*) DESC LIMIT 1"
+        ), {"p": TENANT_PREFIX + "%"})).scalar()
+        if tenant_id is None:
+            raise SystemExit("No synthetic data found, run with --seed first")
+        size = (await db.execute(text("SELECT count(*) FROM patients WHERE tenant_id = :t"), {"t": tenant_id})).scalar()
+        terms = await pick_terms(db, tenant_id, iterations)
+
+        modes = {
+            "legacy_ilike": lambda q: legacy_search(db, tenant_id, q, limit),
+            "search_service": lambda q: search_patients(db, tenant_id, q, limit=limit),
+            "typeahead": lambda q: search_patients(db, tenant_id, q, limit=10, typeahead=True),
+        }
+        report = {"tenant_id": tenant_id, "tenant_patients": size, "results": {}}
+        for kind, queries in terms.items():
+            report["results"][kind] = {}
+            for mode, fn in modes.items():
+                samples = []
+                for q in queries:
+                    t0 = time.perf_counter()
+                    await fn(q)
+                    samples.append(time.perf_counter() - t0)
+                report["results"][kind][mode] = summarize(samples)
+        return report
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true")
+    parser.add_argument("--cleanup", action="store_true")
+    parser.add_argument("--tenants", type=int, default=500)
+    parser.add_argument("--patients", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        await cleanup()
+        return
+    if args.seed:
+        await seed(args.tenants, args.patients, args.chunk)
+
+    report = await run(args.iterations, args.limit)
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
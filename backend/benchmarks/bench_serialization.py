@@ -0,0 +1,119 @@
+"""
+Response serialization for 1,000-row lists: before vs after explicit response models.
+
+    before  ORM instances (every column, incl. users.hashed_password) returned as-is:
+            jsonable_encoder walks each object, stdlib json renders
+    after   projected rows (only the response fields) with a response_model: FastAPI
+            validates and dumps them to JSON bytes in pydantic-core
+
+Both variants are served by a throwaway FastAPI app and requested in-process through
+httpx's ASGI transport, so the numbers cover FastAPI's full response path but no database
+or network. Needs no Postgres. From backend/:
+    python -m benchmarks.bench_serialization --rows 1000 --iterations 50
+"""
+import argparse
+import asyncio
+import collections
+import datetime
+import json
+import random
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.common import summarize
+from models import Patient, Appointment, User
+from main import PatientOut, AppointmentOut, UserOut
+
+
+def fake_patients(n, rng):
+    now = datetime.datetime.utcnow()
+    return [Patient(
+        id=str(uuid.uuid4()), tenant_id="bench-tenant", mrn=f"PT-{i:06d}", name=f"Patient {i}",
+        dob=datetime.date(1950, 1, 1) + datetime.timedelta(days=rng.randint(0, 25000)), gender=rng.choice(["Male", "Female"]),
+        mobile=f"9{i:09d}", blood_group="O+", allergies=rng.choice([[], ["Penicillin"]]),
+        address="12 MG Road, Bengaluru", created_at=now - datetime.timedelta(minutes=i),
+    ) for i in range(n)]
+
+
+def fake_appointments(n, rng):
+    start = datetime.datetime.utcnow()
+    return [Appointment(
+        id=str(uuid.uuid4()), tenant_id="bench-tenant", patient_id=str(uuid.uuid4()), doctor_id=str(uuid.uuid4()),
+        start_time=start + datetime.timedelta(minutes=30 * i), end_time=start + datetime.timedelta(minutes=30 * i + 30),
+        status="scheduled", reason="Consultation",
+    ) for i in range(n)]
+
+
+def fake_users(n, rng):
+    return [User(
+        id=str(uuid.uuid4()), tenant_id="bench-tenant", username=f"user{i}", hashed_password="$2b$12$" + "x" * 53,
+        roles=["doctor"], is_active=True, created_at=datetime.datetime.utcnow(),
+    ) for i in range(n)]
+
+
+def as_rows(objects, schema):
+    # What select(*columns_for(Model, Schema)) returns: named tuples of just those columns
+    Row = collections.namedtuple("Row", list(schema.model_fields))
+    return [Row(*(getattr(obj, name) for name in schema.model_fields)) for obj in objects]
+
+
+def build_apps(datasets):
+    before, after = FastAPI(), FastAPI()
+    for name, (objects, schema) in datasets.items():
+        rows = as_rows(objects, schema)
+        before.add_api_route(f"/{name}", lambda objects=objects: objects, methods=["GET"])
+        after.add_api_route(f"/{name}", lambda rows=rows: rows, methods=["GET"], response_model=list[schema])
+    return before, after
+
+
+async def measure(app, path, iterations):
+    samples, size = [], 0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.get(path)  # warm-up
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            resp = await client.get(path)
+            samples.append(time.perf_counter() - t0)
+            resp.raise_for_status()
+            size = len(resp.content)
+    return samples, size
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    datasets = {
+        "patients": (fake_patients(args.rows, rng), PatientOut),
+        "appointments": (fake_appointments(args.rows, rng), AppointmentOut),
+        "users": (fake_users(args.rows, rng), UserOut),
+    }
+    before, after = build_apps(datasets)
+
+    report = {"rows": args.rows, "iterations": args.iterations, "results": {}}
+    for name in datasets:
+        b_samples, b_size = await measure(before, f"/{name}", args.iterations)
+        a_samples, a_size = await measure(after, f"/{name}", args.iterations)
+        b, a = summarize(b_samples), summarize(a_samples)
+        report["results"][name] = {
+            "before": {**b, "bytes": b_size},
+            "after": {**a, "bytes": a_size},
+            "speedup_p50": round(b["p50_ms"] / a["p50_ms"], 2) if a["p50_ms"] else None,
+            "size_ratio": round(a_size / b_size, 2) if b_size else None,
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
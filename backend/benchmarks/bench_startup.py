@@ -0,0 +1,76 @@
+"""
+Worker startup schema step: Base.metadata.create_all (old) vs migrate.check_schema (new).
+
+Each sample is a fresh Python process with a cold engine, as on a worker boot or rolling
+restart: import the app's models, then time the schema step including the first
+connection. create_all issues a catalog lookup per table and index before deciding
+there is nothing to do; check_schema is a single SELECT on schema_migrations.
+
+From backend/ (Postgres running, migrated with `python migrate.py`, DATABASE_URL set):
+    python -m benchmarks.bench_startup --runs 20
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks.common import summarize
+
+STEPS = {
+    "create_all": """
+import asyncio, time
+from database import engine, Base
+import models
+async def step():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+""",
+    "check_schema": """
+import asyncio, time
+from database import engine
+import models, migrate
+async def step():
+    await migrate.check_schema()
+""",
+}
+
+TIMER = """
+from sqlalchemy import event
+statements = []
+event.listen(engine.sync_engine, "before_cursor_execute", lambda *a: statements.append(1))
+async def main():
+    t0 = time.perf_counter()
+    await step()
+    elapsed = time.perf_counter() - t0
+    await engine.dispose()
+    print(elapsed, len(statements))
+asyncio.run(main())
+"""
+
+
+def run_once(step: str):
+    out = subprocess.run([sys.executable, "-c", STEPS[step] + TIMER], capture_output=True, text=True, check=True)
+    elapsed, statements = out.stdout.split()[-2:]
+    return float(elapsed), int(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    report = {"runs": args.runs, "results": {}}
+    for step in STEPS:
+        run_once(step)  # warm the OS page cache / server catalog cache
+        samples, statements = [], 0
+        for _ in range(args.runs):
+            elapsed, statements = run_once(step)
+            samples.append(elapsed)
+        report["results"][step] = {**summarize(samples), "statements": statements}
+    before, after = report["results"]["create_all"], report["results"]["check_schema"]
+    report["speedup_p50"] = round(before["p50_ms"] / after["p50_ms"], 2) if after["p50_ms"] else None
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Read-replica routing check (read_routing.py) against a real primary + streaming replica.
+
+Verifies that read-only sessions land on the replica when it is healthy, that a user who
+just committed a write reads from the primary while other users stay on the replica, that
+the replica refuses writes, and (--lag, needs superuser on the replica) that paused replay
+sends reads back to the primary. If the replica is down, checks the primary fallback.
+
+Two local instances, e.g. a replica of the dev server on port 5433:
+    pg_basebackup -h 127.0.0.1 -U postgres -D /tmp/pgreplica -R -X stream
+    pg_ctl -D /tmp/pgreplica -o "-p 5433" -l /tmp/pgreplica.log start
+
+From backend/ (DATABASE_URL = primary):
+    DATABASE_REPLICA_URL=postgresql+psycopg://postgres@127.0.0.1:5433/hospital_db \\
+        python -m benchmarks.check_read_routing [--lag]
+"""
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import text
+
+import read_routing
+from database import engine, replica_engine, SessionLocal
+
+WRITER, READER = "routing-check-writer", "routing-check-reader"
+# A real row change (WAL is written) that leaves the data as it was
+TOUCH_SQL = text("UPDATE tenant_stats SET updated_at = updated_at WHERE tenant_id = (SELECT tenant_id FROM tenant_stats LIMIT 1)")
+
+failures = 0
+
+
+def expect(ok: bool, label: str, detail=""):
+    global failures
+    failures += not ok
+    print(f"{'✅' if ok else '❌'} {label:<52} {detail}")
+
+
+async def lands_on(user_id: str):
+    """(target, reason, server in recovery?) for a read session of user_id."""
+    target, reason = read_routing.route(user_id)
+    async with read_routing.session_factory_for(user_id)() as db:
+        in_recovery = await db.scalar(text("SELECT pg_is_in_recovery()"))
+    return target, reason, in_recovery
+
+
+async def write_as(user_id: str):
+    read_routing.set_user(user_id)
+    async with SessionLocal() as db:
+        await db.execute(TOUCH_SQL)
+        await db.commit()
+    read_routing.set_user(None)
+
+
+async def wait_for_lag(predicate, seconds: float):
+    for _ in range(int(seconds / 0.2)):
+        usable, lag = await read_routing.check_replica()
+        if usable and predicate(lag):
+            return lag
+        await asyncio.sleep(0.2)
+    return lag
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lag", action="store_true", help="pause WAL replay on the replica to check lag routing")
+    args = parser.parse_args()
+
+    if replica_engine is None:
+        print("❌ DATABASE_REPLICA_URL is not set")
+        sys.exit(1)
+
+    try:
+        print(f"🚀 Read routing check (max lag {read_routing.DB_REPLICA_MAX_LAG}s, write window {read_routing.DB_READ_YOUR_WRITES_WINDOW}s)")
+        usable, lag = await read_routing.check_replica()
+        if not usable:
+            print("⚠️  Replica unreachable: checking the primary fallback only")
+            target, reason, in_recovery = await lands_on(READER)
+            expect(target == "primary" and not in_recovery, "reads fall back to the primary", reason)
+        else:
+            await replica_checks(args, lag)
+    finally:
+        await engine.dispose()
+        await replica_engine.dispose()
+
+    if failures:
+        print(f"{failures} check(s) failed")
+        sys.exit(1)
+
+
+async def replica_checks(args, lag):
+    expect(lag is not None and lag <= read_routing.DB_REPLICA_MAX_LAG, "replica probe", f"lag {lag}s")
+
+    target, reason, in_recovery = await lands_on(READER)
+    expect(target == "replica" and in_recovery, "reads go to the replica", f"{target}/{reason}")
+
+    print("🔹 Read-your-writes")
+    await write_as(WRITER)
+    target, reason, in_recovery = await lands_on(WRITER)
+    expect(target == "primary" and not in_recovery, "writer reads from the primary", f"{target}/{reason}")
+    target, reason, in_recovery = await lands_on(READER)
+    expect(target == "replica" and in_recovery, "other users stay on the replica", f"{target}/{reason}")
+
+    print("🔹 Replica is read-only")
+    try:
+        async with read_routing.ReplicaSessionLocal() as db:
+            await db.execute(TOUCH_SQL)
+        expect(False, "write through a replica session fails")
+    except Exception as exc:
+        expect(True, "write through a replica session fails", type(getattr(exc, "orig", exc)).__name__)
+
+    if args.lag:
+        print("🔹 Replica lag (replay paused)")
+        async with replica_engine.connect() as conn:
+            await conn.execute(text("SELECT pg_wal_replay_pause()"))
+        try:
+            await write_as(None)
+            lag = await wait_for_lag(lambda lag: lag is None or lag > read_routing.DB_REPLICA_MAX_LAG, read_routing.DB_REPLICA_MAX_LAG + 5)
+            target, reason, in_recovery = await lands_on(READER)
+            expect(target == "primary" and not in_recovery, "lagging replica: reads go to the primary", f"lag {lag}s, {reason}")
+        finally:
+            async with replica_engine.connect() as conn:
+                await conn.execute(text("SELECT pg_wal_replay_resume()"))
+        lag = await wait_for_lag(lambda lag: lag is not None and lag <= read_routing.DB_REPLICA_MAX_LAG, 10)
+        target, reason, _ = await lands_on(READER)
+        expect(target == "replica", "caught up: reads return to the replica", f"lag {lag}s, {reason}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
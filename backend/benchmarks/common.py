@@ -0,0 +1,23 @@
+"""Shared helpers for the benchmark scripts (run them with `python -m benchmarks.<name>` from backend/)."""
+
+# Written by seed_synthetic, read by load_test
+SYNTHETIC_MANIFEST = "benchmarks/synthetic_manifest.json"
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def summarize(samples):
+    """Latency samples in seconds -> count and p50/p95/p99/max in milliseconds."""
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2) if samples else 0.0,
+    }
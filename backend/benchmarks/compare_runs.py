@@ -0,0 +1,55 @@
+"""
+Compare two load_test result files (e.g. before/after a change).
+
+From backend/:
+    python -m benchmarks.compare_runs benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+import argparse
+import json
+
+
+def pct_change(old, new):
+    if not old:
+        return "   n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def compare(old, new, phase):
+    rows = []
+    for name, after in new.get(phase, {}).items():
+        before = old.get(phase, {}).get(name)
+        if before is None:
+            continue
+        rows.append((
+            name,
+            before["throughput_rps"], after["throughput_rps"], pct_change(before["throughput_rps"], after["throughput_rps"]),
+            before["latency"]["p95_ms"], after["latency"]["p95_ms"], pct_change(before["latency"]["p95_ms"], after["latency"]["p95_ms"]),
+            before["latency"]["p99_ms"], after["latency"]["p99_ms"], pct_change(before["latency"]["p99_ms"], after["latency"]["p99_ms"]),
+        ))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"{old['meta']['git_sha']} -> {new['meta']['git_sha']}")
+    for phase in ("isolated", "mixed"):
+        rows = compare(old, new, phase)
+        if not rows:
+            continue
+        print(f"\n[{phase}]")
+        print(f"{'scenario':<14}{'rps old':>9}{'rps new':>9}{'':>9}{'p95 old':>9}{'p95 new':>9}{'':>9}{'p99 old':>9}{'p99 new':>9}{'':>9}")
+        for row in rows:
+            print(f"{row[0]:<14}" + "".join(f"{v:>9}" for v in row[1:]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Load harness for the real API, on the synthetic dataset from benchmarks/seed_synthetic.py.
+
+Scenarios (each a single HTTP call, as the frontend issues them):
+    login         POST /token
+    search        GET  /patients?q=<name fragment>
+    profile       GET  /patients/{id}/profile
+    calendar      GET  /appointments?start_date=..&end_date=..   (one week)
+    prescription  POST /appointments/{id}/prescriptions           (the doctor's own future
+                                                                  appointments; each is used once,
+                                                                  re-seed before repeating a run)
+    dashboard     GET  /stats/overview
+
+Each scenario runs alone for --duration seconds with --concurrency virtual users spread
+over the clinics (weighted by clinic size), then a weighted mix of all of them runs for the
+same time. Throughput and p50/p95/p99 per scenario go to stdout and to a JSON file in
+--results-dir named <UTC time>-<git sha>.json, so runs can be compared across commits with
+`python -m benchmarks.compare_runs old.json new.json`.
+
+Start the API (uvicorn main:app --port 8000), then from backend/:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --scenarios search,profile --concurrency 64 --duration 60
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import subprocess
+import time
+
+import httpx
+
+from benchmarks.common import summarize, SYNTHETIC_MANIFEST
+
+SCENARIOS = ("login", "search", "profile", "calendar", "prescription", "dashboard")
+MIX_WEIGHTS = {"login": 2, "search": 30, "profile": 25, "calendar": 20, "prescription": 5, "dashboard": 18}
+
+
+class VirtualUser:
+    """One logged-in doctor plus the ids it can act on, discovered through the API."""
+
+    def __init__(self, username, password):
+        self.username, self.password = username, password
+        self.headers = {}
+        self.patients = []  # (id, name)
+        self.open_appointments = []
+
+    async def prepare(self, client, rng):
+        resp = await client.post("/token", data={"username": self.username, "password": self.password})
+        resp.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        resp = await client.get("/users/me", headers=self.headers)
+        resp.raise_for_status()
+        user_id = resp.json()["id"]
+
+        resp = await client.get("/patients", params={"limit": 200}, headers=self.headers)
+        resp.raise_for_status()
+        self.patients = [(p["id"], p["name"]) for p in resp.json()]
+
+        today = datetime.date.today()
+        resp = await client.get("/appointments", headers=self.headers, params={
+            "start_date": (today + datetime.timedelta(days=1)).isoformat(),
+            "end_date": (today + datetime.timedelta(days=60)).isoformat(),
+            "limit": 1000,
+        })
+        resp.raise_for_status()
+        # Only this doctor's own: other virtual users of the clinic see the same calendar
+        self.open_appointments = [a["id"] for a in resp.json() if a["status"] == "scheduled" and a["doctor_id"] == user_id]
+        rng.shuffle(self.open_appointments)
+
+
+# --- Scenarios: each returns the response ---
+
+async def login(client, vu, rng):
+    return await client.post("/token", data={"username": vu.username, "password": vu.password})
+
+
+async def search(client, vu, rng):
+    _, name = rng.choice(vu.patients)
+    first, _, last = name.partition(" ")
+    q = rng.choice([first[:3], last, name, last[:4]])
+    return await client.get("/patients", params={"q": q, "limit": 20}, headers=vu.headers)
+
+
+async def profile(client, vu, rng):
+    patient_id, _ = rng.choice(vu.patients)
+    return await client.get(f"/patients/{patient_id}/profile", headers=vu.headers)
+
+
+async def calendar(client, vu, rng):
+    start = datetime.date.today() + datetime.timedelta(days=rng.randint(-90, 21))
+    return await client.get("/appointments", headers=vu.headers, params={
+        "start_date": start.isoformat(), "end_date": (start + datetime.timedelta(days=7)).isoformat(),
+    })
+
+
+async def prescription(client, vu, rng):
+    if not vu.open_appointments:
+        return None  # this clinic ran out of unprescribed appointments
+    appointment_id = vu.open_appointments.pop()
+    return await client.post(f"/appointments/{appointment_id}/prescriptions", headers=vu.headers, json={
+        "medications": [{"drug": "Paracetamol", "dose": "500mg", "freq": "TDS", "duration": "3d"}],
+        "notes": "load test",
+    })
+
+
+async def dashboard(client, vu, rng):
+    return await client.get("/stats/overview", headers=vu.headers)
+
+
+SCENARIO_FNS = {fn.__name__: fn for fn in (login, search, profile, calendar, prescription, dashboard)}
+
+
+# --- Runner ---
+
+async def worker(client, vus, scenarios, weights, deadline, results, seed):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        name = rng.choices(scenarios, weights)[0]
+        vu = rng.choice(vus)
+        t0 = time.perf_counter()
+        try:
+            resp = await SCENARIO_FNS[name](client, vu, rng)
+        except httpx.HTTPError as exc:
+            results[name]["errors"][type(exc).__name__] = results[name]["errors"].get(type(exc).__name__, 0) + 1
+            continue
+        if resp is None:
+            results[name]["skipped"] += 1
+            continue
+        results[name]["samples"].append(time.perf_counter() - t0)
+        if resp.status_code >= 400:
+            code = str(resp.status_code)
+            results[name]["errors"][code] = results[name]["errors"].get(code, 0) + 1
+
+
+async def run_phase(client, vus, scenarios, weights, args, seed):
+    results = {name: {"samples": [], "errors": {}, "skipped": 0} for name in scenarios}
+    t0 = time.perf_counter()
+    deadline = t0 + args.duration
+    await asyncio.gather(*[
+        worker(client, vus, scenarios, weights, deadline, results, seed * 1000 + i) for i in range(args.concurrency)
+    ])
+    elapsed = time.perf_counter() - t0
+    report = {}
+    for name, r in results.items():
+        report[name] = {
+            "throughput_rps": round(len(r["samples"]) / elapsed, 1),
+            "latency": summarize(r["samples"]),
+            "errors": r["errors"],
+        }
+        if r["skipped"]:
+            report[name]["skipped"] = r["skipped"]
+    return report
+
+
+def git_revision():
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], text=True).strip())
+        return sha, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def pick_users(manifest, n, rng):
+    # Clinics weighted by size, so the big tenants see most of the traffic, as in production
+    tenants = [t for t in manifest["tenants"] if t["doctors"] and t["patients"]]
+    weights = [t["patients"] for t in tenants]
+    users = set()
+    for tenant in rng.choices(tenants, weights, k=n * 4):
+        users.add(rng.choice(tenant["doctors"]))
+        if len(users) >= n:
+            break
+    return sorted(users)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--manifest", default=SYNTHETIC_MANIFEST)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--users", type=int, default=40, help="distinct doctor logins")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per phase")
+    parser.add_argument("--no-mix", action="store_true", help="skip the mixed-workload phase")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--results-dir", default="benchmarks/results")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    rng = random.Random(args.seed)
+
+    limits = httpx.Limits(max_connections=args.concurrency + 8)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        vus = [VirtualUser(u, manifest["password"]) for u in pick_users(manifest, args.users, rng)]
+        for vu in vus:
+            await vu.prepare(client, rng)
+        vus = [vu for vu in vus if vu.patients]
+        if not vus:
+            raise SystemExit("No usable synthetic users, run benchmarks.seed_synthetic first")
+
+        sha, dirty = git_revision()
+        report = {
+            "meta": {
+                "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "git_sha": sha,
+                "git_dirty": dirty,
+                "base_url": args.base_url,
+                "concurrency": args.concurrency,
+                "duration_s": args.duration,
+                "virtual_users": len(vus),
+                "dataset": {
+                    "tenants": len(manifest["tenants"]),
+                    "patients": sum(t["patients"] for t in manifest["tenants"]),
+                },
+            },
+            "isolated": {},
+        }
+        for i, name in enumerate(scenarios):
+            print(f"Running {name}...")
+            report["isolated"][name] = (await run_phase(client, vus, [name], [1], args, args.seed + i))[name]
+        if not args.no_mix and len(scenarios) > 1:
+            print("Running mixed workload...")
+            report["mixed"] = await run_phase(client, vus, scenarios, [MIX_WEIGHTS[s] for s in scenarios], args, args.seed + 100)
+
+    print(json.dumps(report, indent=2))
+    os.makedirs(args.results_dir, exist_ok=True)
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(args.results_dir, f"{stamp}-{sha}{'-dirty' if dirty else ''}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
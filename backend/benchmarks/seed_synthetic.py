@@ -0,0 +1,236 @@
+"""
+Synthetic multi-tenant dataset for the load harness (benchmarks/load_test.py).
+
+Populates the database behind DATABASE_URL with --tenants clinics and their admins,
+doctors, patients, clinical records (vitals), appointments, prescriptions and invoices.
+Sizes are skewed like a real platform: patients are spread over tenants with
+power(random(), 3) (a few very large clinics, a long tail of small ones), doctors scale
+with clinic size, and records per patient follow power(random(), 2). Past appointments are
+completed (a few cancelled) and mostly carry a prescription and an invoice; future ones are
+scheduled and free for the harness to prescribe against. Slots never overlap per doctor,
+so the data is valid under the double-booking constraint.
+
+All rows use the "synth-" id prefix. A manifest with the login credentials and tenant
+sizes is written for the harness. From backend/:
+    python -m benchmarks.seed_synthetic --tenants 50 --patients 200000
+    python -m benchmarks.seed_synthetic --cleanup
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import text
+
+from benchmarks.common import SYNTHETIC_MANIFEST
+import stats_service
+from database import engine
+from password_hashing import hash_password
+from purge_service import PURGE_ORDER
+
+PREFIX = "synth-"
+PASSWORD = "synth-password"
+
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Sneha", "Arjun", "Kavya", "Rahul", "Meera",
+               "Sanjay", "Divya", "Amit", "Pooja", "Karan", "Neha", "Ravi", "Isha", "Suresh", "Lakshmi"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Nair", "Gupta", "Mehta", "Joshi", "Rao", "Kulkarni",
+              "Singh", "Das", "Menon", "Pillai", "Bose", "Chopra", "Verma", "Shetty", "Kapoor", "Desai"]
+DRUGS = ["Amoxicillin", "Paracetamol", "Metformin", "Atorvastatin", "Amlodipine", "Azithromycin", "Pantoprazole", "Cetirizine"]
+
+
+def _sql_array(values):
+    return "ARRAY[" + ",".join(f"'{v}'" for v in values) + "]"
+
+
+async def _step(conn, label, sql, params):
+    t0 = time.perf_counter()
+    res = await conn.execute(text(sql), params)
+    await conn.commit()
+    print(f"  {label}: {res.rowcount} rows in {time.perf_counter() - t0:.1f}s")
+
+
+async def seed(args):
+    params = {
+        "p": PREFIX,
+        "tenants": args.tenants,
+        "patients": args.patients,
+        "max_doctors": args.max_doctors,
+        "max_records": args.max_records,
+        "days_back": args.days_back,
+        "days_ahead": args.days_ahead,
+        "fill_past": args.fill_past,
+        "fill_future": args.fill_future,
+        "hash": await hash_password(PASSWORD),
+        "seed": args.seed / 2**31,
+    }
+    print(f"Seeding {args.tenants} tenants / {args.patients} patients...")
+    async with engine.connect() as conn:
+        # Bulk inserts run far past DB_STATEMENT_TIMEOUT_MS
+        await conn.execute(text("SET statement_timeout = 0"))
+        # Deterministic random() for the whole session, so runs are comparable
+        await conn.execute(text("SELECT setseed(:seed)"), params)
+
+        await _step(conn, "tenants", """
+            INSERT INTO tenants (id, name, domain, created_at, is_super_admin)
+            SELECT :p || t, 'Synthetic Clinic ' || t, :p || t || '.clinicalos.com',
+                   now() - (random() * interval '3 years'), false
+            FROM generate_series(1, :tenants) t
+        """, params)
+
+        # Tenant t gets a share of patients ~ its rank under power(random(), 3); doctors follow
+        await _step(conn, "users", """
+            INSERT INTO users (id, tenant_id, username, hashed_password, roles, is_active, created_at)
+            SELECT :p || 'u-' || t || '-admin', :p || t, :p || t || '-admin', :hash, '["admin"]'::jsonb, true, now()
+            FROM generate_series(1, :tenants) t
+            UNION ALL
+            SELECT :p || 'u-' || t || '-dr' || d, :p || t, :p || t || '-dr' || d, :hash, '["doctor"]'::jsonb, true, now()
+            FROM generate_series(1, :tenants) t
+            CROSS JOIN LATERAL generate_series(1, 1 + floor(:max_doctors * power(1 - (t - 1)::float / :tenants, 3))::int) d
+        """, params)
+
+        await _step(conn, "patients", f"""
+            INSERT INTO patients (id, tenant_id, mrn, name, dob, gender, mobile, blood_group, allergies, created_at)
+            SELECT
+                :p || 'p-' || g,
+                :p || (1 + floor(:tenants * power(random(), 3)))::int,
+                'SY-' || lpad(g::text, 8, '0'),
+                ({_sql_array(FIRST_NAMES)})[1 + floor(random() * {len(FIRST_NAMES)})::int] || ' ' ||
+                ({_sql_array(LAST_NAMES)})[1 + floor(random() * {len(LAST_NAMES)})::int],
+                date '1940-01-01' + floor(random() * 30000)::int,
+                CASE WHEN random() < 0.5 THEN 'Female' ELSE 'Male' END,
+                '9' || lpad(g::text, 9, '0'),
+                (ARRAY['A+','B+','O+','AB+','A-','O-'])[1 + floor(random() * 6)::int],
+                CASE WHEN random() < 0.15 THEN '["Penicillin"]'::jsonb WHEN random() < 0.1 THEN '["Sulfa", "Latex"]'::jsonb ELSE '[]'::jsonb END,
+                now() - (power(random(), 2) * interval '3 years')
+            FROM generate_series(1, :patients) g
+        """, params)
+
+        # Patients numbered per tenant, to pick a random patient of a given tenant by join
+        await conn.execute(text("""
+            CREATE TEMP TABLE synth_patients AS
+            SELECT id, tenant_id, row_number() OVER (PARTITION BY tenant_id ORDER BY id) AS rn,
+                   count(*) OVER (PARTITION BY tenant_id) AS cnt
+            FROM patients WHERE tenant_id LIKE :p || '%'
+        """), params)
+        await conn.execute(text("CREATE INDEX ON synth_patients (tenant_id, rn)"))
+        await conn.execute(text("ANALYZE synth_patients"))
+
+        await _step(conn, "clinical_records", """
+            INSERT INTO clinical_records (id, tenant_id, patient_id, date, type, data)
+            SELECT :p || 'r-' || sp.id || '-' || n, sp.tenant_id, sp.id,
+                   now() - (random() * interval '2 years'), 'Vitals',
+                   jsonb_build_object(
+                       'bp', (105 + floor(random() * 40))::int || '/' || (65 + floor(random() * 25))::int,
+                       'pulse', (60 + floor(random() * 40))::int,
+                       'weight', round((50 + random() * 45)::numeric, 1),
+                       'temp', round((97.5 + random() * 3)::numeric, 1))
+            FROM synth_patients sp
+            CROSS JOIN LATERAL generate_series(1, floor(power(random(), 2) * :max_records + 0 * sp.rn)::int) n
+        """, params)
+
+        # 30 min slots 09:00-17:00 Mon-Sat per doctor, each booked with probability fill_past / fill_future
+        await _step(conn, "appointments", """
+            INSERT INTO appointments (id, tenant_id, patient_id, doctor_id, start_time, end_time, status, reason)
+            SELECT :p || 'a-' || u.id || '-' || to_char(s, 'YYYYMMDDHH24MI'), u.tenant_id, sp.id, u.id,
+                   s, s + interval '30 minutes',
+                   CASE WHEN s >= now() THEN 'scheduled' WHEN random() < 0.05 THEN 'cancelled' ELSE 'completed' END,
+                   'Consultation'
+            FROM users u
+            JOIN (SELECT tenant_id, max(cnt) AS cnt FROM synth_patients GROUP BY tenant_id) tc ON tc.tenant_id = u.tenant_id
+            CROSS JOIN generate_series(CAST(current_date AS timestamp) - make_interval(days => :days_back),
+                                       CAST(current_date AS timestamp) + make_interval(days => :days_ahead),
+                                       interval '1 day') AS day
+            CROSS JOIN LATERAL generate_series(day + time '09:00', day + time '16:30', interval '30 minutes') AS s
+            CROSS JOIN LATERAL (SELECT 1 + floor(random() * tc.cnt + 0 * extract(epoch FROM s))::int AS rn) pick
+            JOIN synth_patients sp ON sp.tenant_id = u.tenant_id AND sp.rn = pick.rn
+            WHERE u.tenant_id LIKE :p || '%' AND u.roles @> '["doctor"]'
+              AND extract(isodow FROM day) < 7
+              AND random() < CASE WHEN s < now() THEN :fill_past ELSE :fill_future END
+        """, params)
+
+        await _step(conn, "prescriptions", f"""
+            INSERT INTO prescriptions (id, tenant_id, appointment_id, doctor_id, created_at, medications, notes)
+            SELECT :p || 'rx-' || a.id, a.tenant_id, a.id, a.doctor_id, a.end_time,
+                   jsonb_build_array(jsonb_build_object(
+                       'drug', ({_sql_array(DRUGS)})[1 + floor(random() * {len(DRUGS)})::int],
+                       'dose', '500mg', 'freq', 'BD', 'duration', (3 + floor(random() * 5))::int || 'd')),
+                   'Review after a week'
+            FROM appointments a
+            WHERE a.tenant_id LIKE :p || '%' AND a.status = 'completed' AND random() < 0.7
+        """, params)
+
+        await _step(conn, "invoices", """
+            INSERT INTO invoices (id, tenant_id, appointment_id, created_at, total_amount, status, line_items)
+            SELECT :p || 'inv-' || a.id, a.tenant_id, a.id, a.end_time, amount,
+                   CASE WHEN random() < 0.85 THEN 'paid' ELSE 'unpaid' END,
+                   jsonb_build_array(jsonb_build_object('description', 'Consultation', 'amount', amount))
+            FROM appointments a
+            CROSS JOIN LATERAL (SELECT round((300 + random() * 1700 + 0 * length(a.id))::numeric, 0)::float AS amount) x
+            WHERE a.tenant_id LIKE :p || '%' AND a.status = 'completed' AND random() < 0.9
+        """, params)
+
+        await conn.execute(text("DROP TABLE synth_patients"))
+        await conn.commit()
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("SET statement_timeout = 0"))
+        for table in ("tenants", "users", "patients", "clinical_records", "appointments", "prescriptions", "invoices"):
+            await conn.execute(text(f"ANALYZE {table}"))
+
+    print("Reconciling dashboard counters...")
+    await stats_service.reconcile_all()
+    await write_manifest(args.manifest)
+
+
+async def write_manifest(path):
+    async with engine.connect() as conn:
+        res = await conn.execute(text("""
+            SELECT t.id, count(p.id) AS patients,
+                   array(SELECT username FROM users u WHERE u.tenant_id = t.id AND u.roles @> '["doctor"]' ORDER BY username) AS doctors
+            FROM tenants t LEFT JOIN patients p ON p.tenant_id = t.id
+            WHERE t.id LIKE :p || '%'
+            GROUP BY t.id ORDER BY count(p.id) DESC
+        """), {"p": PREFIX})
+        tenants = [{"id": r.id, "patients": r.patients, "admin": f"{r.id}-admin", "doctors": list(r.doctors)} for r in res]
+    with open(path, "w") as f:
+        json.dump({"password": PASSWORD, "tenants": tenants}, f, indent=2)
+    print(f"Manifest written to {path} ({len(tenants)} tenants)")
+
+
+async def cleanup():
+    async with engine.connect() as conn:
+        await conn.execute(text("SET statement_timeout = 0"))
+        for model in PURGE_ORDER:
+            res = await conn.execute(text(f"DELETE FROM {model.__tablename__} WHERE tenant_id LIKE :p"), {"p": PREFIX + "%"})
+            print(f"  {model.__tablename__}: {res.rowcount} rows deleted")
+        for table in ("tenant_stats", "tenant_daily_appointments"):
+            await conn.execute(text(f"DELETE FROM {table} WHERE tenant_id LIKE :p"), {"p": PREFIX + "%"})
+        await conn.execute(text("DELETE FROM tenants WHERE id LIKE :p"), {"p": PREFIX + "%"})
+        await conn.commit()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cleanup", action="store_true", help="delete all synthetic rows and exit")
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--patients", type=int, default=200_000)
+    parser.add_argument("--max-doctors", type=int, default=12, help="doctors at the largest clinic")
+    parser.add_argument("--max-records", type=int, default=20, help="upper bound of vitals records per patient")
+    parser.add_argument("--days-back", type=int, default=180)
+    parser.add_argument("--days-ahead", type=int, default=30)
+    parser.add_argument("--fill-past", type=float, default=0.6, help="fraction of past slots booked")
+    parser.add_argument("--fill-future", type=float, default=0.3, help="fraction of future slots booked")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--manifest", default=SYNTHETIC_MANIFEST)
+    args = parser.parse_args()
+
+    if args.cleanup:
+        await cleanup()
+    else:
+        await seed(args)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
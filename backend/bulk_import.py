@@ -0,0 +1,29 @@
+import argparse
+import asyncio
+import json
+
+from database import engine
+from import_service import import_stream, iter_rows, IMPORT_CHUNK_SIZE
+
+# CLI for onboarding a clinic's existing data, e.g.
+#   python bulk_import.py patients --tenant <tenant_id> patients.csv
+#   python bulk_import.py records --tenant <tenant_id> history.ndjson
+
+async def main():
+    parser = argparse.ArgumentParser(description="Bulk import patients / clinical records via COPY")
+    parser.add_argument("kind", choices=["patients", "records"])
+    parser.add_argument("path")
+    parser.add_argument("--tenant", required=True, help="tenant id to import into")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    with open(args.path, "rb") as f:
+        report = await import_stream(args.kind, args.tenant, iter_rows(f, fmt), chunk_size=args.chunk_size)
+    await engine.dispose()
+
+    print(json.dumps(report, indent=2, default=str))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,23 +1,95 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import MetaData
+from sqlalchemy.pool import NullPool
+from sqlalchemy import event
+import logging
 import os
+import random
+import time
 
 # 1. Connection String (Local Postgres)
 # "hospital_db" is the DB you created in Postgres.app
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+psycopg://localhost/hospital_db")
 
-# 2. The Engine (Connection Pool)
-engine = create_async_engine(DATABASE_URL, echo=True)
+# 2. Engine settings (environment overrides, defaults are for production)
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"                        # log every statement + params; development only
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))                # persistent connections per process
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))          # extra connections under bursts, closed when returned
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))        # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))        # seconds; replace connections older than this
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"       # check liveness on checkout (survives DB restarts / idle kills)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # server-side cap per statement, 0 = none
+DB_PREPARE_THRESHOLD = os.getenv("DB_PREPARE_THRESHOLD", "5")      # psycopg: executions before a server-side prepare, "none" = never
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "0") == "1"               # behind PgBouncer in transaction pooling mode
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))     # log statements slower than this, 0 = off
+DB_SLOW_QUERY_SAMPLE = float(os.getenv("DB_SLOW_QUERY_SAMPLE", "1.0"))  # fraction of slow statements to log
 
-# 3. Size-fits-all Session Maker
+connect_args = {}
+engine_kwargs = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
+
+if DB_PGBOUNCER:
+    # PgBouncer owns the pooling, and a server connection is only ours for one transaction:
+    # no client-side pool, no named prepared statements, and no startup `options`
+    # (PgBouncer rejects them) - set statement_timeout on the database role instead:
+    #     ALTER ROLE app SET statement_timeout = '30s';
+    engine_kwargs["poolclass"] = NullPool
+    connect_args["prepare_threshold"] = None
+else:
+    engine_kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE)
+    connect_args["prepare_threshold"] = None if DB_PREPARE_THRESHOLD.lower() == "none" else int(DB_PREPARE_THRESHOLD)
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+# 3. The Engine (Connection Pool)
+engine = create_async_engine(DATABASE_URL, connect_args=connect_args, **engine_kwargs)
+
+# Optional streaming replica for read-only endpoints (routing rules in read_routing.py).
+# Same pool settings; its transactions are read-only, so a write routed there by mistake
+# fails loudly even if the URL points at a writable server.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")  # unset = everything on the primary
+replica_engine = None
+if DATABASE_REPLICA_URL:
+    replica_connect_args = dict(connect_args)
+    if not DB_PGBOUNCER:
+        replica_connect_args["options"] = " ".join(filter(None, (connect_args.get("options"), "-c default_transaction_read_only=on")))
+    replica_engine = create_async_engine(DATABASE_REPLICA_URL, connect_args=replica_connect_args, **engine_kwargs)
+
+# Tenant exports (export_service.py) stream for as long as the download takes: they get their
+# own unpooled connections, so they never hold a request-pool slot, and lift the statement
+# timeout for their own transaction. export_service bounds how many run at once.
+export_engine = create_async_engine(DATABASE_URL, connect_args=connect_args, echo=DB_ECHO, poolclass=NullPool)
+
+# 4. Sampled slow-query log (instead of echoing every statement)
+slow_query_logger = logging.getLogger("sql.slow")
+
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _log_slow_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+    if DB_SLOW_QUERY_MS and elapsed_ms >= DB_SLOW_QUERY_MS and random.random() < DB_SLOW_QUERY_SAMPLE:
+        # Statement text only: parameters can carry patient data
+        slow_query_logger.warning("Slow query (%.1f ms): %s", elapsed_ms, " ".join(statement.split())[:2000])
+
+def _drop_timer(context):
+    # after_cursor_execute does not run for failed statements
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+for _engine in filter(None, (engine, replica_engine)):
+    event.listen(_engine.sync_engine, "before_cursor_execute", _start_timer)
+    event.listen(_engine.sync_engine, "after_cursor_execute", _log_slow_query)
+    event.listen(_engine.sync_engine, "handle_error", _drop_timer)
+
+# 5. Size-fits-all Session Maker
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+ReplicaSessionLocal = async_sessionmaker(replica_engine, expire_on_commit=False, class_=AsyncSession) if replica_engine else None
 
-# 4. Base Class for models
+# 6. Base Class for models
 class Base(DeclarativeBase):
     pass
 
-# 5. Dependency (To be used in API routes)
+# 7. Dependency (To be used in API routes)
 async def get_db():
     async with SessionLocal() as session:
         yield session
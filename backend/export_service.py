@@ -0,0 +1,88 @@
+import asyncio
+import csv
+import datetime
+import io
+import json
+import os
+
+from sqlalchemy import select, text
+
+from database import export_engine
+from models import Patient, ClinicalRecord, Appointment, Prescription, Invoice, Attachment
+
+# Constant-memory tenant export. Each table is read through a server-side cursor
+# (AsyncSession.stream + yield_per) and written out as NDJSON or CSV in small batches,
+# so exporting a multi-GB tenant never holds more than EXPORT_BATCH_SIZE rows in memory.
+# `since` restricts each table to rows at/after the cutoff on its timestamp column.
+# Every table is read in (timestamp, id) order along a (tenant_id, timestamp, id) index
+# (migrations/r0012_export_indexes.py), so the first batch is sent without sorting the table.
+# A download can outlast DB_STATEMENT_TIMEOUT_MS, so it runs on its own connection
+# (database.export_engine) with the timeout lifted, at most EXPORT_MAX_CONCURRENT per worker.
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "4"))  # exports streaming at once per worker; more wait
+
+_export_slots = asyncio.Semaphore(EXPORT_MAX_CONCURRENT)
+
+EXPORTS = {
+    "patients": (Patient, Patient.created_at),
+    "records": (ClinicalRecord, ClinicalRecord.date),
+    "appointments": (Appointment, Appointment.start_time),
+    "prescriptions": (Prescription, Prescription.created_at),
+    "invoices": (Invoice, Invoice.created_at),
+    "attachments": (Attachment, Attachment.uploaded_at),
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+async def _stream_table(kind: str, tenant_id: str, since=None):
+    """Yield batches of row mappings for one table, via a server-side cursor."""
+    model, ts_col = EXPORTS[kind]
+    table = model.__table__
+    query = select(table).where(table.c.tenant_id == tenant_id)
+    if since:
+        query = query.where(ts_col >= since)
+    query = query.order_by(ts_col, table.c.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    async with _export_slots, export_engine.connect() as conn:
+        await conn.execute(text("SET LOCAL statement_timeout = 0"))
+        result = await conn.stream(query)
+        async for partition in result.mappings().partitions(EXPORT_BATCH_SIZE):
+            yield partition
+
+
+async def export_ndjson(kinds, tenant_id: str, since=None):
+    for kind in kinds:
+        async for batch in _stream_table(kind, tenant_id, since):
+            lines = [json.dumps({"_type": kind, **row}, default=_json_default) for row in batch]
+            yield ("\n".join(lines) + "\n").encode()
+
+
+async def export_csv(kind: str, tenant_id: str, since=None):
+    columns = [c.name for c in EXPORTS[kind][0].__table__.columns]
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    async for batch in _stream_table(kind, tenant_id, since):
+        for row in batch:
+            writer.writerow([_csv_cell(row[c]) for c in columns])
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
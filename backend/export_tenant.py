@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import datetime
+import sys
+
+from database import engine
+from export_service import export_ndjson, export_csv, EXPORTS
+
+# CLI for streaming a tenant's data out, e.g.
+#   python export_tenant.py --tenant <tenant_id> > tenant.ndjson
+#   python export_tenant.py --tenant <tenant_id> --kind patients --format csv --since 2025-01-01 -o patients.csv
+
+async def main():
+    parser = argparse.ArgumentParser(description="Stream a tenant export as NDJSON or CSV")
+    parser.add_argument("--tenant", required=True, help="tenant id to export")
+    parser.add_argument("--kind", default="all", choices=["all", *EXPORTS])
+    parser.add_argument("--format", default="ndjson", choices=["ndjson", "csv"])
+    parser.add_argument("--since", type=datetime.datetime.fromisoformat, help="only rows at/after this timestamp")
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    args = parser.parse_args()
+
+    if args.format == "csv" and args.kind == "all":
+        parser.error("CSV export is per table, pass --kind")
+
+    kinds = list(EXPORTS) if args.kind == "all" else [args.kind]
+    body = export_csv(args.kind, args.tenant, args.since) if args.format == "csv" else export_ndjson(kinds, args.tenant, args.since)
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        async for chunk in body:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,201 @@
+import asyncio
+import datetime
+import logging
+import os
+
+from sqlalchemy import select, func, cast, text, literal_column, DateTime
+from sqlalchemy.dialects.postgresql import insert
+
+from database import SessionLocal
+from models import Tenant, Patient, Appointment, Invoice, PlatformDailyGrowth
+
+# Platform growth analytics behind /stats/growth. Each closed (UTC) day is rolled up once
+# into platform_daily_growth, so years of history are a few thousand rows and weeks /
+# months are date_trunc() aggregates over the rollup instead of scans of the source tables.
+# A closed bucket can no longer change, so its totals are cached in-process and never
+# recomputed; only the bucket containing today is refreshed, from its closed days in the
+# rollup plus live counts for today.
+#
+# A request only fills a short gap in the rollup (the day or two since the last request).
+# The whole history on a fresh install, or a long gap after downtime, is appended by a
+# background task in ROLLUP_BACKFILL_DAYS transactions without a statement timeout; until
+# it finishes the endpoint serves what is rolled up so far and caches no closed bucket.
+
+INTERVALS = ("day", "week", "month")
+METRICS = ("clinics", "patients", "appointments", "revenue")
+ROLLUP_INSERT_CHUNK = 1000
+ROLLUP_INLINE_DAYS = int(os.getenv("ROLLUP_INLINE_DAYS", "7"))        # longer gaps go to the background backfill
+ROLLUP_BACKFILL_DAYS = int(os.getenv("ROLLUP_BACKFILL_DAYS", "90"))   # days appended per backfill transaction
+
+# metric -> (timestamp column, aggregate, filters)
+SOURCES = {
+    "clinics": (Tenant.created_at, func.count(), [Tenant.is_super_admin == False]),
+    "patients": (Patient.created_at, func.count(), []),
+    "appointments": (Appointment.start_time, func.count(), [Appointment.status != "cancelled"]),
+    "revenue": (Invoice.created_at, func.coalesce(func.sum(Invoice.total_amount), 0), [Invoice.status != "cancelled"]),
+}
+
+_closed = {}  # (interval, bucket_start) -> metrics
+_rolled_up_to = None  # first day not yet in the rollup, once known
+_backfill_task = None
+
+
+def _zero():
+    return dict.fromkeys(METRICS, 0)
+
+
+def bucket_start(day: datetime.date, interval: str) -> datetime.date:
+    if interval == "day":
+        return day
+    if interval == "week":
+        return day - datetime.timedelta(days=day.weekday())  # ISO weeks, like date_trunc('week')
+    return day.replace(day=1)
+
+
+def shift(start: datetime.date, interval: str, n: int) -> datetime.date:
+    if interval == "day":
+        return start + datetime.timedelta(days=n)
+    if interval == "week":
+        return start + datetime.timedelta(weeks=n)
+    months = start.year * 12 + start.month - 1 + n
+    return datetime.date(months // 12, months % 12 + 1, 1)
+
+
+def label(start: datetime.date, interval: str) -> str:
+    return start.strftime("%b %Y") if interval == "month" else start.strftime("%d %b")
+
+
+# --- Rollup ---
+
+async def daily_counts(db, start: datetime.date, end: datetime.date):
+    """Per-day metrics from the source tables for [start, end)."""
+    counts = {}
+    lo = datetime.datetime.combine(start, datetime.time.min)
+    hi = datetime.datetime.combine(end, datetime.time.min)
+    for metric, (ts_col, value, filters) in SOURCES.items():
+        day = func.date(ts_col)
+        res = await db.execute(select(day, value).where(ts_col >= lo, ts_col < hi, *filters).group_by(day))
+        for d, v in res:
+            counts.setdefault(d, _zero())[metric] = v
+    return counts
+
+
+async def _first_missing_day(db, today: datetime.date) -> datetime.date:
+    last = await db.scalar(select(func.max(PlatformDailyGrowth.day)))
+    if last is not None:
+        return last + datetime.timedelta(days=1)
+    return await db.scalar(select(func.min(func.date(Tenant.created_at)))) or today
+
+
+async def _append_days(db, today: datetime.date, max_days: int) -> datetime.date:
+    """Append up to `max_days` closed days missing from the rollup, oldest first, and commit.
+    Returns the first day still missing."""
+    # One worker appends at a time; the others wait and then find the days already there
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext('growth-rollup'))"))
+    start = await _first_missing_day(db, today)
+    end = min(today, start + datetime.timedelta(days=max_days))
+    if start < end:
+        counts = await daily_counts(db, start, end)
+        now = datetime.datetime.utcnow()
+        rows = []
+        day = start
+        while day < end:
+            rows.append({"day": day, **counts.get(day, _zero()), "computed_at": now})
+            day += datetime.timedelta(days=1)
+        for i in range(0, len(rows), ROLLUP_INSERT_CHUNK):
+            stmt = insert(PlatformDailyGrowth).values(rows[i:i + ROLLUP_INSERT_CHUNK])
+            await db.execute(stmt.on_conflict_do_nothing(index_elements=[PlatformDailyGrowth.day]))
+    await db.commit()
+    return max(start, end)
+
+
+async def _backfill(today: datetime.date):
+    global _rolled_up_to
+    try:
+        async with SessionLocal() as db:
+            while True:
+                await db.execute(text("SET LOCAL statement_timeout = 0"))
+                if await _append_days(db, today, ROLLUP_BACKFILL_DAYS) >= today:
+                    break
+        _rolled_up_to = today
+        logging.info("Growth rollup backfilled up to %s", today)
+    except Exception:
+        logging.exception("Growth rollup backfill failed")  # the next request starts it again
+
+
+def start_backfill(today: datetime.date):
+    global _backfill_task
+    if _backfill_task is None or _backfill_task.done():
+        _backfill_task = asyncio.create_task(_backfill(today))
+
+
+def stop_backfill():
+    global _backfill_task
+    if _backfill_task is not None:
+        _backfill_task.cancel()
+        _backfill_task = None
+
+
+async def roll_up_closed_days(db, today: datetime.date) -> bool:
+    """True once every closed day is in the rollup. A short gap is filled here; a longer one
+    starts the background backfill and returns False (the rollup is still partial)."""
+    global _rolled_up_to
+    if _rolled_up_to == today:
+        return True
+    if (today - await _first_missing_day(db, today)).days > ROLLUP_INLINE_DAYS:
+        await db.rollback()
+        start_backfill(today)
+        return False
+    await _append_days(db, today, ROLLUP_INLINE_DAYS)
+    _rolled_up_to = today
+    return True
+
+
+async def _rollup_buckets(db, interval: str, start: datetime.date, end: datetime.date):
+    """Bucketed sums over the rollup for days in [start, end)."""
+    # interval is one of INTERVALS; inlined so SELECT and GROUP BY are the same expression
+    bucket = func.date_trunc(literal_column(f"'{interval}'"), cast(PlatformDailyGrowth.day, DateTime))
+    res = await db.execute(
+        select(bucket, *[func.sum(getattr(PlatformDailyGrowth, m)) for m in METRICS])
+        .where(PlatformDailyGrowth.day >= start, PlatformDailyGrowth.day < end)
+        .group_by(bucket)
+    )
+    return {row[0].date(): dict(zip(METRICS, row[1:])) for row in res}
+
+
+# --- Reads ---
+
+async def growth(db, interval: str = "month", periods: int = 12):
+    today = datetime.datetime.utcnow().date()  # timestamps are stored in UTC
+    complete = await roll_up_closed_days(db, today)
+
+    current = bucket_start(today, interval)
+    starts = [shift(current, interval, -n) for n in range(periods - 1, -1, -1)]
+
+    # 1. Closed buckets: cached forever once computed (not while the backfill is running)
+    missing = [s for s in starts[:-1] if (interval, s) not in _closed]
+    closed = dict(_closed)
+    if missing:
+        found = await _rollup_buckets(db, interval, missing[0], current)
+        for s in missing:
+            closed[(interval, s)] = found.get(s, _zero())
+        if complete:
+            _closed.update(closed)
+
+    # 2. Current bucket: closed days so far from the rollup + today's live counts
+    live = (await _rollup_buckets(db, interval, current, today)).get(current, _zero())
+    for metric, value in (await daily_counts(db, today, today + datetime.timedelta(days=1))).get(today, {}).items():
+        live[metric] += value
+
+    series = []
+    for s in starts:
+        metrics = live if s == current else closed[(interval, s)]
+        series.append({
+            "name": label(s, interval),
+            "bucket_start": s,
+            "clinics": int(metrics["clinics"]),
+            "patients": int(metrics["patients"]),
+            "appointments": int(metrics["appointments"]),
+            "revenue": float(metrics["revenue"]),
+        })
+    return series
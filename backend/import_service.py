@@ -0,0 +1,234 @@
+import asyncio
+import csv
+import datetime
+import io
+import json
+import time
+import uuid
+from typing import List, Optional
+
+from psycopg.types.json import Jsonb
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select, or_
+
+import mrn_allocator
+import stats_service
+import vitals_service
+from database import engine
+from models import Patient
+
+# Bulk onboarding of patients and clinical history (CSV or NDJSON).
+# Rows are read as a stream, validated per chunk, and each chunk is loaded with
+# PostgreSQL COPY inside its own transaction. Invalid rows are reported with their line
+# number and skipped; a failing chunk is reported and the import carries on.
+
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+PATIENT_COLUMNS = ("id", "tenant_id", "mrn", "name", "dob", "gender", "mobile", "blood_group", "allergies", "address", "created_at")
+RECORD_COLUMNS = ("id", "tenant_id", "patient_id", "date", "type", "data")
+
+
+class PatientImportRow(BaseModel):
+    name: str
+    mobile: str
+    gender: str
+    dob: Optional[datetime.date] = None
+    blood_group: Optional[str] = None
+    allergies: List[str] = []
+    address: Optional[str] = None
+    mrn: Optional[str] = None  # keep the clinic's existing MRN when migrating
+    created_at: Optional[datetime.datetime] = None
+
+
+class RecordImportRow(BaseModel):
+    patient_id: Optional[str] = None
+    mrn: Optional[str] = None  # alternative to patient_id
+    type: str
+    data: dict
+    date: Optional[datetime.datetime] = None
+
+
+# --- Parsing ---
+
+def _csv_value(key, value):
+    # CSV cells are strings; list / object columns are given as JSON (or ';'-separated allergies)
+    if key in ("allergies", "data"):
+        value = value.strip()
+        if value.startswith("[") or value.startswith("{"):
+            return json.loads(value)
+        if key == "allergies":
+            return [a.strip() for a in value.split(";") if a.strip()]
+    return value
+
+
+def iter_rows(stream, fmt: str):
+    """Yield (line_no, dict | Exception) from a binary stream without loading it into memory."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            try:
+                # Empty cells are left out so the row model's defaults apply
+                yield reader.line_num, {k: _csv_value(k, v) for k, v in row.items() if k and v not in ("", None)}
+            except ValueError as exc:
+                yield reader.line_num, exc
+    else:
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError as exc:
+                yield line_no, exc
+
+
+def chunked(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- MRNs ---
+
+async def preallocate_mrns(conn, tenant_id: str, count: int, reserved: set):
+    """`count` allocator MRNs unused in the tenant and not in `reserved`, one block per round.
+
+    A clinic's own MRNs can be in our PT-nnnnnnn format, so the block is checked against
+    the tenant (one indexed query); taken numbers are skipped and topped up.
+    """
+    mrns = []
+    while len(mrns) < count:
+        candidates = await mrn_allocator.reserve_mrns(tenant_id, count - len(mrns))
+        res = await conn.execute(select(Patient.mrn).where(Patient.tenant_id == tenant_id, Patient.mrn.in_(candidates)))
+        taken = set(res.scalars()) | reserved
+        mrns.extend(m for m in candidates if m not in taken)
+    return mrns
+
+
+# --- Loading ---
+
+async def _copy(conn, table: str, columns, rows):
+    raw = await conn.get_raw_connection()
+    async with raw.driver_connection.cursor() as cur:
+        async with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                await copy.write_row(row)
+
+
+def _validate(chunk, model, report):
+    valid = []
+    for line_no, raw in chunk:
+        if isinstance(raw, Exception):
+            _error(report, line_no, f"Unparseable row: {raw}")
+            continue
+        try:
+            valid.append((line_no, model(**raw)))
+        except (ValidationError, TypeError) as exc:
+            _error(report, line_no, str(exc).replace("\n", " "))
+    return valid
+
+
+def _error(report, line_no, message):
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"row": line_no, "error": message})
+
+
+async def _load_patient_chunk(conn, tenant_id, rows, report):
+    now = datetime.datetime.utcnow()
+    given = [r.mrn.upper() for _, r in rows if r.mrn]
+    existing = set()
+    if given:
+        res = await conn.execute(select(Patient.mrn).where(Patient.tenant_id == tenant_id, Patient.mrn.in_(given)))
+        existing = set(res.scalars())
+
+    accepted, seen = [], set()
+    for line_no, r in rows:
+        if r.mrn:
+            mrn = r.mrn.upper()
+            if mrn in existing or mrn in seen:
+                _error(report, line_no, f"MRN {mrn} already exists")
+                continue
+            seen.add(mrn)
+        accepted.append((line_no, r))
+
+    fresh = iter(await preallocate_mrns(conn, tenant_id, sum(1 for _, r in accepted if not r.mrn), existing | seen))
+    copy_rows = [
+        (str(uuid.uuid4()), tenant_id, r.mrn.upper() if r.mrn else next(fresh), r.name, r.dob, r.gender, r.mobile,
+         r.blood_group, Jsonb(r.allergies), r.address, r.created_at or now)
+        for _, r in accepted
+    ]
+    # Before the COPY: a failed chunk only skips numbers, a committed one is never handed out again
+    await mrn_allocator.advance_past(tenant_id, seen)
+    await _copy(conn, "patients", PATIENT_COLUMNS, copy_rows)
+    await stats_service.bump(conn, tenant_id, patients=len(copy_rows))
+    return len(copy_rows)
+
+
+async def _load_record_chunk(conn, tenant_id, rows, report):
+    now = datetime.datetime.utcnow()
+    ids = {r.patient_id for _, r in rows if r.patient_id}
+    mrns = {r.mrn.upper() for _, r in rows if r.mrn and not r.patient_id}
+    res = await conn.execute(
+        select(Patient.id, Patient.mrn).where(Patient.tenant_id == tenant_id, or_(Patient.id.in_(ids), Patient.mrn.in_(mrns)))
+    )
+    known_ids, by_mrn = set(), {}
+    for pid, mrn in res:
+        known_ids.add(pid)
+        by_mrn[mrn] = pid
+
+    copy_rows = []
+    for line_no, r in rows:
+        pid = r.patient_id if r.patient_id in known_ids else by_mrn.get((r.mrn or "").upper())
+        if not pid:
+            _error(report, line_no, "Unknown patient_id / mrn for this tenant")
+            continue
+        copy_rows.append((str(uuid.uuid4()), tenant_id, pid, r.date or now, r.type, Jsonb(r.data)))
+    await _copy(conn, "clinical_records", RECORD_COLUMNS, copy_rows)
+    return len(copy_rows)
+
+
+IMPORTERS = {
+    "patients": (PatientImportRow, _load_patient_chunk),
+    "records": (RecordImportRow, _load_record_chunk),
+}
+
+
+async def import_stream(kind: str, tenant_id: str, rows, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """Import an iterator of (line_no, dict) rows; returns counts, per-row errors and throughput."""
+    model, loader = IMPORTERS[kind]
+    report = {"kind": kind, "inserted": 0, "failed": 0, "errors": []}
+    started = time.perf_counter()
+
+    chunks = chunked(rows, chunk_size)
+    while True:
+        # File reads + parsing happen in a worker thread, never on the event loop
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if not chunk:
+            break
+        valid = _validate(chunk, model, report)
+        if not valid:
+            continue
+        failed_before = report["failed"]
+        try:
+            async with engine.begin() as conn:
+                report["inserted"] += await loader(conn, tenant_id, valid, report)
+        except Exception as exc:
+            # The whole chunk rolled back; count the rows the loader had not already rejected
+            report["failed"] += len(valid) - (report["failed"] - failed_before)
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"row": valid[0][0], "to_row": valid[-1][0], "error": f"Chunk rejected by database: {exc}"})
+
+    if kind == "records" and report["inserted"]:
+        vitals_service.invalidate(tenant_id)  # this worker's cached series; others expire by TTL
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["inserted"] / elapsed, 1) if elapsed else None
+    return report
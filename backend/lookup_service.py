@@ -0,0 +1,28 @@
+from sqlalchemy import select
+
+from models import Patient, Prescription, User
+
+# Lookups inside the JSONB list columns, all as `@>` containment so they are served by the
+# jsonb_path_ops GIN indexes from migrations/r0010_jsonb_gin_indexes.py:
+#   patients.allergies      ["Penicillin", ...]        -> GIN (tenant_id, allergies jsonb_path_ops)
+#   prescriptions.medications [{"drug": "Amox", ...}]  -> GIN (tenant_id, medications jsonb_path_ops)
+#   users.roles             ["admin", "doctor", ...]   -> GIN (roles jsonb_path_ops)
+# For patients and prescriptions tenant_id is part of the index (btree_gin), so the tenant
+# filter and the containment are answered by one index scan. Role checks within a tenant
+# go through (tenant_id) instead, a clinic has tens of users; the roles index serves the
+# cross-tenant admin lists. Matching is exact and case-sensitive, as stored: jsonb_path_ops
+# hashes whole values, so it cannot serve ILIKE or `->>` comparisons. Keep new filters on
+# these columns in the `.contains(...)` form.
+
+
+def patients_with_allergy(tenant_id: str, allergen: str, columns):
+    return select(*columns).where(Patient.tenant_id == tenant_id, Patient.allergies.contains([allergen]))
+
+
+def prescriptions_with_drug(tenant_id: str, drug: str, columns):
+    # Element match: any medication object with this drug, whatever its dose / frequency
+    return select(*columns).where(Prescription.tenant_id == tenant_id, Prescription.medications.contains([{"drug": drug}]))
+
+
+def users_with_role(tenant_id: str, role: str, columns):
+    return select(*columns).where(User.tenant_id == tenant_id, User.roles.contains([role]))
@@ -1,31 +1,47 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, Depends, HTTPException, Query, Header, Request, Response, UploadFile, File, status
+from fastapi.responses import StreamingResponse, PlainTextResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import contains_eager
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import desc, or_, func, delete
-from typing import List, Optional, Any
+from sqlalchemy import func
+from typing import List, Optional
 import datetime
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from slugify import slugify
-import random
-import string
 import uuid 
 
 import logging
-logging.basicConfig(
-    filename='backend_debug.log', 
-    level=logging.INFO, 
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    force=True
-)
-
-from database import engine, Base, get_db
-from models import Tenant, User, Patient, ClinicalRecord, Appointment, Attachment, Prescription, Invoice, TenantSettings
-# from pdf_service import create_prescription_pdf
+import request_logging
+request_logging.configure_logging()
+
+from database import engine, replica_engine, get_db
+import read_routing
+import migrate
+from models import Tenant, User, Patient, ClinicalRecord, Appointment, Attachment, Prescription, Invoice, TenantSettings, TenantPurgeJob
+import auth_cache
+from auth_cache import Principal
+import password_hashing
+from password_hashing import hash_password, verify_password
+from search_service import search_patients
+from lookup_service import patients_with_allergy, prescriptions_with_drug, users_with_role
+from pagination import keyset_query, split_page, NEXT_CURSOR_HEADER
+from patient_sections import profile_summary, fetch_section
+import vitals_service
+from import_service import import_stream, iter_rows, IMPORTERS
+from export_service import export_ndjson, export_csv, EXPORTS
+import purge_service
+from purge_service import enqueue_purge
+import stats_service
+import growth_service
+from scheduling_service import free_slots, is_overlap_violation, DEFAULT_SLOT_MINUTES
+from request_logging import RequestLoggingMiddleware, REQUEST_ID_HEADER
+import metrics
+from metrics import MetricsMiddleware
+import pdf_service
+import attachment_store
+import mrn_allocator
 
 # --- App Config ---
 app = FastAPI()
@@ -36,14 +52,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, REQUEST_ID_HEADER],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestLoggingMiddleware)  # outermost: request context for everything below
+metrics.instrument_engine(engine)
+if replica_engine is not None:
+    metrics.instrument_engine(replica_engine, "db_replica_pool")
 
 SECRET_KEY = "supersecretkey"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -54,12 +74,7 @@ def create_access_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def generate_mrn():
-    chars = "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    return f"PT-{chars}"
-
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
-    logging.info(f"get_current_user called")
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -68,25 +83,49 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        logging.info(f"get_current_user: token decoded, user={username}")
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
         
-    result = await db.execute(select(User).where(User.username == username))
-    user = result.scalars().first()
-    logging.info(f"get_current_user: db fetch done, found={user is not None}")
-    if user is None:
-        raise credentials_exception
-        
-    if not user.is_active:
+    principal = auth_cache.get_principal(username)
+    if principal is None:
+        # Single round-trip: the user plus the tenant flag most handlers check
+        result = await db.execute(
+            select(User, Tenant.is_super_admin)
+            .outerjoin(Tenant, User.tenant_id == Tenant.id)
+            .where(User.username == username)
+        )
+        row = result.first()
+        logging.debug("get_current_user: principal cache miss, found=%s", row is not None)
+        if row is None:
+            raise credentials_exception
+        user, is_super_admin = row
+        principal = Principal(
+            id=user.id,
+            username=user.username,
+            tenant_id=user.tenant_id,
+            roles=user.roles,
+            is_active=user.is_active,
+            is_super_admin=is_super_admin,
+        )
+        auth_cache.put_principal(principal)
+
+    request_logging.set_tenant(principal.tenant_id)
+    read_routing.set_user(principal.id)
+    if not principal.is_active:
         raise HTTPException(status_code=403, detail="Account is deactivated. Contact Admin.")
         
-    return user
+    return principal
+
+async def get_read_db(current_user: Principal = Depends(get_current_user)):
+    # Read-only endpoints: the replica when it is healthy, caught up and the user has not
+    # just written, otherwise the primary (see read_routing.py). Never write through it.
+    async with read_routing.session_factory_for(current_user.id)() as session:
+        yield session
 
 # --- Pydantic Models ---
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, ConfigDict, Field
 
 class TenantCreate(BaseModel):
     name: str 
@@ -127,6 +166,7 @@ class AppointmentCreate(BaseModel):
     patient_id: str
     doctor_id: str
     start_time: datetime.datetime
+    duration_minutes: int = Field(DEFAULT_SLOT_MINUTES, ge=5, le=480)
     detail: Optional[str] = None 
 
 class AppointmentUpdate(BaseModel):
@@ -154,12 +194,210 @@ class ClinicalRecordCreate(BaseModel):
     data: dict # JSON content
     date: Optional[datetime.datetime] = None
 
+# --- Response Models ---
+# Explicit response shapes: only these fields leave the API (no hashed_password, no
+# tenant_id on tenant-scoped rows), list queries select just these columns via
+# columns_for(), and FastAPI dumps them straight to JSON bytes in pydantic-core instead
+# of walking ORM objects with jsonable_encoder. (Keep the default response class: a custom
+# one such as ORJSONResponse switches that fast path off.)
+
+class ORMModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+class UserOut(ORMModel):
+    id: str
+    tenant_id: Optional[str] = None
+    username: str
+    roles: Optional[List[str]] = None
+    is_active: Optional[bool] = None
+    created_at: Optional[datetime.datetime] = None
+
+class MeOut(ORMModel):
+    id: str
+    username: str
+    roles: Optional[List[str]] = None
+    tenant_id: Optional[str] = None
+    tenant_name: str
+    logo_url: Optional[str] = None
+    is_super_admin: bool
+
+class TenantOut(ORMModel):
+    id: str
+    name: str
+    domain: Optional[str] = None
+    created_at: Optional[datetime.datetime] = None
+    is_super_admin: Optional[bool] = None
+
+class TenantListItem(ORMModel):
+    id: str
+    name: str
+    domain: Optional[str] = None
+    is_super_admin: Optional[bool] = None
+    admin_username: str
+
+class GlobalAdminOut(ORMModel):
+    id: str
+    username: str
+    clinic_name: str
+    clinic_id: str
+    is_active: Optional[bool] = None
+    created_at: Optional[datetime.datetime] = None
+
+class TenantPurgeJobOut(ORMModel):
+    id: str
+    tenant_id: str
+    tenant_name: Optional[str] = None
+    requested_by: Optional[str] = None
+    status: str
+    current_table: Optional[str] = None
+    deleted: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime.datetime] = None
+    updated_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+
+class PatientOut(ORMModel):
+    id: str
+    mrn: Optional[str] = None
+    name: str
+    dob: Optional[datetime.date] = None
+    gender: Optional[str] = None
+    mobile: Optional[str] = None
+    blood_group: Optional[str] = None
+    allergies: Optional[List[str]] = None
+    address: Optional[str] = None
+    created_at: Optional[datetime.datetime] = None
+
+class PatientTypeaheadItem(ORMModel):
+    id: str
+    name: str
+    mrn: Optional[str] = None
+
+class ClinicalRecordOut(ORMModel):
+    id: str
+    patient_id: Optional[str] = None
+    date: Optional[datetime.datetime] = None
+    type: Optional[str] = None
+    data: Optional[dict] = None
+
+class AppointmentOut(ORMModel):
+    id: str
+    patient_id: Optional[str] = None
+    doctor_id: Optional[str] = None
+    start_time: Optional[datetime.datetime] = None
+    end_time: Optional[datetime.datetime] = None
+    status: Optional[str] = None
+    reason: Optional[str] = None
+
+class AttachmentOut(ORMModel):
+    id: str
+    patient_id: Optional[str] = None
+    file_name: Optional[str] = None
+    file_url: Optional[str] = None
+    file_type: Optional[str] = None
+    uploaded_at: Optional[datetime.datetime] = None
+    sha256: Optional[str] = None
+    size_bytes: Optional[int] = None
+    content_type: Optional[str] = None
+
+class ProfileCountsOut(ORMModel):
+    clinical_records: int
+    appointments: int
+    attachments: int
+
+class PatientProfileOut(PatientOut):
+    # Latest N of each section; older items via the section endpoints, from *_next_cursor
+    counts: ProfileCountsOut
+    clinical_records: List[ClinicalRecordOut]
+    clinical_records_next_cursor: Optional[str] = None
+    appointments: List[AppointmentOut]
+    appointments_next_cursor: Optional[str] = None
+    attachments: List[AttachmentOut]
+    attachments_next_cursor: Optional[str] = None
+
+class SettingsOut(ORMModel):
+    id: str
+    tenant_id: Optional[str] = None
+    clinic_name: Optional[str] = None
+    logo_url: Optional[str] = None
+    address: Optional[str] = None
+    phone: Optional[str] = None
+    website: Optional[str] = None
+
+class PrescriptionOut(ORMModel):
+    id: str
+    appointment_id: Optional[str] = None
+    doctor_id: Optional[str] = None
+    created_at: Optional[datetime.datetime] = None
+    medications: Optional[List[dict]] = None
+    notes: Optional[str] = None
+
+class InvoiceOut(ORMModel):
+    id: str
+    appointment_id: Optional[str] = None
+    created_at: Optional[datetime.datetime] = None
+    total_amount: Optional[float] = None
+    status: Optional[str] = None
+    line_items: Optional[List[dict]] = None
+
+class DoctorOut(ORMModel):
+    id: str
+    username: str
+    roles: Optional[List[str]] = None
+
+class ClinicOut(ORMModel):
+    name: Optional[str] = None
+    address: Optional[str] = None
+    logo_url: Optional[str] = None
+
+class PrescriptionDetailsOut(ORMModel):
+    prescription: PrescriptionOut
+    patient: Optional[PatientOut] = None
+    doctor: Optional[DoctorOut] = None
+    clinic: ClinicOut
+
+class OverviewStatsOut(ORMModel):
+    total_tenants: Optional[int] = None
+    total_patients: int
+    total_staff: int
+    today_appointments: int
+    is_super_admin: Optional[bool] = None
+
+class GrowthPointOut(ORMModel):
+    name: str
+    bucket_start: datetime.date
+    clinics: int
+    patients: int
+    appointments: int
+    revenue: float
+
+def columns_for(model, schema, *extra):
+    """The model columns a response schema needs (plus e.g. a cursor sort key), for select()."""
+    names = list(schema.model_fields) + [name for name in extra if name not in schema.model_fields]
+    return [getattr(model, name) for name in names]
+
 # --- Endpoints ---
 
 @app.on_event("startup")
 async def startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # One query instead of reflecting every table; schema changes go through migrate.py
+    await migrate.check_schema()
+    await purge_service.resume_unfinished()
+    stats_service.start_reconciler()
+    read_routing.start_health_checks()
+
+@app.on_event("shutdown")
+async def shutdown():
+    password_hashing.shutdown()
+    pdf_service.shutdown()
+    stats_service.stop_reconciler()
+    growth_service.stop_backfill()
+    read_routing.stop_health_checks()
+    request_logging.shutdown_logging()
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/ping-check")
 def ping():
@@ -167,10 +405,12 @@ def ping():
 
 @app.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(User).where(User.username == form_data.username))
-    user = result.scalars().first()
-    
-    if not user or not pwd_context.verify(form_data.password, user.hashed_password):
+    result = await db.execute(select(User.username, User.hashed_password, User.is_active).where(User.username == form_data.username))
+    user = result.first()
+    # Give the connection back before bcrypt: a login burst must not hold the request pool
+    await db.rollback()
+
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
         
     if not user.is_active:
@@ -179,14 +419,15 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSessi
     token = create_access_token(data={"sub": user.username})
     return {"access_token": token, "token_type": "bearer"}
 
-@app.get("/users/me")
-async def me(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    logging.info(f"Endpoint /users/me hit for {current_user.username}")
-    tenant = await db.get(Tenant, current_user.tenant_id)
-    settings = await db.execute(select(TenantSettings).where(TenantSettings.tenant_id == current_user.tenant_id))
-    settings = settings.scalars().first()
+@app.get("/users/me", response_model=MeOut)
+async def me(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    res = await db.execute(
+        select(Tenant, TenantSettings)
+        .outerjoin(TenantSettings, TenantSettings.tenant_id == Tenant.id)
+        .where(Tenant.id == current_user.tenant_id)
+    )
+    tenant, settings = res.first() or (None, None)
     
-    logging.info(f"Tenant fetched: {tenant.name if tenant else 'None'}")
     return {
         "id": current_user.id,
         "username": current_user.username,
@@ -198,14 +439,14 @@ async def me(current_user: User = Depends(get_current_user), db: AsyncSession =
     }
 
 # --- Tenant Mgmt ---
-@app.post("/tenants")
+@app.post("/tenants", response_model=TenantOut)
 async def create_tenant(tenant: TenantCreate, db: AsyncSession = Depends(get_db)):
     domain = slugify(tenant.name) + ".clinicalos.com"
     new_tenant = Tenant(name=tenant.name, domain=domain)
     db.add(new_tenant)
     await db.flush()
     
-    hashed_pwd = pwd_context.hash(tenant.admin_password)
+    hashed_pwd = await hash_password(tenant.admin_password)
     new_admin = User(
         tenant_id=new_tenant.id,
         username=tenant.admin_username,
@@ -213,95 +454,63 @@ async def create_tenant(tenant: TenantCreate, db: AsyncSession = Depends(get_db)
         roles=["admin"]
     )
     db.add(new_admin)
+    await stats_service.bump(db, new_tenant.id, users=1, admins=1)
     await db.commit()
     await db.refresh(new_tenant)
     return new_tenant
 
-@app.get("/tenants")
-async def list_tenants(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    t = await db.get(Tenant, current_user.tenant_id)
-    if not t or not t.is_super_admin: raise HTTPException(403, "Forbidden")
-    
-    # We want Tenants + Their Admin Username
-    # SELECT t.*, u.username as admin_username FROM tenants t LEFT JOIN users u ON u.tenant_id = t.id AND u.roles ? 'admin'
-    # Simplified: Fetch tenants, then for each, fetch admin. (N+1 but fine for small N clinics).
-    # Better: Single SQL.
-    # For MVP speed, let's do the loop or a smart query.
-    
-    res = await db.execute(select(Tenant).order_by(Tenant.created_at))
-    tenants = res.scalars().all()
+@app.get("/tenants", response_model=List[TenantListItem])
+async def list_tenants(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not current_user.is_super_admin: raise HTTPException(403, "Forbidden")
     
-    output = []
-    for tenant in tenants:
-        # Find admin for this tenant
-        # We can't easily join on JSONB array in all SQL dialects effortlessly in one go without trickery
-        # So fetching admin user for each tenant is safe and clear for now.
-        admin_res = await db.execute(
-            select(User).where(User.tenant_id == tenant.id).filter(User.roles.contains(["admin"]))
-        )
-        admin = admin_res.scalars().first()
-        
-        output.append({
-            "id": tenant.id,
-            "name": tenant.name,
-            "domain": tenant.domain,
-            "is_super_admin": tenant.is_super_admin,
-            "admin_username": admin.username if admin else "N/A"
-        })
-        
-    return output
+    # Tenants + their oldest admin's username in one query (DISTINCT ON picks one admin per tenant)
+    # Tenants with a purge job are on their way out, hide them
+    admins = (
+        select(User.tenant_id, User.username)
+        .where(User.roles.contains(["admin"]))
+        .distinct(User.tenant_id)
+        .order_by(User.tenant_id, User.created_at)
+        .subquery()
+    )
+    purging = select(TenantPurgeJob.id).where(TenantPurgeJob.tenant_id == Tenant.id)
+    res = await db.execute(
+        select(Tenant.id, Tenant.name, Tenant.domain, Tenant.is_super_admin, func.coalesce(admins.c.username, "N/A").label("admin_username"))
+        .outerjoin(admins, admins.c.tenant_id == Tenant.id)
+        .where(~purging.exists())
+        .order_by(Tenant.created_at)
+    )
+    return res.all()
 
-@app.delete("/tenants/{tenant_id}")
-async def delete_tenant(tenant_id: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    t = await db.get(Tenant, current_user.tenant_id)
-    if not t or not t.is_super_admin: raise HTTPException(403, "Super Admin only")
+@app.delete("/tenants/{tenant_id}", status_code=202)
+async def delete_tenant(tenant_id: str, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not current_user.is_super_admin: raise HTTPException(403, "Super Admin only")
     
     tenant = await db.get(Tenant, tenant_id)
     if not tenant: raise HTTPException(404, "Tenant not found")
+    if tenant.id == current_user.tenant_id: raise HTTPException(400, "Cannot delete your own tenant")
     
-    # Deep Cleanup to prevent Foreign Key Violations
-    # 1. Delete dependent Clinical/Commercial Data
-    await db.execute(delete(Attachment).where(Attachment.tenant_id == tenant_id))
-    await db.execute(delete(Prescription).where(Prescription.tenant_id == tenant_id))
-    await db.execute(delete(Invoice).where(Invoice.tenant_id == tenant_id))
-    await db.execute(delete(ClinicalRecord).where(ClinicalRecord.tenant_id == tenant_id))
-    
-    # 2. Delete Core Medical Data
-    await db.execute(delete(Appointment).where(Appointment.tenant_id == tenant_id))
-    await db.execute(delete(Patient).where(Patient.tenant_id == tenant_id))
-    
-    # 3. Delete Operational Data
-    await db.execute(delete(User).where(User.tenant_id == tenant_id))
-    await db.execute(delete(TenantSettings).where(TenantSettings.tenant_id == tenant_id))
-    
-    # 4. Finally delete Tenant
-    await db.delete(tenant)
-    await db.commit()
-    return {"message": "Tenant and all associated data permanently deleted"}
+    # Deleted in the background, in FK order and bounded batches (see purge_service.py)
+    job = await enqueue_purge(db, tenant, current_user.username)
+    return {"message": "Tenant deletion started", "job_id": job.id, "status_url": f"/tenant-purges/{job.id}"}
+
+@app.get("/tenant-purges/{job_id}", response_model=TenantPurgeJobOut)
+async def get_tenant_purge(job_id: str, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not current_user.is_super_admin: raise HTTPException(403, "Super Admin only")
+    job = await db.get(TenantPurgeJob, job_id)
+    if not job: raise HTTPException(404, "Purge job not found")
+    return job
 
 @app.post("/tenants/{tenant_id}/impersonate")
-async def impersonate_tenant(tenant_id: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    # 1. Verify Super Admin
-    # Note: We need to verify is_super_admin. The current User model might not have it attached directly on the object 
-    # if it wasn't loaded with the tenant. But our previous fix to /users/me implies we check the tenant.
-    # Let's fetch the user's tenant to be sure, or trust that the 'proper' way is to check the relation.
-    # For now, let's just do a quick DB check to be safe.
-    admin_tenant = await db.get(Tenant, current_user.tenant_id)
-    if not admin_tenant or not admin_tenant.is_super_admin:
+async def impersonate_tenant(tenant_id: str, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # 1. Verify Super Admin (tenant flag is carried on the cached principal)
+    if not current_user.is_super_admin:
          raise HTTPException(403, "Super Admin only")
 
-    # 2. Find Target Tenant Admin
-    # We look for ANY user in that tenant with role 'admin'
-    # JSONB contains check:
-    stmt = select(User).where(User.tenant_id == tenant_id).limit(1)
-    # We need to filter for admin role. In python is easier than JSONB sql for now
-    res = await db.execute(stmt)
-    users = await db.execute(select(User).where(User.tenant_id == tenant_id))
-    target_user = None
-    for u in users.scalars():
-        if "admin" in u.roles:
-            target_user = u
-            break
+    # 2. Find Target Tenant Admin (oldest user in that tenant with role 'admin', JSONB containment)
+    res = await db.execute(
+        select(User).where(User.tenant_id == tenant_id, User.roles.contains(["admin"])).order_by(User.created_at).limit(1)
+    )
+    target_user = res.scalars().first()
     
     if not target_user:
         raise HTTPException(404, "No admin user found for this tenant")
@@ -311,40 +520,35 @@ async def impersonate_tenant(tenant_id: str, current_user: User = Depends(get_cu
     return {"access_token": token, "token_type": "bearer"}
 
 # --- User Mgmt ---
-@app.get("/users")
-async def list_users(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    res = await db.execute(select(User).where(User.tenant_id == current_user.tenant_id))
-    return res.scalars().all()
-
-@app.get("/users/global-admins")
-async def list_global_admins(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    t = await db.get(Tenant, current_user.tenant_id)
-    if not t or not t.is_super_admin: raise HTTPException(403, "Super Admin only")
+@app.get("/users", response_model=List[UserOut])
+async def list_users(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    res = await db.execute(select(*columns_for(User, UserOut)).where(User.tenant_id == current_user.tenant_id))
+    return res.all()
+
+@app.get("/users/global-admins", response_model=List[GlobalAdminOut])
+async def list_global_admins(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not current_user.is_super_admin: raise HTTPException(403, "Super Admin only")
     
     # Fetch all users with 'admin' role, joined with Tenant info
     # Note: JSONB filtering in SQLA can be tricky, simplified to fetch all admins and join in app or simple join
     # For now, let's just fetch all users and filter in python or do a join if possible.
     # A cleaner way:
-    stmt = select(User, Tenant).join(Tenant, User.tenant_id == Tenant.id).where(User.roles.contains(["admin"]))
+    stmt = (
+        select(User.id, User.username, Tenant.name.label("clinic_name"), Tenant.id.label("clinic_id"), User.is_active, User.created_at)
+        .join(Tenant, User.tenant_id == Tenant.id).where(User.roles.contains(["admin"]))
+    )
     res = await db.execute(stmt)
-    
-    # Format response
-    admins = []
-    for user, tenant in res:
-        admins.append({
-            "id": user.id,
-            "username": user.username,
-            "clinic_name": tenant.name,
-            "clinic_id": tenant.id,
-            "is_active": user.is_active,
-            "created_at": user.created_at
-        })
-    return admins
-
-@app.post("/users")
-async def add_user(user: UserCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    t = await db.get(Tenant, current_user.tenant_id)
-    is_super = t.is_super_admin if t else False
+    return res.all()
+
+@app.get("/users/by-role", response_model=List[UserOut])
+async def list_users_by_role(role: str = Query(..., min_length=1), current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    # e.g. role=doctor for the booking form; GIN (tenant_id, roles jsonb_path_ops)
+    res = await db.execute(users_with_role(current_user.tenant_id, role.strip(), columns_for(User, UserOut)).order_by(User.username))
+    return res.all()
+
+@app.post("/users", response_model=UserOut)
+async def add_user(user: UserCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    is_super = current_user.is_super_admin
     
     if not is_super and "admin" not in current_user.roles: 
         raise HTTPException(403, "Admin only")
@@ -352,20 +556,20 @@ async def add_user(user: UserCreate, current_user: User = Depends(get_current_us
     new_user = User(
         tenant_id=current_user.tenant_id,
         username=user.username,
-        hashed_password=pwd_context.hash(user.password),
+        hashed_password=await hash_password(user.password),
         roles=user.roles
     )
     try:
         db.add(new_user)
+        await stats_service.bump(db, current_user.tenant_id, users=1, admins=int("admin" in user.roles))
         await db.commit()
         return new_user
     except IntegrityError:
         raise HTTPException(400, "Username taken")
 
 @app.patch("/users/{user_id}")
-async def update_user(user_id: str, updates: UserUpdate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    t = await db.get(Tenant, current_user.tenant_id)
-    is_super = t.is_super_admin if t else False
+async def update_user(user_id: str, updates: UserUpdate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    is_super = current_user.is_super_admin
 
     if not is_super and "admin" not in current_user.roles: 
         raise HTTPException(403, "Admin only")
@@ -373,42 +577,41 @@ async def update_user(user_id: str, updates: UserUpdate, current_user: User = De
     user = await db.get(User, user_id)
     if not user or user.tenant_id != current_user.tenant_id: raise HTTPException(404, "User not found")
     
-    if updates.roles is not None: user.roles = updates.roles
+    if updates.roles is not None:
+        admin_delta = int("admin" in updates.roles) - int("admin" in (user.roles or []))
+        if admin_delta: await stats_service.bump(db, user.tenant_id, admins=admin_delta)
+        user.roles = updates.roles
     if updates.is_active is not None: user.is_active = updates.is_active
     
     await db.commit()
+    auth_cache.invalidate_user(user.username)
     return {"message": "User updated"}
 
 @app.post("/users/{user_id}/reset-password")
-async def reset_user_password(user_id: str, payload: dict, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def reset_user_password(user_id: str, payload: dict, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     # Verify Admin or Super Admin
-    if "admin" not in current_user.roles:
-        # Check if Tenant Super Admin
-        t = await db.get(Tenant, current_user.tenant_id)
-        if not t or not t.is_super_admin:
-            raise HTTPException(403, "Admin Only")
+    if "admin" not in current_user.roles and not current_user.is_super_admin:
+        raise HTTPException(403, "Admin Only")
 
     user = await db.get(User, user_id)
     if not user: raise HTTPException(404, "User not found")
     
     # Check tenant isolation
-    if user.tenant_id != current_user.tenant_id and not (await db.get(Tenant, current_user.tenant_id)).is_super_admin:
+    if user.tenant_id != current_user.tenant_id and not current_user.is_super_admin:
         raise HTTPException(403, "Cannot manage users of other tenants")
 
     new_pw = payload.get("password")
     if not new_pw: raise HTTPException(400, "Password required")
     
-    user.hashed_password = get_password_hash(new_pw)
+    user.hashed_password = await hash_password(new_pw)
     await db.commit()
+    auth_cache.invalidate_user(user.username)
     return {"message": "Password updated"}
 
 @app.delete("/users/{user_id}")
-async def delete_user(user_id: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def delete_user(user_id: str, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     # 1. Permission Check
-    is_super = False
-    tenant = await db.get(Tenant, current_user.tenant_id)
-    if tenant and tenant.is_super_admin:
-        is_super = True
+    is_super = current_user.is_super_admin
     
     if not is_super and "admin" not in current_user.roles:
         raise HTTPException(403, "Admin privileges required")
@@ -426,68 +629,70 @@ async def delete_user(user_id: str, current_user: User = Depends(get_current_use
         raise HTTPException(400, "Cannot delete yourself")
         
     await db.delete(user)
+    await stats_service.bump(db, user.tenant_id, users=-1, admins=-int("admin" in (user.roles or [])))
     await db.commit()
+    auth_cache.invalidate_user(user.username)
     return {"message": "User deleted successfully"}
 
-@app.delete("/tenants/{tenant_id}")
-async def delete_tenant(tenant_id: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    t = await db.get(Tenant, current_user.tenant_id)
-    if not t or not t.is_super_admin: raise HTTPException(403, "Super Admin only")
-    
-    tenant = await db.get(Tenant, tenant_id)
-    if not tenant: raise HTTPException(404, "Tenant not found")
-    
-    # Deep Cleanup to prevent Foreign Key Violations
-    # 1. Delete dependent Clinical/Commercial Data
-    await db.execute(delete(Attachment).where(Attachment.tenant_id == tenant_id))
-    await db.execute(delete(Prescription).where(Prescription.tenant_id == tenant_id))
-    await db.execute(delete(Invoice).where(Invoice.tenant_id == tenant_id))
-    await db.execute(delete(ClinicalRecord).where(ClinicalRecord.tenant_id == tenant_id))
-    
-    # 2. Delete Core Medical Data
-    await db.execute(delete(Appointment).where(Appointment.tenant_id == tenant_id))
-    await db.execute(delete(Patient).where(Patient.tenant_id == tenant_id))
-    
-    # 3. Delete Operational Data
-    await db.execute(delete(User).where(User.tenant_id == tenant_id))
-    await db.execute(delete(TenantSettings).where(TenantSettings.tenant_id == tenant_id))
-    
-    # 4. Finally delete Tenant
-    await db.delete(tenant)
-    await db.commit()
-    return {"message": "Tenant and all associated data permanently deleted"}
-
 # --- Patient Mgmt ---
-@app.get("/patients")
-async def list_patients(skip: int = 0, limit: int = 100, q: Optional[str] = None, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    query = select(Patient).where(Patient.tenant_id == current_user.tenant_id)
+@app.get("/patients", response_model=List[PatientOut])
+async def list_patients(response: Response, skip: int = 0, limit: int = Query(100, ge=1, le=500), q: Optional[str] = None, cursor: Optional[str] = None, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
     if q:
-        search_term = f"%{q}%"
-        query = query.where(or_(Patient.name.ilike(search_term), Patient.mrn.ilike(search_term)))
-    query = query.offset(skip).limit(limit)
+        return await search_patients(db, current_user.tenant_id, q, limit=limit, skip=skip, columns=columns_for(Patient, PatientOut))
+    # Newest first, keyset-paged on (created_at, id). `skip` is still honoured for old clients.
+    query = select(*columns_for(Patient, PatientOut)).where(Patient.tenant_id == current_user.tenant_id)
+    query = keyset_query(query, Patient.created_at, Patient.id, cursor, limit, skip=0 if cursor else skip)
     res = await db.execute(query)
-    return res.scalars().all()
-
-@app.post("/patients")
-async def create_patient(p: PatientCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    mrn = generate_mrn() 
-    new_p = Patient(
-        tenant_id=current_user.tenant_id,
-        mrn=mrn,
-        name=p.name,
-        mobile=p.mobile,
-        dob=p.dob,
-        gender=p.gender,
-        blood_group=p.blood_group,
-        allergies=p.allergies,
-        address=p.address
-    )
-    db.add(new_p)
-    await db.commit()
+    patients, next_cursor = split_page(res.all(), limit, "created_at")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return patients
+
+@app.get("/patients/typeahead", response_model=List[PatientTypeaheadItem])
+async def patient_typeahead(q: str, limit: int = Query(10, le=50), current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    # Lightweight search-as-you-type: only id / name / MRN
+    return await search_patients(db, current_user.tenant_id, q, limit=limit, typeahead=True)
+
+@app.get("/patients/by-allergy", response_model=List[PatientOut])
+async def list_patients_by_allergy(response: Response, allergen: str = Query(..., min_length=1), limit: int = Query(100, ge=1, le=500), cursor: Optional[str] = None, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    # Exact allergen as recorded (e.g. "Penicillin"), newest patients first, keyset-paged
+    query = patients_with_allergy(current_user.tenant_id, allergen.strip(), columns_for(Patient, PatientOut))
+    res = await db.execute(keyset_query(query, Patient.created_at, Patient.id, cursor, limit))
+    patients, next_cursor = split_page(res.all(), limit, "created_at")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return patients
+
+@app.post("/patients", response_model=PatientOut)
+async def create_patient(p: PatientCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # MRNs come from a preallocated per-tenant block; a conflict can only be an MRN a clinic
+    # imported in our format, so take the next one
+    for attempt in range(3):
+        new_p = Patient(
+            tenant_id=current_user.tenant_id,
+            mrn=await mrn_allocator.next_mrn(current_user.tenant_id),
+            name=p.name,
+            mobile=p.mobile,
+            dob=p.dob,
+            gender=p.gender,
+            blood_group=p.blood_group,
+            allergies=p.allergies,
+            address=p.address
+        )
+        db.add(new_p)
+        try:
+            # The counter bump autoflushes the INSERT, so an MRN conflict can surface there already
+            await stats_service.bump(db, current_user.tenant_id, patients=1)
+            await db.commit()
+            break
+        except IntegrityError as exc:
+            await db.rollback()
+            if not mrn_allocator.is_mrn_conflict(exc) or attempt == 2: raise
+            mrn_allocator.discard_block(current_user.tenant_id)  # the block overlaps imported MRNs
     return new_p
 
-@app.patch("/patients/{id}")
-async def update_patient(id: str, p: PatientUpdate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+@app.patch("/patients/{id}", response_model=PatientOut)
+async def update_patient(id: str, p: PatientUpdate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     patient = await db.get(Patient, id)
     if not patient or patient.tenant_id != current_user.tenant_id: raise HTTPException(404, "Not found")
     
@@ -497,20 +702,45 @@ async def update_patient(id: str, p: PatientUpdate, current_user: User = Depends
     await db.commit()
     return patient
 
-@app.get("/patients/{id}/profile")
-async def get_patient_profile(id: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    stmt = select(Patient).where(Patient.id == id, Patient.tenant_id == current_user.tenant_id).options(
-            selectinload(Patient.clinical_records),
-            selectinload(Patient.appointments),
-            selectinload(Patient.attachments)
-    )
-    res = await db.execute(stmt)
-    patient = res.scalars().first()
-    if not patient: raise HTTPException(404, "Patient not found")
-    return patient
-
-@app.post("/patients/{id}/records")
-async def add_clinical_record(id: str, record: ClinicalRecordCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+# Profile sections select only their response schema's columns; `fields=` narrows them
+# further and the unselected fields are left out of the response (exclude_unset)
+PROFILE_SECTION_COLUMNS = {
+    "clinical_records": columns_for(ClinicalRecord, ClinicalRecordOut),
+    "appointments": columns_for(Appointment, AppointmentOut),
+    "attachments": columns_for(Attachment, AttachmentOut),
+}
+
+@app.get("/patients/{id}/profile", response_model=PatientProfileOut, response_model_exclude_unset=True)
+async def get_patient_profile(id: str, latest: int = Query(20, ge=0, le=100), fields: Optional[str] = None, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    # Bounded summary: patient, per-section counts and the latest N of each section.
+    # Older items come from the paginated section endpoints below; `fields` projects clinical_records.
+    profile = await profile_summary(db, id, current_user.tenant_id, latest, columns_for(Patient, PatientOut), PROFILE_SECTION_COLUMNS, fields=fields)
+    if not profile: raise HTTPException(404, "Patient not found")
+    return profile
+
+@app.get("/patients/{id}/records", response_model=List[ClinicalRecordOut], response_model_exclude_unset=True)
+async def list_clinical_records(id: str, response: Response, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None, fields: Optional[str] = None, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    return await _profile_section("clinical_records", id, response, limit, cursor, fields, current_user, db)
+
+@app.get("/patients/{id}/appointments", response_model=List[AppointmentOut], response_model_exclude_unset=True)
+async def list_patient_appointments(id: str, response: Response, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None, fields: Optional[str] = None, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    return await _profile_section("appointments", id, response, limit, cursor, fields, current_user, db)
+
+@app.get("/patients/{id}/attachments", response_model=List[AttachmentOut], response_model_exclude_unset=True)
+async def list_patient_attachments(id: str, response: Response, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None, fields: Optional[str] = None, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    return await _profile_section("attachments", id, response, limit, cursor, fields, current_user, db)
+
+async def _profile_section(section, patient_id, response, limit, cursor, fields, current_user, db):
+    items, next_cursor = await fetch_section(db, section, patient_id, current_user.tenant_id, limit, PROFILE_SECTION_COLUMNS[section], cursor=cursor, fields=fields)
+    # An empty page is also what an unknown / other tenant's patient gives: tell them apart
+    if not items and not await db.scalar(select(Patient.id).where(Patient.id == patient_id, Patient.tenant_id == current_user.tenant_id)):
+        raise HTTPException(404, "Patient not found")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return items
+
+@app.post("/patients/{id}/records", response_model=ClinicalRecordOut)
+async def add_clinical_record(id: str, record: ClinicalRecordCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     patient = await db.get(Patient, id)
     if not patient or patient.tenant_id != current_user.tenant_id: raise HTTPException(404, "Patient not found")
     
@@ -523,59 +753,172 @@ async def add_clinical_record(id: str, record: ClinicalRecordCreate, current_use
     )
     db.add(new_record)
     await db.commit()
+    vitals_service.invalidate(current_user.tenant_id, id)
     return new_record
 
+@app.get("/patients/{id}/vitals")
+async def get_vitals_series(id: str, fields: Optional[str] = None, bucket: str = Query("raw", pattern="^(raw|hour|day|week)$"), points: int = Query(500, ge=3, le=5000), start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    # { field: { t, min, max, mean, last, count } }, at most `points` entries per field
+    wanted = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    return await vitals_service.patient_series(db, current_user.tenant_id, id, wanted, bucket, points, start, end)
+
+# --- Bulk Import ---
+@app.post("/import/{kind}")
+async def bulk_import(kind: str, file: UploadFile = File(...), format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"), current_user: Principal = Depends(get_current_user)):
+    # CSV / NDJSON onboarding: chunked COPY, per-row error report (see import_service.py)
+    if kind not in IMPORTERS: raise HTTPException(404, "Unknown import type")
+    if "admin" not in current_user.roles: raise HTTPException(403, "Admin only")
+
+    fmt = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "ndjson")
+    result = await import_stream(kind, current_user.tenant_id, iter_rows(file.file, fmt))
+    read_routing.note_write(current_user.id)  # COPY goes through the driver, unseen by the commit tracking
+    return result
+
+# --- Export ---
+@app.get("/export/{kind}")
+async def export_tenant_data(kind: str, format: str = Query("ndjson", pattern="^(ndjson|csv)$"), since: Optional[datetime.datetime] = None, tenant_id: Optional[str] = None, current_user: Principal = Depends(get_current_user)):
+    # kind: one of EXPORTS or "all" (NDJSON only). Streams row by row from server-side cursors.
+    if "admin" not in current_user.roles and not current_user.is_super_admin: raise HTTPException(403, "Admin only")
+    if tenant_id and tenant_id != current_user.tenant_id and not current_user.is_super_admin:
+        raise HTTPException(403, "Cannot export other tenants")
+    tenant_id = tenant_id or current_user.tenant_id
+
+    kinds = list(EXPORTS) if kind == "all" else [kind]
+    if any(k not in EXPORTS for k in kinds): raise HTTPException(404, "Unknown export type")
+
+    if format == "csv":
+        if len(kinds) != 1: raise HTTPException(400, "CSV export is per table")
+        body, media_type = export_csv(kind, tenant_id, since), "text/csv"
+    else:
+        body, media_type = export_ndjson(kinds, tenant_id, since), "application/x-ndjson"
+    filename = f"{kind}-{datetime.date.today().isoformat()}.{format}"
+    return StreamingResponse(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
 # --- Appointment Engine ---
-@app.get("/appointments")
-async def list_appointments(start_date: Optional[datetime.date] = None, end_date: Optional[datetime.date] = None, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    query = select(Appointment).where(Appointment.tenant_id == current_user.tenant_id)
+@app.get("/appointments", response_model=List[AppointmentOut])
+async def list_appointments(response: Response, start_date: Optional[datetime.date] = None, end_date: Optional[datetime.date] = None, limit: int = Query(200, ge=1, le=1000), cursor: Optional[str] = None, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    query = select(*columns_for(Appointment, AppointmentOut)).where(Appointment.tenant_id == current_user.tenant_id)
     if start_date: query = query.where(Appointment.start_time >= start_date)
     if end_date: query = query.where(Appointment.start_time <= end_date)
-    query = query.order_by(desc(Appointment.start_time)).limit(200)
+    # Latest first, keyset-paged on (start_time, id); follow X-Next-Cursor for the rest of the range
+    query = keyset_query(query, Appointment.start_time, Appointment.id, cursor, limit)
     res = await db.execute(query)
-    return res.scalars().all()
+    appointments, next_cursor = split_page(res.all(), limit, "start_time")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return appointments
 
-@app.post("/appointments")
-async def schedule_appointment(appt: AppointmentCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+@app.post("/appointments", response_model=AppointmentOut)
+async def schedule_appointment(appt: AppointmentCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     new_appt = Appointment(
         tenant_id=current_user.tenant_id,
         patient_id=appt.patient_id,
         doctor_id=appt.doctor_id,
         start_time=appt.start_time,
-        end_time=appt.start_time + datetime.timedelta(minutes=30), 
+        end_time=appt.start_time + datetime.timedelta(minutes=appt.duration_minutes), 
         reason=appt.detail
     )
     db.add(new_appt)
-    await db.commit()
+    try:
+        # Overlaps are rejected by the exclusion constraint, so concurrent bookings are race-safe.
+        # The counter bump autoflushes the INSERT, so a conflict can surface there already.
+        await stats_service.bump_appointments(db, current_user.tenant_id, appt.start_time.date())
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        if is_overlap_violation(exc): raise HTTPException(409, "Doctor already has an appointment in this slot")
+        raise
     return new_appt
 
 @app.patch("/appointments/{id}")
-async def update_appointment(id: str, update: AppointmentUpdate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    appt = await db.get(Appointment, id)
-    if not appt or appt.tenant_id != current_user.tenant_id: raise HTTPException(404, "Not found")
+async def update_appointment(id: str, update: AppointmentUpdate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    appt = await db.get(Appointment, (current_user.tenant_id, id))
+    if not appt: raise HTTPException(404, "Not found")
     appt.status = update.status
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError as exc:
+        # e.g. re-activating a cancelled appointment whose slot has been taken since
+        await db.rollback()
+        if is_overlap_violation(exc): raise HTTPException(409, "Doctor already has an appointment in this slot")
+        raise
     return {"message": "Status updated"}
 
+# --- Availability ---
+@app.get("/doctors/availability")
+async def get_doctors_availability(doctor_ids: str, start_date: datetime.date, end_date: datetime.date, slot_minutes: int = Query(DEFAULT_SLOT_MINUTES, ge=5, le=480), day_start: datetime.time = datetime.time(9, 0), day_end: datetime.time = datetime.time(17, 0), current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    # Week view: free slots for several doctors (comma-separated ids) in one query
+    ids = [d.strip() for d in doctor_ids.split(",") if d.strip()]
+    if not ids or len(ids) > 100: raise HTTPException(400, "Pass between 1 and 100 doctor_ids")
+    if end_date < start_date or (end_date - start_date).days > 31: raise HTTPException(400, "Date range must be 0-31 days")
+    return await free_slots(db, current_user.tenant_id, ids, start_date, end_date, slot_minutes, day_start, day_end)
+
+@app.get("/doctors/{id}/availability")
+async def get_doctor_availability(id: str, start_date: datetime.date, end_date: datetime.date, slot_minutes: int = Query(DEFAULT_SLOT_MINUTES, ge=5, le=480), day_start: datetime.time = datetime.time(9, 0), day_end: datetime.time = datetime.time(17, 0), current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    if end_date < start_date or (end_date - start_date).days > 31: raise HTTPException(400, "Date range must be 0-31 days")
+    if not await db.scalar(select(User.id).where(User.id == id, User.tenant_id == current_user.tenant_id)):
+        raise HTTPException(404, "Doctor not found")
+    slots = await free_slots(db, current_user.tenant_id, [id], start_date, end_date, slot_minutes, day_start, day_end)
+    return slots[id]
+
 # --- Attachments ---
-@app.post("/patients/{id}/attachments")
-async def upload_attachment(id: str, file_name: str, file_type: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    mock_url = f"https://mock-storage.clinicalos.com/{uuid.uuid4()}/{file_name}"
+@app.post("/patients/{id}/attachments", response_model=AttachmentOut)
+async def upload_attachment(id: str, request: Request, file_name: str, file_type: Optional[str] = None, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # The request body is the raw file; it is streamed to disk, never held in memory
+    if not await db.scalar(select(Patient.id).where(Patient.id == id, Patient.tenant_id == current_user.tenant_id)):
+        raise HTTPException(404, "Patient not found")
+    # End the transaction so the pooled connection is not held idle while the body streams in
+    await db.rollback()
+
+    content_length = request.headers.get("content-length")
+    staged = await attachment_store.stage_upload(request.stream(), int(content_length) if content_length else None)
+    key, created = await attachment_store.save(current_user.tenant_id, staged)
+
+    content_type = request.headers.get("content-type", "application/octet-stream").split(";")[0].strip()
+    attach_id = str(uuid.uuid4())
     attach = Attachment(
+        id=attach_id,
         tenant_id=current_user.tenant_id,
         patient_id=id,
         file_name=file_name,
-        file_url=mock_url,
-        file_type=file_type
+        file_url=f"/attachments/{attach_id}/content",
+        file_type=file_type or content_type.rpartition("/")[2],
+        sha256=staged.sha256,
+        size_bytes=staged.size,
+        content_type=content_type,
+        storage_key=key,
     )
-    db.add(attach)
-    await db.commit()
+    try:
+        await attachment_store.lock_blob(db, key)  # until commit: see attachment_store.py
+        if not created:
+            created = await attachment_store.ensure_stored(key, staged)
+        db.add(attach)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        # Drop a blob this upload stored, unless an identical upload committed a row for it
+        if created:
+            await attachment_store.lock_blob(db, key)
+            if not await db.scalar(select(Attachment.id).where(Attachment.tenant_id == current_user.tenant_id, Attachment.storage_key == key).limit(1)):
+                await attachment_store.discard(key)
+            await db.commit()
+        raise
+    finally:
+        await attachment_store.remove_staged(staged)
     return attach
 
+@app.get("/attachments/{id}/content")
+async def download_attachment(id: str, if_none_match: Optional[str] = Header(None), current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # Range / If-Range, ETag (the SHA-256) and If-None-Match; see attachment_store.py
+    attach = await db.get(Attachment, id)
+    if not attach or attach.tenant_id != current_user.tenant_id: raise HTTPException(404, "Attachment not found")
+    if not attach.storage_key: raise HTTPException(404, "Attachment has no stored content")
+    return attachment_store.download(attach, if_none_match)
+
 # --- COMMERCIAL LAYER ENDPOINTS ---
 
-@app.get("/settings")
-async def get_settings(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+@app.get("/settings", response_model=SettingsOut)
+async def get_settings(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     settings = await db.execute(select(TenantSettings).where(TenantSettings.tenant_id == current_user.tenant_id))
     settings = settings.scalars().first()
     
@@ -588,8 +931,8 @@ async def get_settings(current_user: User = Depends(get_current_user), db: Async
         
     return settings
 
-@app.patch("/settings")
-async def update_settings(update: SettingsUpdate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+@app.patch("/settings", response_model=SettingsOut)
+async def update_settings(update: SettingsUpdate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     if "admin" not in current_user.roles: raise HTTPException(403, "Admin only")
     
     settings = await db.execute(select(TenantSettings).where(TenantSettings.tenant_id == current_user.tenant_id))
@@ -601,14 +944,14 @@ async def update_settings(update: SettingsUpdate, current_user: User = Depends(g
     await db.commit()
     return settings
 
-@app.post("/appointments/{id}/prescriptions")
-async def create_prescription(id: str, rx: PrescriptionCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    appt = await db.get(Appointment, id)
-    if not appt or appt.tenant_id != current_user.tenant_id: raise HTTPException(404, "Appointment not found")
+@app.post("/appointments/{id}/prescriptions", response_model=PrescriptionOut)
+async def create_prescription(id: str, rx: PrescriptionCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    appt = await db.get(Appointment, (current_user.tenant_id, id))
+    if not appt: raise HTTPException(404, "Appointment not found")
     
     # Check if exists
-    existing = await db.execute(select(Prescription).where(Prescription.appointment_id == id))
-    if existing.scalars().first(): raise HTTPException(400, "Prescription already exists")
+    existing = await db.execute(select(Prescription.id).where(Prescription.appointment_id == id).limit(1))
+    if existing.first(): raise HTTPException(400, "Prescription already exists")
     
     new_rx = Prescription(
         tenant_id=current_user.tenant_id,
@@ -621,23 +964,43 @@ async def create_prescription(id: str, rx: PrescriptionCreate, current_user: Use
     await db.commit()
     return new_rx
 
-@app.get("/prescriptions/{id}/details")
-async def get_prescription_details(id: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    # Fetch Data deeply
-    stmt = select(Prescription).where(Prescription.id == id, Prescription.tenant_id == current_user.tenant_id).options(
-        selectinload(Prescription.appointment)
+@app.get("/prescriptions/by-drug", response_model=List[PrescriptionOut])
+async def list_prescriptions_by_drug(response: Response, drug: str = Query(..., min_length=1), limit: int = Query(100, ge=1, le=500), cursor: Optional[str] = None, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    # Prescriptions with this drug in any medication line, newest first, keyset-paged
+    query = prescriptions_with_drug(current_user.tenant_id, drug.strip(), columns_for(Prescription, PrescriptionOut))
+    res = await db.execute(keyset_query(query, Prescription.created_at, Prescription.id, cursor, limit))
+    prescriptions, next_cursor = split_page(res.all(), limit, "created_at")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return prescriptions
+
+def prescription_rows(tenant_id: str, *criteria):
+    # Prescription, appointment, patient, doctor, tenant and settings in one round-trip
+    return (
+        select(Prescription, Patient, User, Tenant, TenantSettings)
+        .join(Prescription.appointment)
+        .outerjoin(Patient, Patient.id == Appointment.patient_id)
+        .outerjoin(User, User.id == Prescription.doctor_id)
+        .join(Tenant, Tenant.id == Prescription.tenant_id)
+        .outerjoin(TenantSettings, TenantSettings.tenant_id == Prescription.tenant_id)
+        # Appointment.tenant_id prunes appointments to the tenant's partition
+        .where(Prescription.tenant_id == tenant_id, Appointment.tenant_id == tenant_id, *criteria)
+        .options(contains_eager(Prescription.appointment))
     )
-    res = await db.execute(stmt)
-    rx = res.scalars().first()
-    if not rx: raise HTTPException(404, "Prescription not found")
-    
-    # Fetch Related
-    tenant = await db.get(Tenant, rx.tenant_id)
-    settings = await db.execute(select(TenantSettings).where(TenantSettings.tenant_id == rx.tenant_id))
-    settings = settings.scalars().first()
-    
-    doctor = await db.get(User, rx.doctor_id)
-    patient = await db.get(Patient, rx.appointment.patient_id)
+
+def pdf_response(path: str, key: str, filename: str, if_none_match: Optional[str]):
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="application/pdf", filename=filename, headers=headers)
+
+@app.get("/prescriptions/{id}/details", response_model=PrescriptionDetailsOut)
+async def get_prescription_details(id: str, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    res = await db.execute(prescription_rows(current_user.tenant_id, Prescription.id == id))
+    row = res.first()
+    if not row: raise HTTPException(404, "Prescription not found")
+    rx, patient, doctor, tenant, settings = row
     
     return {
         "prescription": rx,
@@ -650,10 +1013,58 @@ async def get_prescription_details(id: str, current_user: User = Depends(get_cur
         }
     }
 
-@app.post("/appointments/{id}/invoices")
-async def create_invoice(id: str, inv: InvoiceCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    appt = await db.get(Appointment, id)
-    if not appt or appt.tenant_id != current_user.tenant_id: raise HTTPException(404, "Appointment not found")
+@app.get("/prescriptions/daily.pdf")
+async def get_daily_prescriptions_pdf(
+    day: datetime.date,
+    doctor_id: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # Every prescription for the day's appointments (optionally one doctor's), one page each
+    start = datetime.datetime.combine(day, datetime.time.min)
+    criteria = [Appointment.start_time >= start, Appointment.start_time < start + datetime.timedelta(days=1)]
+    if doctor_id:
+        criteria.append(Prescription.doctor_id == doctor_id)
+    stmt = prescription_rows(current_user.tenant_id, *criteria).order_by(Appointment.start_time, Prescription.id).limit(pdf_service.PDF_BATCH_LIMIT + 1)
+    rows = (await db.execute(stmt)).all()
+    if not rows: raise HTTPException(404, "No prescriptions for this day")
+    if len(rows) > pdf_service.PDF_BATCH_LIMIT:
+        raise HTTPException(400, f"More than {pdf_service.PDF_BATCH_LIMIT} prescriptions, filter by doctor_id")
+
+    docs = [pdf_service.prescription_doc(*row) for row in rows]
+    path, key = await pdf_service.render(current_user.tenant_id, "prescription", docs)
+    return pdf_response(path, key, f"prescriptions-{day.isoformat()}.pdf", if_none_match)
+
+@app.get("/prescriptions/{id}/pdf")
+async def get_prescription_pdf(id: str, if_none_match: Optional[str] = Header(None), current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    res = await db.execute(prescription_rows(current_user.tenant_id, Prescription.id == id))
+    row = res.first()
+    if not row: raise HTTPException(404, "Prescription not found")
+
+    path, key = await pdf_service.render(current_user.tenant_id, "prescription", [pdf_service.prescription_doc(*row)])
+    return pdf_response(path, key, f"prescription-{id[:8]}.pdf", if_none_match)
+
+@app.get("/invoices/{id}/pdf")
+async def get_invoice_pdf(id: str, if_none_match: Optional[str] = Header(None), current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    stmt = (
+        select(Invoice, Patient, Tenant, TenantSettings)
+        .join(Appointment, (Appointment.tenant_id == Invoice.tenant_id) & (Appointment.id == Invoice.appointment_id))
+        .outerjoin(Patient, Patient.id == Appointment.patient_id)
+        .join(Tenant, Tenant.id == Invoice.tenant_id)
+        .outerjoin(TenantSettings, TenantSettings.tenant_id == Invoice.tenant_id)
+        .where(Invoice.id == id, Invoice.tenant_id == current_user.tenant_id, Appointment.tenant_id == current_user.tenant_id)
+    )
+    row = (await db.execute(stmt)).first()
+    if not row: raise HTTPException(404, "Invoice not found")
+
+    path, key = await pdf_service.render(current_user.tenant_id, "invoice", [pdf_service.invoice_doc(*row)])
+    return pdf_response(path, key, f"invoice-{id[:8]}.pdf", if_none_match)
+
+@app.post("/appointments/{id}/invoices", response_model=InvoiceOut)
+async def create_invoice(id: str, inv: InvoiceCreate, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    appt = await db.get(Appointment, (current_user.tenant_id, id))
+    if not appt: raise HTTPException(404, "Appointment not found")
     
     # Calculate Total
     total = sum(item["amount"] for item in inv.line_items)
@@ -669,27 +1080,15 @@ async def create_invoice(id: str, inv: InvoiceCreate, current_user: User = Depen
     await db.commit()
     return new_inv
 
-@app.get("/stats/overview")
-async def get_overview_stats(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+@app.get("/stats/overview", response_model=OverviewStatsOut, response_model_exclude_none=True)
+async def get_overview_stats(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
     # Check if Super Admin
-    t = await db.get(Tenant, current_user.tenant_id)
-    is_super = t.is_super_admin if t else False
+    is_super = current_user.is_super_admin
 
+    # O(1) reads from the rollups maintained by the write endpoints (see stats_service.py)
     if is_super:
-        # Global Stats
-        # 1. Active Clinics (Exclude the Super Admin tenant itself)
-        total_tenants = await db.scalar(select(func.count(Tenant.id)).where(Tenant.is_super_admin == False))
-        
-        # 2. Total Ecosystem Patients
-        total_patients = await db.scalar(select(func.count(Patient.id)))
-        
-        # 3. Hospital Admins (Users with 'admin' role in non-super tenants)
-        # JOIN User -> Tenant to check is_super_admin is False
-        stmt = select(func.count(User.id)).join(Tenant, User.tenant_id == Tenant.id).where(
-            Tenant.is_super_admin == False,
-            User.roles.contains(["admin"]) # Using contains for ARRAY type
-        )
-        total_clinic_admins = await db.scalar(stmt)
+        # Global Stats: clinics (excluding the Super Admin tenant), ecosystem patients, clinic admins
+        total_tenants, total_patients, total_clinic_admins = await stats_service.platform_overview(db)
         
         return {
             "total_tenants": total_tenants,
@@ -699,23 +1098,7 @@ async def get_overview_stats(current_user: User = Depends(get_current_user), db:
         }
 
     # CLINIC ADMIN VIEW (Tenant Stats)
-    # 1. Total Patients
-    res_pat = await db.execute(select(func.count(Patient.id)).where(Patient.tenant_id == current_user.tenant_id))
-    total_patients = res_pat.scalar()
-    
-    # 2. Staff Count
-    res_staff = await db.execute(select(func.count(User.id)).where(User.tenant_id == current_user.tenant_id))
-    total_staff = res_staff.scalar()
-
-    # 3. Today's Appointments
-    today = datetime.date.today()
-    tomorrow = today + datetime.timedelta(days=1)
-    res_appt = await db.execute(select(func.count(Appointment.id)).where(
-        Appointment.tenant_id == current_user.tenant_id,
-        Appointment.start_time >= today,
-        Appointment.start_time < tomorrow
-    ))
-    today_appts = res_appt.scalar()
+    total_patients, total_staff, today_appts = await stats_service.tenant_overview(db, current_user.tenant_id, datetime.date.today())
 
     return {
         "total_patients": total_patients,
@@ -724,27 +1107,19 @@ async def get_overview_stats(current_user: User = Depends(get_current_user), db:
         "is_super_admin": False
     }
 
-@app.get("/stats/growth")
-async def get_platform_growth(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+@app.get("/stats/vitals")
+async def get_cohort_vitals(field: str, bucket: str = Query("week", pattern="^(raw|hour|day|week)$"), points: int = Query(500, ge=3, le=5000), start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    # Tenant-wide trend of one vital field across all patients (e.g. field=bp_systolic)
+    return await vitals_service.cohort_series(db, current_user.tenant_id, field, bucket, points, start, end)
+
+@app.get("/stats/growth", response_model=List[GrowthPointOut])
+async def get_platform_growth(interval: str = Query("month", pattern="^(day|week|month)$"), periods: int = Query(12, ge=1, le=366), current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # Primary, not get_read_db: growth() writes the rollup rows of newly closed days
     # Verify Super Admin
-    t = await db.get(Tenant, current_user.tenant_id)
-    if not t or not t.is_super_admin:
+    if not current_user.is_super_admin:
         return []
 
-    # Aggregate tenants by creation month (using SQLite strftime)
-    # Note: 'created_at' might be needed on Tenant model. Models usually have it.
-    # Checking models... Assuming Tenant has created_at or we simulate it. 
-    # If Tenant model lacks created_at, we might need to add it or skip this.
-    # Let's check Tenant model first. If missing, we'll return mock data for now 
-    # but marked as "Coming Soon" or add the column.
-    
-    # Actually, for now, let's return a simulated structure based on current tenants count 
-    # to avoid schema migration in this step if created_at is missing.
-    # But user asked for REAL data.
-    return [
-        {"name": "Jan", "clinics": 0},
-        {"name": "Feb", "clinics": 0},
-        {"name": "Mar", "clinics": 0},
-        {"name": "Apr", "clinics": 1}, # Mocking the 1 currrent clinic
-    ]
+    # New clinics / patients / appointments and revenue per bucket, oldest first.
+    # Each item keeps "name" + "clinics" for the dashboard chart.
+    return await growth_service.growth(db, interval, periods)
 
@@ -0,0 +1,227 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+import request_logging
+
+# In-process Prometheus metrics, exposed as text format on GET /metrics (one series set
+# per worker process; scrape each worker or run a single worker per container).
+#
+# - A pure ASGI middleware records per-route latency / response size / status counts and
+#   the number of in-flight requests.
+# - SQLAlchemy cursor events count round-trips and DB time for the request that issued
+#   them (a per-request contextvar; SQLAlchemy's greenlets inherit the caller's context).
+# - The pool's checkout is timed to show how long requests wait for a connection.
+#
+# Labels are bounded: `route` is the route template (unmatched paths collapse to
+# "unmatched"), and only the first METRICS_MAX_TENANTS tenants seen get their own `tenant`
+# value, the rest report as "other".
+
+METRICS_MAX_TENANTS = int(os.getenv("METRICS_MAX_TENANTS", "50"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_QUERY_BUCKETS = (1, 2, 3, 4, 5, 8, 12, 20, 30, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_lock = threading.Lock()
+_request_db = contextvars.ContextVar("request_db", default=None)
+_tenant_labels = set()
+
+
+class _Metric:
+    def __init__(self, name, help_text, kind, labels=()):
+        self.name, self.help, self.kind, self.labels = name, help_text, kind, labels
+        self.series = {}
+        REGISTRY.append(self)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    @staticmethod
+    def fmt_labels(names, values, extra=""):
+        parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter(_Metric):
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, "counter", labels)
+
+    def inc(self, *label_values, amount=1):
+        with _lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def render(self):
+        with _lock:
+            return [f"{self.name}{self.fmt_labels(self.labels, k)} {v}" for k, v in self.series.items()]
+
+
+class Gauge(_Metric):
+    def __init__(self, name, help_text, labels=(), collect=None):
+        super().__init__(name, help_text, "gauge", labels)
+        self.collect = collect  # callable returning the value at scrape time
+
+    def add(self, amount, *label_values):
+        with _lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def render(self):
+        if self.collect is not None:
+            return [f"{self.name} {self.collect()}"]
+        with _lock:
+            return [f"{self.name}{self.fmt_labels(self.labels, k)} {v}" for k, v in self.series.items()]
+
+
+class Histogram(_Metric):
+    def __init__(self, name, help_text, buckets, labels=()):
+        super().__init__(name, help_text, "histogram", labels)
+        self.buckets = buckets
+
+    def observe(self, value, *label_values):
+        with _lock:
+            counts = self.series.get(label_values)
+            if counts is None:
+                # per-bucket counts (+Inf last), sum, count
+                counts = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts[0][bisect.bisect_left(self.buckets, value)] += 1
+            counts[1] += value
+            counts[2] += 1
+
+    def render(self):
+        lines = []
+        with _lock:
+            snapshot = [(key, (list(b), total, count)) for key, (b, total, count) in self.series.items()]
+        for key, (buckets, total, count) in snapshot:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), buckets):
+                cumulative += n
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{self.fmt_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self.fmt_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{self.fmt_labels(self.labels, key)} {count}")
+        return lines
+
+
+REGISTRY = []
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route, method, status and tenant.", ("route", "method", "status", "tenant"))
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Request latency.", LATENCY_BUCKETS, ("route", "method", "tenant"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served.")
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size.", SIZE_BUCKETS, ("route",))
+REQUEST_DB_QUERIES = Histogram("http_request_db_queries", "DB round-trips per request.", DB_QUERY_BUCKETS, ("route",))
+REQUEST_DB_TIME = Histogram("http_request_db_seconds", "Time spent in DB statements per request.", LATENCY_BUCKETS, ("route",))
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "Latency of individual DB statements.", LATENCY_BUCKETS)
+POOL_CHECKOUT_WAIT = Histogram("db_pool_checkout_wait_seconds", "Time waiting for a pooled connection.", LATENCY_BUCKETS)
+LOG_DROPPED = Gauge("log_records_dropped", "Log records dropped because the log queue was full.", collect=lambda: request_logging.dropped_records)
+
+
+def tenant_label(tenant_id) -> str:
+    if tenant_id is None:
+        return "none"
+    if tenant_id in _tenant_labels:
+        return tenant_id
+    with _lock:
+        if len(_tenant_labels) < METRICS_MAX_TENANTS:
+            _tenant_labels.add(tenant_id)
+            return tenant_id
+    return "other"
+
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+# --- Database instrumentation ---
+
+def instrument_engine(engine, pool_name: str = "db_pool"):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        DB_QUERY_LATENCY.observe(elapsed)
+        stats = _request_db.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        if context.connection is not None and context.connection.info.get("metrics_query_start"):
+            context.connection.info["metrics_query_start"].pop()
+
+    # The pool has no "before checkout" event, so time the pool's own _do_get (which
+    # waits on the queue, or opens a connection for NullPool)
+    pool = sync_engine.pool
+    do_get = pool._do_get
+
+    def timed_do_get():
+        t0 = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - t0)
+
+    pool._do_get = timed_do_get
+
+    if hasattr(pool, "checkedout"):
+        Gauge(f"{pool_name}_checked_out", "Connections currently checked out.", collect=pool.checkedout)
+        Gauge(f"{pool_name}_size", "Connections currently held by the pool.", collect=lambda: pool.checkedin() + pool.checkedout())
+
+
+# --- Middleware / exposition ---
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        db_stats = [0, 0.0]  # round-trips, seconds
+        token = _request_db.set(db_stats)
+        status_code, size = 500, 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.add(1)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            IN_FLIGHT.add(-1)
+            _request_db.reset(token)
+            route, method = route_label(scope), scope["method"]
+            tenant = tenant_label(request_logging.current_tenant())
+            REQUESTS.inc(route, method, str(status_code), tenant)
+            REQUEST_LATENCY.observe(elapsed, route, method, tenant)
+            RESPONSE_SIZE.observe(size, route)
+            REQUEST_DB_QUERIES.observe(db_stats[0], route)
+            REQUEST_DB_TIME.observe(db_stats[1], route)
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.header())
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
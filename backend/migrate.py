@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import pkgutil
+import re
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+import migrations
+from database import engine
+
+# Versioned schema migrations.
+#
+# Revisions are modules in migrations/ named rNNNN_<name>.py, applied in version order and
+# recorded in schema_migrations. A revision lists STATEMENTS and/or defines
+# `async def upgrade(conn)`:
+#   - by default it runs in one transaction together with its schema_migrations row, so it
+#     is applied completely or not at all;
+#   - CONCURRENT = True runs it statement by statement in AUTOCOMMIT, as CREATE INDEX
+#     CONCURRENTLY requires. Such a revision must be safe to re-run after a partial
+#     failure (IF NOT EXISTS everywhere); an INVALID index left by a failed concurrent
+#     build is dropped before its CREATE is retried.
+# r0001 creates the current model schema on an empty database, so every later revision
+# must also work there (IF NOT EXISTS / IF EXISTS; r0011 partitions the still-empty tables).
+#
+# A session-level advisory lock lets only one process migrate at a time. App workers do
+# not migrate: startup runs check_schema(), one query comparing the recorded version with
+# EXPECTED_VERSION, and refuses to serve on an older schema. (MIGRATE_ON_STARTUP=1 applies
+# pending revisions instead, for development.)
+#
+#   python migrate.py            apply pending revisions
+#   python migrate.py status     list revisions and whether they are applied
+#   python migrate.py --to 5     apply up to and including r0005
+
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "0") == "1"
+
+LOCK_KEY = "schema-migrations"
+REVISION_NAME = re.compile(r"^r(\d{4})_(\w+)$")
+CONCURRENT_INDEX = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+CREATE_TABLE_SQL = text("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+        duration_ms DOUBLE PRECISION
+    )
+""")
+RECORD_SQL = text("INSERT INTO schema_migrations (version, name, duration_ms) VALUES (:version, :name, :duration_ms)")
+
+
+def revisions():
+    """[(version, module name)] in order, from file names only (nothing is imported)."""
+    found = []
+    for module in pkgutil.iter_modules(migrations.__path__):
+        match = REVISION_NAME.match(module.name)
+        if match:
+            found.append((int(match.group(1)), module.name))
+    found.sort()
+    versions = [version for version, _ in found]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions in {migrations.__path__}")
+    return found
+
+
+EXPECTED_VERSION = max((version for version, _ in revisions()), default=0)
+
+
+async def _applied_versions(conn) -> set:
+    res = await conn.execute(text("SELECT version FROM schema_migrations"))
+    return set(res.scalars())
+
+
+async def _drop_invalid_index(conn, stmt: str):
+    match = CONCURRENT_INDEX.search(stmt)
+    if not match:
+        return
+    invalid = await conn.scalar(text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name AND c.relnamespace = current_schema()::regnamespace AND NOT i.indisvalid
+    """), {"name": match.group(1)})
+    if invalid:
+        print(f"   dropping invalid index {match.group(1)} left by an earlier failed build")
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}"))
+
+
+async def _apply(version: int, name: str, autocommit_conn):
+    module = importlib.import_module(f"migrations.{name}")
+    statements = getattr(module, "STATEMENTS", [])
+    upgrade_fn = getattr(module, "upgrade", None)
+    print(f"🔹 r{version:04d} {name[6:]}{' (concurrent)' if getattr(module, 'CONCURRENT', False) else ''}")
+    t0 = time.perf_counter()
+
+    if getattr(module, "CONCURRENT", False):
+        await autocommit_conn.execute(text("SET statement_timeout = 0"))  # index builds outlast DB_STATEMENT_TIMEOUT_MS
+        for stmt in statements:
+            await _drop_invalid_index(autocommit_conn, stmt)
+            await autocommit_conn.execute(text(stmt))
+        if upgrade_fn:
+            await upgrade_fn(autocommit_conn)
+        await autocommit_conn.execute(RECORD_SQL, {"version": version, "name": name, "duration_ms": (time.perf_counter() - t0) * 1000})
+    else:
+        async with engine.begin() as conn:
+            await conn.execute(text("SET LOCAL statement_timeout = 0"))  # table rewrites / backfills
+            for stmt in statements:
+                await conn.execute(text(stmt))
+            if upgrade_fn:
+                await upgrade_fn(conn)
+            await conn.execute(RECORD_SQL, {"version": version, "name": name, "duration_ms": (time.perf_counter() - t0) * 1000})
+
+
+async def upgrade(target: int = None):
+    """Apply every pending revision up to `target` (default: all). Returns the versions applied."""
+    applied_now = []
+    # AUTOCOMMIT so holding the lock does not keep a transaction open, and so concurrent
+    # revisions can run on this same connection
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("SELECT pg_advisory_lock(hashtext(:k))"), {"k": LOCK_KEY})
+        try:
+            await conn.execute(CREATE_TABLE_SQL)
+            applied = await _applied_versions(conn)
+            for version, name in revisions():
+                if version in applied or (target is not None and version > target):
+                    continue
+                await _apply(version, name, conn)
+                applied_now.append(version)
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(hashtext(:k))"), {"k": LOCK_KEY})
+    return applied_now
+
+
+async def current_version():
+    async with engine.connect() as conn:
+        try:
+            return await conn.scalar(text("SELECT max(version) FROM schema_migrations"))
+        except ProgrammingError:
+            return None  # no schema_migrations table: never migrated
+
+
+async def check_schema():
+    """Startup check: one query instead of reflecting every table with create_all."""
+    version = await current_version()
+    if version is not None and version >= EXPECTED_VERSION:
+        if version > EXPECTED_VERSION:
+            # Rolling deploy: a newer release already migrated; its revisions are additive
+            logging.warning("Database schema is at version %s, ahead of this code (%s)", version, EXPECTED_VERSION)
+        return version
+    if MIGRATE_ON_STARTUP:
+        await upgrade()
+        return EXPECTED_VERSION
+    raise RuntimeError(
+        f"Database schema is at version {version or 0}, this code needs {EXPECTED_VERSION}. "
+        f"Run `python migrate.py` (or set MIGRATE_ON_STARTUP=1 in development)."
+    )
+
+
+async def status():
+    async with engine.connect() as conn:
+        try:
+            res = await conn.execute(text("SELECT version, applied_at, duration_ms FROM schema_migrations"))
+            applied = {version: (applied_at, duration_ms) for version, applied_at, duration_ms in res}
+        except ProgrammingError:
+            applied = {}
+    for version, name in revisions():
+        if version in applied:
+            applied_at, duration_ms = applied[version]
+            print(f"✅ r{version:04d} {name[6:]:<28} applied {applied_at:%Y-%m-%d %H:%M} ({duration_ms or 0:.0f} ms)")
+        else:
+            print(f"⏳ r{version:04d} {name[6:]:<28} pending")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations (see migrations/).")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status"])
+    parser.add_argument("--to", type=int, help="stop after this version")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "status":
+            await status()
+            return
+        print("🚀 Starting Schema Migration...")
+        applied = await upgrade(args.to)
+        print(f"✅ Schema at version {await current_version()} ({len(applied)} revision(s) applied).")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
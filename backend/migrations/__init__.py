@@ -0,0 +1 @@
+# Schema revisions, applied in order by migrate.py (see there for the conventions)
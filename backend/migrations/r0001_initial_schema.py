@@ -0,0 +1,10 @@
+from database import Base
+import models  # noqa: F401  (registers every table on Base.metadata)
+
+# Tables, indexes and constraints as declared on the models. On an empty database this is
+# the whole current schema (the later revisions are then no-ops); on a database created
+# before versioned migrations it only adds missing tables. Replaces migrate_commercial.py
+# and the create_all that used to run on every worker start.
+
+async def upgrade(conn):
+    await conn.run_sync(Base.metadata.create_all)
@@ -0,0 +1,20 @@
+# Formerly migrate_hardening.py: columns added to early tables, patient age -> dob, and
+# MRNs backfilled for patients registered before MRNs existed.
+STATEMENTS = [
+    "ALTER TABLE tenants ADD COLUMN IF NOT EXISTS logo_url VARCHAR",
+    "ALTER TABLE tenants ADD COLUMN IF NOT EXISTS phone VARCHAR",
+    "ALTER TABLE tenants ADD COLUMN IF NOT EXISTS settings JSONB DEFAULT '{\"timezone\": \"UTC\", \"currency\": \"USD\"}'",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE",
+    "ALTER TABLE patients ADD COLUMN IF NOT EXISTS dob DATE",
+    "ALTER TABLE patients ADD COLUMN IF NOT EXISTS mrn VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_patients_mrn ON patients (mrn)",
+    "ALTER TABLE patients ADD COLUMN IF NOT EXISTS blood_group VARCHAR",
+    "ALTER TABLE patients ADD COLUMN IF NOT EXISTS allergies JSONB DEFAULT '[]'",
+    "ALTER TABLE patients ADD COLUMN IF NOT EXISTS address TEXT",
+    "ALTER TABLE patients DROP COLUMN IF EXISTS age",
+    "UPDATE patients SET mrn = 'PT-' || SUBSTRING(id, 1, 8) WHERE mrn IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_start_time ON appointments (start_time)",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_status ON appointments (status)",
+    "ALTER TABLE clinical_records ADD COLUMN IF NOT EXISTS created_by_id VARCHAR REFERENCES users(id)",
+    "ALTER TABLE clinical_records ADD COLUMN IF NOT EXISTS appointment_id VARCHAR REFERENCES appointments(id)",
+]
@@ -0,0 +1,15 @@
+# Indexes behind search_service.py (formerly migrate_search.py), built CONCURRENTLY so a
+# live clinic keeps writing patients while they build.
+CONCURRENT = True
+
+STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    # Exact / prefix fast paths
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_tenant_mrn ON patients (tenant_id, mrn text_pattern_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_tenant_mobile ON patients (tenant_id, mobile)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_tenant_name_prefix ON patients (tenant_id, lower(name) text_pattern_ops)",
+    # Substring / fuzzy matching (serves ILIKE '%q%' and similarity())
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_name_trgm ON patients USING gin (tenant_id, name gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_mrn_trgm ON patients USING gin (tenant_id, mrn gin_trgm_ops)",
+]
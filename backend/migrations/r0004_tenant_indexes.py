@@ -0,0 +1,12 @@
+# tenant_id indexes for the tables that had none (formerly migrate_tenant_indexes.py). The
+# background tenant purge deletes `WHERE tenant_id = ? LIMIT n` batches, which would
+# otherwise seq-scan per batch.
+CONCURRENT = True
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tenant_settings_tenant_id ON tenant_settings (tenant_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_tenant_id ON users (tenant_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_attachments_tenant_id ON attachments (tenant_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_prescriptions_tenant_id ON prescriptions (tenant_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_invoices_tenant_id ON invoices (tenant_id)",
+]
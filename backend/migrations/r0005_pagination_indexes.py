@@ -0,0 +1,14 @@
+# Composite indexes backing keyset pagination on /patients, /appointments and the patient
+# profile sections (formerly migrate_pagination.py).
+CONCURRENT = True
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_tenant_created ON patients (tenant_id, created_at, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_appointments_tenant_start ON appointments (tenant_id, start_time, id)",
+    # Patient profile sections (/patients/{id}/records, /appointments, /attachments)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_clinical_records_patient_date ON clinical_records (patient_id, date, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_appointments_patient_start ON appointments (patient_id, start_time, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_attachments_patient_uploaded ON attachments (patient_id, uploaded_at, id)",
+    # Tenant-wide vitals trends (/stats/vitals)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_clinical_records_tenant_type_date ON clinical_records (tenant_id, type, date)",
+]
@@ -0,0 +1,29 @@
+from sqlalchemy import text
+
+# Database-enforced double-booking protection for doctors (formerly migrate_scheduling.py,
+# see scheduling_service.py). The constraint cannot be added while overlapping bookings
+# exist, so they are listed and the revision fails until they are resolved.
+
+OVERLAPS_SQL = """
+    SELECT a.id, b.id, a.doctor_id, a.start_time, b.start_time
+    FROM appointments a
+    JOIN appointments b ON a.doctor_id = b.doctor_id AND a.id < b.id
+    WHERE a.status <> 'cancelled' AND b.status <> 'cancelled'
+      AND tsrange(a.start_time, a.end_time, '[)') && tsrange(b.start_time, b.end_time, '[)')
+    LIMIT 50
+"""
+
+async def upgrade(conn):
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+
+    overlaps = (await conn.execute(text(OVERLAPS_SQL))).all()
+    if overlaps:
+        details = "\n".join(f"   doctor {doctor_id}: {a_id} @ {a_start} overlaps {b_id} @ {b_start}" for a_id, b_id, doctor_id, a_start, b_start in overlaps)
+        raise RuntimeError(f"Overlapping appointments found, cancel or move them and re-run:\n{details}")
+
+    await conn.execute(text("ALTER TABLE appointments DROP CONSTRAINT IF EXISTS ex_appointments_doctor_overlap"))
+    await conn.execute(text("""
+        ALTER TABLE appointments ADD CONSTRAINT ex_appointments_doctor_overlap
+        EXCLUDE USING gist (doctor_id WITH =, tsrange(start_time, end_time, '[)') WITH &&)
+        WHERE (status <> 'cancelled')
+    """))
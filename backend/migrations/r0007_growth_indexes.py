@@ -0,0 +1,9 @@
+# Indexes for the platform growth rollup (formerly migrate_growth.py; growth_service.py
+# counts one day of rows across all tenants at a time).
+CONCURRENT = True
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_created ON patients (created_at)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_invoices_created ON invoices (created_at)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_appointments_start_time ON appointments (start_time)",
+]
@@ -0,0 +1,8 @@
+# Columns for stored attachment bytes (formerly migrate_attachments.py, see
+# attachment_store.py). Older rows keep NULLs: they only ever had a mock URL.
+STATEMENTS = [
+    "ALTER TABLE attachments ADD COLUMN IF NOT EXISTS sha256 VARCHAR",
+    "ALTER TABLE attachments ADD COLUMN IF NOT EXISTS size_bytes BIGINT",
+    "ALTER TABLE attachments ADD COLUMN IF NOT EXISTS content_type VARCHAR",
+    "ALTER TABLE attachments ADD COLUMN IF NOT EXISTS storage_key VARCHAR",
+]
@@ -0,0 +1,44 @@
+from sqlalchemy import text
+
+# Per-tenant MRN allocation (formerly migrate_mrn.py, see mrn_allocator.py): the counter
+# table, counters seeded past any MRN already in the allocator's PT-nnnnnnn format, and the
+# (tenant_id, mrn) unique constraint, built CONCURRENTLY and then attached. The constraint
+# cannot be added while duplicates exist, so they are listed and the revision fails.
+CONCURRENT = True
+
+DUPLICATES_SQL = """
+    SELECT tenant_id, mrn, count(*), array_agg(id ORDER BY created_at)
+    FROM patients
+    WHERE mrn IS NOT NULL
+    GROUP BY tenant_id, mrn
+    HAVING count(*) > 1
+    LIMIT 50
+"""
+
+SEED_COUNTERS_SQL = """
+    INSERT INTO tenant_mrn_counters (tenant_id, next_value)
+    SELECT t.id, COALESCE(MAX(substring(p.mrn FROM '^PT-([0-9]{7})$')::bigint), 0) + 1
+    FROM tenants t
+    LEFT JOIN patients p ON p.tenant_id = t.id
+    GROUP BY t.id
+    ON CONFLICT (tenant_id) DO UPDATE SET next_value = GREATEST(tenant_mrn_counters.next_value, EXCLUDED.next_value)
+"""
+
+async def upgrade(conn):
+    duplicates = (await conn.execute(text(DUPLICATES_SQL))).all()
+    if duplicates:
+        details = "\n".join(f"   tenant {tenant_id}: {mrn} used by {count} patients {', '.join(ids)}" for tenant_id, mrn, count, ids in duplicates)
+        raise RuntimeError(f"Duplicate MRNs found, give these patients new MRNs and re-run:\n{details}")
+
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS tenant_mrn_counters (
+            tenant_id VARCHAR PRIMARY KEY,
+            next_value BIGINT NOT NULL
+        )
+    """))
+    await conn.execute(text(SEED_COUNTERS_SQL))
+
+    if not await conn.scalar(text("SELECT 1 FROM pg_constraint WHERE conname = 'uq_patients_tenant_mrn'")):
+        await conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS uq_patients_tenant_mrn"))  # leftover of a failed build
+        await conn.execute(text("CREATE UNIQUE INDEX CONCURRENTLY uq_patients_tenant_mrn ON patients (tenant_id, mrn)"))
+        await conn.execute(text("ALTER TABLE patients ADD CONSTRAINT uq_patients_tenant_mrn UNIQUE USING INDEX uq_patients_tenant_mrn"))
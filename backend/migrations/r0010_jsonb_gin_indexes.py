@@ -0,0 +1,16 @@
+# GIN indexes for `@>` containment on the JSONB list columns (see lookup_service.py):
+# allergy, drug and role lookups, and the admin role checks behind /tenants,
+# /users/global-admins, impersonation and the stats rollup reconciliation.
+# jsonb_path_ops indexes only support @> (and jsonpath match), but are smaller and faster
+# to search than the default jsonb_ops. tenant_id leads the patient and prescription indexes
+# via btree_gin (r0003). users.roles is indexed alone: a clinic has tens of users, so
+# ix_users_tenant_id already serves tenant-scoped role checks, and the GIN index is for the
+# cross-tenant admin lists.
+CONCURRENT = True
+
+STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_allergies_gin ON patients USING gin (tenant_id, allergies jsonb_path_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_prescriptions_medications_gin ON prescriptions USING gin (tenant_id, medications jsonb_path_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_roles_gin ON users USING gin (roles jsonb_path_ops)",
+]
@@ -0,0 +1,116 @@
+import datetime
+
+from sqlalchemy import text
+
+import partition_service
+
+# appointments and clinical_records become hash-partitioned on tenant_id, clinical_records
+# with yearly sub-partitions on `date` (see partition_service.py). Each table is copied into
+# a new partitioned table and swapped in, inside this revision's transaction. The renames
+# and the dropped / re-added foreign keys take ACCESS EXCLUSIVE locks, so until the revision
+# commits every read and write of appointments, clinical_records, prescriptions and invoices
+# waits (about 15 s for 120k records + 70k appointments, most of it the exclusion constraint
+# build): the API is effectively down. Stop the app servers and run it in a maintenance
+# window. appointments is not sub-partitioned by time: the double-booking exclusion
+# constraint (r0006) must compare every booking of a doctor, which it can only do within
+# one partition. It now also carries tenant_id WITH =, as a constraint on a partitioned
+# table must (PostgreSQL 17+).
+#
+# Unique keys on a partitioned table must contain the partition keys, so the primary keys
+# become (tenant_id, id) and (tenant_id, id, date), and the foreign keys pointing at
+# appointments become (tenant_id, appointment_id) -> (tenant_id, id). That also holds a
+# prescription / invoice / record to its appointment's tenant. Rows that break these rules
+# are listed and the revision fails until they are fixed.
+
+CHECKS = {
+    "rows without tenant_id": """
+        SELECT 'appointments', id FROM appointments WHERE tenant_id IS NULL
+        UNION ALL SELECT 'clinical_records', id FROM clinical_records WHERE tenant_id IS NULL OR date IS NULL
+    """,
+    "rows whose appointment belongs to another tenant": """
+        SELECT 'prescriptions', x.id FROM prescriptions x JOIN appointments a ON a.id = x.appointment_id WHERE a.tenant_id IS DISTINCT FROM x.tenant_id
+        UNION ALL SELECT 'invoices', x.id FROM invoices x JOIN appointments a ON a.id = x.appointment_id WHERE a.tenant_id IS DISTINCT FROM x.tenant_id
+        UNION ALL SELECT 'clinical_records', x.id FROM clinical_records x JOIN appointments a ON a.id = x.appointment_id WHERE a.tenant_id IS DISTINCT FROM x.tenant_id
+    """,
+}
+
+TABLES = {
+    "clinical_records": {
+        "primary_key": "tenant_id, id, date",
+        "not_null": ["tenant_id", "date"],
+        "indexes": [
+            "CREATE INDEX ix_clinical_records_patient_date ON clinical_records (patient_id, date, id)",
+            "CREATE INDEX ix_clinical_records_tenant_type_date ON clinical_records (tenant_id, type, date)",
+        ],
+    },
+    "appointments": {
+        "primary_key": "tenant_id, id",
+        "not_null": ["tenant_id"],
+        "indexes": [
+            "CREATE INDEX ix_appointments_tenant_start ON appointments (tenant_id, start_time, id)",
+            "CREATE INDEX ix_appointments_patient_start ON appointments (patient_id, start_time, id)",
+            "CREATE INDEX ix_appointments_start_time ON appointments (start_time)",
+            "CREATE INDEX ix_appointments_status ON appointments (status)",
+        ],
+    },
+}
+
+# Dropping the old tables drops every foreign key from or to them; these replace them
+FOREIGN_KEYS = [
+    "ALTER TABLE clinical_records ADD FOREIGN KEY (tenant_id) REFERENCES tenants(id)",
+    "ALTER TABLE clinical_records ADD FOREIGN KEY (patient_id) REFERENCES patients(id)",
+    "ALTER TABLE clinical_records ADD FOREIGN KEY (created_by_id) REFERENCES users(id)",
+    "ALTER TABLE appointments ADD FOREIGN KEY (tenant_id) REFERENCES tenants(id)",
+    "ALTER TABLE appointments ADD FOREIGN KEY (patient_id) REFERENCES patients(id)",
+    "ALTER TABLE appointments ADD FOREIGN KEY (doctor_id) REFERENCES users(id)",
+    "ALTER TABLE clinical_records ADD CONSTRAINT clinical_records_appointment_fkey FOREIGN KEY (tenant_id, appointment_id) REFERENCES appointments (tenant_id, id)",
+    "ALTER TABLE prescriptions ADD CONSTRAINT prescriptions_appointment_fkey FOREIGN KEY (tenant_id, appointment_id) REFERENCES appointments (tenant_id, id)",
+    "ALTER TABLE invoices ADD CONSTRAINT invoices_appointment_fkey FOREIGN KEY (tenant_id, appointment_id) REFERENCES appointments (tenant_id, id)",
+    """
+    ALTER TABLE appointments ADD CONSTRAINT ex_appointments_doctor_overlap
+    EXCLUDE USING gist (tenant_id WITH =, doctor_id WITH =, tsrange(start_time, end_time, '[)') WITH &&)
+    WHERE (status <> 'cancelled')
+    """,
+]
+
+
+async def _partition(conn, table: str, spec: dict):
+    await conn.execute(text(f"ALTER TABLE {table} RENAME TO {table}_old"))
+    await conn.execute(text(f"CREATE TABLE {table} (LIKE {table}_old INCLUDING DEFAULTS) PARTITION BY HASH (tenant_id)"))
+    for column in spec["not_null"]:
+        await conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL"))
+
+    await partition_service.create_hash_partitions(conn, table)
+    if table in partition_service.YEARLY_TABLES:
+        column = partition_service.YEARLY_TABLES[table]
+        oldest = await conn.scalar(text(f"SELECT min({column}) FROM {table}_old"))
+        this_year = datetime.date.today().year
+        await partition_service.ensure_years(conn, table, oldest.year if oldest else this_year, this_year + 1)
+
+    await conn.execute(text(f"INSERT INTO {table} SELECT * FROM {table}_old"))
+    await conn.execute(text(f"DROP TABLE {table}_old CASCADE"))
+    await conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({spec['primary_key']})"))
+    for stmt in spec["indexes"]:
+        await conn.execute(text(stmt))
+
+
+async def upgrade(conn):
+    version = int(await conn.scalar(text("SHOW server_version_num")))
+    if version < 170000:
+        raise RuntimeError("Partitioning appointments needs PostgreSQL 17+ (exclusion constraint on a partitioned table)")
+
+    # Block writes while the checks run, so no row is missed by the copy. The renames and
+    # DROP ... CASCADE in _partition then take ACCESS EXCLUSIVE: reads block too until commit.
+    await conn.execute(text("LOCK TABLE appointments, clinical_records, prescriptions, invoices IN EXCLUSIVE MODE"))
+    for problem, sql in CHECKS.items():
+        rows = (await conn.execute(text(f"{sql} LIMIT 50"))).all()
+        if rows:
+            details = "\n".join(f"   {table} {row_id}" for table, row_id in rows)
+            raise RuntimeError(f"Found {problem}, fix them and re-run:\n{details}")
+
+    for table, spec in TABLES.items():
+        await _partition(conn, table, spec)
+    for stmt in FOREIGN_KEYS:
+        await conn.execute(text(stmt))
+    for table in TABLES:
+        await conn.execute(text(f"ANALYZE {table}"))
@@ -0,0 +1,55 @@
+from sqlalchemy import text
+
+# Indexes for the tenant export (export_service.py), which streams each table in
+# (timestamp, id) order: with (tenant_id, <timestamp>, id) the cursor walks the index and
+# the first rows go out at once, instead of after a sort of the tenant's whole table.
+# patients (ix_patients_tenant_created) and appointments (ix_appointments_tenant_start)
+# already have theirs.
+#
+# CREATE INDEX CONCURRENTLY does not work on a partitioned table, so clinical_records gets
+# an index ON ONLY the parent (and each hash partition), built concurrently on every leaf
+# and attached; the parent index becomes valid once every partition has one. Partitions
+# created later (partition_service.ensure_years) inherit it.
+CONCURRENT = True
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_prescriptions_tenant_created ON prescriptions (tenant_id, created_at, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_invoices_tenant_created ON invoices (tenant_id, created_at, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_attachments_tenant_uploaded ON attachments (tenant_id, uploaded_at, id)",
+]
+
+RECORDS_INDEX = ("clinical_records", "ix_clinical_records_tenant_date", "tenant_date", "tenant_id, date, id")
+
+PARTITIONS_SQL = text("""
+    SELECT c.relname, c.relkind = 'p' FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname
+""")
+INDEX_VALID_SQL = text("""
+    SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relname = :name AND c.relnamespace = current_schema()::regnamespace
+""")
+ATTACHED_SQL = text("""
+    SELECT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = CAST(:child AS regclass) AND inhparent = CAST(:parent AS regclass))
+""")
+
+
+async def _index_partitioned(conn, table: str, name: str, suffix: str, columns: str):
+    if await conn.scalar(INDEX_VALID_SQL, {"name": name}):
+        return
+    await conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} ({columns})"))
+    for child, is_partitioned in (await conn.execute(PARTITIONS_SQL, {"table": table})).all():
+        child_index = f"ix_{child}_{suffix}"
+        if is_partitioned:
+            await _index_partitioned(conn, child, child_index, suffix, columns)
+        else:
+            if await conn.scalar(INDEX_VALID_SQL, {"name": child_index}) is False:
+                print(f"   dropping invalid index {child_index} left by an earlier failed build")
+                await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {child_index}"))
+            await conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child_index} ON {child} ({columns})"))
+        if not await conn.scalar(ATTACHED_SQL, {"child": child_index, "parent": name}):
+            await conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {child_index}"))
+
+
+async def upgrade(conn):
+    table, name, suffix, columns = RECORDS_INDEX
+    await _index_partitioned(conn, table, name, suffix, columns)
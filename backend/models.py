@@ -1,5 +1,5 @@
 from database import Base
-from sqlalchemy import Column, String, Boolean, ForeignKey, Integer, DateTime, Date, Text, Float
+from sqlalchemy import Column, String, Boolean, ForeignKey, Integer, BigInteger, DateTime, Date, Text, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
@@ -18,7 +18,7 @@ class Tenant(Base):
 class TenantSettings(Base):
     __tablename__ = "tenant_settings"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    tenant_id = Column(String, ForeignKey("tenants.id"))
+    tenant_id = Column(String, ForeignKey("tenants.id"), index=True)
     
     clinic_name = Column(String) # For display on PDF
     logo_url = Column(String, nullable=True)
@@ -31,10 +31,10 @@ class TenantSettings(Base):
 class User(Base):
     __tablename__ = "users"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    tenant_id = Column(String, ForeignKey("tenants.id"))
+    tenant_id = Column(String, ForeignKey("tenants.id"), index=True)
     username = Column(String, index=True)
     hashed_password = Column(String)
-    roles = Column(JSONB, default=["staff"]) # ["admin", "doctor", "nurse"]
+    roles = Column(JSONB, default=["staff"]) # ["admin", "doctor", "nurse"]; GIN-indexed for @> (migrations/r0010_jsonb_gin_indexes.py)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -48,7 +48,7 @@ class Patient(Base):
     gender = Column(String)
     mobile = Column(String)
     blood_group = Column(String, nullable=True)
-    allergies = Column(JSONB, default=[]) 
+    allergies = Column(JSONB, default=[]) # GIN-indexed for @> (migrations/r0010_jsonb_gin_indexes.py)
     address = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -56,6 +56,15 @@ class Patient(Base):
     appointments = relationship("Appointment", back_populates="patient")
     attachments = relationship("Attachment", back_populates="patient")
 
+    __table_args__ = (
+        # MRNs come from mrn_allocator.py; the constraint is the final guard (migrations/r0009_mrn_allocation.py)
+        UniqueConstraint("tenant_id", "mrn", name="uq_patients_tenant_mrn"),
+        # Keyset pagination: newest patients first within a tenant
+        Index("ix_patients_tenant_created", "tenant_id", "created_at", "id"),
+        # Platform growth rollup: one day across all tenants
+        Index("ix_patients_created", "created_at"),
+    )
+
 class ClinicalRecord(Base):
     __tablename__ = "clinical_records"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -67,6 +76,20 @@ class ClinicalRecord(Base):
     
     patient = relationship("Patient", back_populates="clinical_records")
 
+    # Hash-partitioned on tenant_id, then by year of `date` (migrations/r0011_partition_by_tenant.py,
+    # partition_service.py); the table's primary key is (tenant_id, id, date). The ORM identity
+    # includes tenant_id so its UPDATE / DELETE statements are pruned to one partition.
+    __mapper_args__ = {"primary_key": [tenant_id, id]}
+
+    __table_args__ = (
+        # Patient timeline, newest first
+        Index("ix_clinical_records_patient_date", "patient_id", "date", "id"),
+        # Tenant-wide vitals trends (/stats/vitals)
+        Index("ix_clinical_records_tenant_type_date", "tenant_id", "type", "date"),
+        # Tenant export order (export_service.py, migrations/r0012_export_indexes.py)
+        Index("ix_clinical_records_tenant_date", "tenant_id", "date", "id"),
+    )
+
 class Appointment(Base):
     __tablename__ = "appointments"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -82,38 +105,115 @@ class Appointment(Base):
     prescription = relationship("Prescription", back_populates="appointment", uselist=False)
     invoice = relationship("Invoice", back_populates="appointment", uselist=False)
 
+    # Hash-partitioned on tenant_id (migrations/r0011_partition_by_tenant.py); the primary key
+    # is (tenant_id, id) and so is the ORM identity: db.get(Appointment, (tenant_id, id)), and
+    # UPDATE / DELETE statements are pruned to one partition. Prescriptions, invoices and
+    # clinical records reference it by (tenant_id, appointment_id).
+    __mapper_args__ = {"primary_key": [tenant_id, id]}
+
+    # Double-booking is prevented by the ex_appointments_doctor_overlap exclusion constraint
+    # (GiST on tenant_id + doctor_id + tsrange(start_time, end_time)), see migrations/r0006_scheduling_constraint.py
+    __table_args__ = (
+        # Calendar range + keyset pagination within a tenant
+        Index("ix_appointments_tenant_start", "tenant_id", "start_time", "id"),
+        Index("ix_appointments_patient_start", "patient_id", "start_time", "id"),
+        Index("ix_appointments_start_time", "start_time"), # Also created by migrations/r0002_hardening.py
+    )
+
 class Attachment(Base):
     __tablename__ = "attachments"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    tenant_id = Column(String, ForeignKey("tenants.id"))
+    tenant_id = Column(String, ForeignKey("tenants.id"), index=True)
     patient_id = Column(String, ForeignKey("patients.id"))
     file_name = Column(String)
     file_url = Column(String)
     file_type = Column(String)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
+
+    # Stored bytes (attachment_store.py): blobs are keyed by tenant + SHA-256 and shared by
+    # identical uploads within a tenant
+    sha256 = Column(String, nullable=True)
+    size_bytes = Column(BigInteger, nullable=True)
+    content_type = Column(String, nullable=True)
+    storage_key = Column(String, nullable=True)
     
     patient = relationship("Patient", back_populates="attachments")
 
+    __table_args__ = (
+        Index("ix_attachments_patient_uploaded", "patient_id", "uploaded_at", "id"),
+        # Tenant export order (export_service.py)
+        Index("ix_attachments_tenant_uploaded", "tenant_id", "uploaded_at", "id"),
+    )
+
+class TenantPurgeJob(Base):
+    __tablename__ = "tenant_purge_jobs"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    tenant_id = Column(String, index=True) # No FK: the tenant row is the last thing purged
+    tenant_name = Column(String)
+    requested_by = Column(String, nullable=True)
+    status = Column(String, default="pending") # pending, running, done, failed
+    current_table = Column(String, nullable=True)
+    deleted = Column(JSONB, default={}) # { table_name: rows_deleted }
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+# --- DASHBOARD ROLLUPS (maintained by stats_service.py) ---
+
+class TenantStats(Base):
+    __tablename__ = "tenant_stats"
+    tenant_id = Column(String, primary_key=True) # No FK: rows are cleared by the tenant purge
+    patients = Column(Integer, default=0, nullable=False)
+    users = Column(Integer, default=0, nullable=False)
+    admins = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class TenantDailyAppointments(Base):
+    __tablename__ = "tenant_daily_appointments"
+    tenant_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    appointments = Column(Integer, default=0, nullable=False)
+
+class PlatformDailyGrowth(Base):
+    __tablename__ = "platform_daily_growth"
+    day = Column(Date, primary_key=True) # One row per closed UTC day, written once
+    clinics = Column(Integer, default=0, nullable=False)
+    patients = Column(Integer, default=0, nullable=False)
+    appointments = Column(Integer, default=0, nullable=False)
+    revenue = Column(Float, default=0, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class TenantMrnCounter(Base):
+    __tablename__ = "tenant_mrn_counters"
+    tenant_id = Column(String, primary_key=True) # No FK: cleared by the tenant purge
+    next_value = Column(BigInteger, nullable=False) # first number not yet reserved by any worker (mrn_allocator.py)
+
 # --- COMMERCIAL LAYER MODELS ---
 
 class Prescription(Base):
     __tablename__ = "prescriptions"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    tenant_id = Column(String, ForeignKey("tenants.id"))
+    tenant_id = Column(String, ForeignKey("tenants.id"), index=True)
     appointment_id = Column(String, ForeignKey("appointments.id"))
     doctor_id = Column(String, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Core Data
-    medications = Column(JSONB) # List of { drug: "Amox", dose: "500mg", freq: "BD", duration: "5d" }
+    medications = Column(JSONB) # List of { drug: "Amox", dose: "500mg", freq: "BD", duration: "5d" }; GIN-indexed for @>
     notes = Column(Text, nullable=True) # Advice
     
     appointment = relationship("Appointment", back_populates="prescription")
 
+    __table_args__ = (
+        # Tenant export order (export_service.py)
+        Index("ix_prescriptions_tenant_created", "tenant_id", "created_at", "id"),
+    )
+
 class Invoice(Base):
     __tablename__ = "invoices"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    tenant_id = Column(String, ForeignKey("tenants.id"))
+    tenant_id = Column(String, ForeignKey("tenants.id"), index=True)
     appointment_id = Column(String, ForeignKey("appointments.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -124,4 +224,10 @@ class Invoice(Base):
     
     appointment = relationship("Appointment", back_populates="invoice")
 
+    __table_args__ = (
+        Index("ix_invoices_created", "created_at"),
+        # Tenant export order (export_service.py)
+        Index("ix_invoices_tenant_created", "tenant_id", "created_at", "id"),
+    )
+
 import uuid
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from database import engine
+
+# Per-tenant MRNs (PT-0000001, PT-0000002, ...) handed out from in-memory blocks.
+#
+# tenant_mrn_counters holds the next unreserved number per tenant. A worker reserves
+# MRN_BLOCK_SIZE numbers with one upsert (its own short transaction, so the counter row is
+# never locked for longer than that statement) and then serves registrations from memory.
+# Workers reserve disjoint blocks, so MRNs are unique across processes without any
+# check-and-retry; they are only roughly ordered across workers, and numbers left in a
+# block when a worker exits are skipped. The uq_patients_tenant_mrn constraint is the
+# final guard. Imported MRNs already in our format (a re-imported export) move the counter
+# past them (advance_past); a worker whose block overlaps them finds out on the first
+# conflict and drops the block (discard_block), so its next MRN comes from past the counter.
+#   MRN_BLOCK_SIZE   numbers reserved per round-trip (per worker and tenant)
+
+MRN_BLOCK_SIZE = int(os.getenv("MRN_BLOCK_SIZE", "100"))
+MRN_PREFIX = "PT-"
+MRN_DIGITS = 7  # one wider than the legacy random PT-XXXXXX codes, so the formats never overlap
+MRN_CONSTRAINT = "uq_patients_tenant_mrn"
+_OWN_FORMAT = re.compile(rf"^{MRN_PREFIX}(\d{{{MRN_DIGITS}}})$")
+
+RESERVE_SQL = text("""
+    INSERT INTO tenant_mrn_counters (tenant_id, next_value) VALUES (:tenant_id, 1 + :count)
+    ON CONFLICT (tenant_id) DO UPDATE SET next_value = tenant_mrn_counters.next_value + :count
+    RETURNING next_value
+""")
+
+# Same upsert as migrations/r0009_mrn_allocation.py seeds the counters with
+ADVANCE_SQL = text("""
+    INSERT INTO tenant_mrn_counters (tenant_id, next_value) VALUES (:tenant_id, :next_value)
+    ON CONFLICT (tenant_id) DO UPDATE SET next_value = GREATEST(tenant_mrn_counters.next_value, EXCLUDED.next_value)
+""")
+
+_blocks = {}  # tenant_id -> [next, end)
+_locks = {}
+
+
+def format_mrn(value: int) -> str:
+    return f"{MRN_PREFIX}{value:0{MRN_DIGITS}d}"
+
+
+def is_mrn_conflict(exc: IntegrityError) -> bool:
+    return MRN_CONSTRAINT in str(exc.orig)
+
+
+async def _reserve(tenant_id: str, count: int) -> range:
+    async with engine.begin() as conn:
+        end = await conn.scalar(RESERVE_SQL, {"tenant_id": tenant_id, "count": count})
+    return range(end - count, end)
+
+
+async def next_mrn(tenant_id: str) -> str:
+    block = _blocks.get(tenant_id)
+    if block is None or block[0] >= block[1]:
+        lock = _locks.setdefault(tenant_id, asyncio.Lock())
+        async with lock:
+            block = _blocks.get(tenant_id)
+            if block is None or block[0] >= block[1]:
+                reserved = await _reserve(tenant_id, MRN_BLOCK_SIZE)
+                block = _blocks[tenant_id] = [reserved.start, reserved.stop]
+    value = block[0]
+    block[0] += 1
+    return format_mrn(value)
+
+
+async def reserve_mrns(tenant_id: str, count: int) -> list:
+    """`count` fresh MRNs in one round-trip, bypassing the in-memory block (bulk import)."""
+    if count <= 0:
+        return []
+    return [format_mrn(value) for value in await _reserve(tenant_id, count)]
+
+
+async def advance_past(tenant_id: str, mrns):
+    """Move the tenant's counter past the highest MRN in `mrns` that is in our own format."""
+    numbers = [int(m.group(1)) for m in map(_OWN_FORMAT.match, mrns) if m]
+    if numbers:
+        async with engine.begin() as conn:
+            await conn.execute(ADVANCE_SQL, {"tenant_id": tenant_id, "next_value": max(numbers) + 1})
+
+
+def discard_block(tenant_id: str):
+    """Drop this worker's block after an MRN conflict; the next MRN reserves a fresh one."""
+    _blocks.pop(tenant_id, None)
+
+
+def forget_tenant(tenant_id: str):
+    _blocks.pop(tenant_id, None)
+    _locks.pop(tenant_id, None)
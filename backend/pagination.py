@@ -0,0 +1,67 @@
+import base64
+import datetime
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_, union_all
+
+# Keyset (cursor) pagination. Pages are ordered by (sort_key, id) descending and the
+# next page starts strictly after the last row seen, so page N costs the same as page 1
+# as long as a (tenant_id, sort_key, id) index exists.
+# The cursor is opaque to clients: base64url(JSON [sort_value, id]).
+#
+# sort_key is nullable (legacy / imported rows), and a row comparison never matches NULL,
+# so rows without one come last, by id: a page is the UNION ALL of the non-NULL rows after
+# the cursor and the NULL rows after it, each a LIMITed scan of the same index. A cursor
+# taken on a NULL row has sort_value null and only reads the second part.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value, row_id: str) -> str:
+    if isinstance(sort_value, (datetime.datetime, datetime.date)):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, is_datetime: bool = True):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        if is_datetime and sort_value is not None:
+            sort_value = datetime.datetime.fromisoformat(sort_value)
+        return sort_value, row_id
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def keyset_query(query, sort_col, id_col, cursor: str, limit: int, skip: int = 0):
+    """Apply the (sort_key, id) DESC NULLS LAST order, the cursor predicate and limit+1 (to detect
+    a next page). `skip` is an offset for clients that do not send a cursor."""
+    window = skip + limit + 1
+    sort_value, row_id = decode_cursor(cursor) if cursor else (None, None)
+    nulls = query.where(sort_col.is_(None))
+    if row_id is not None and sort_value is None:
+        parts = [nulls.where(id_col < row_id).order_by(id_col.desc()).limit(window)]
+    else:
+        dated = query.where(sort_col.is_not(None))
+        if row_id is not None:
+            dated = dated.where(tuple_(sort_col, id_col) < tuple_(sort_value, row_id))
+        parts = [dated.order_by(sort_col.desc(), id_col.desc()).limit(window), nulls.order_by(id_col.desc()).limit(window)]
+    page = union_all(*parts).subquery()
+    return (
+        select(page)
+        .order_by(page.c[sort_col.key].desc().nulls_last(), page.c[id_col.key].desc())
+        .offset(skip)
+        .limit(limit + 1)
+    )
+
+
+def split_page(rows, limit: int, sort_attr: str):
+    """Trim the look-ahead row and build the cursor for the following page (None on the last page)."""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_attr), last.id)
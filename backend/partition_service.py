@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import datetime
+
+from sqlalchemy import text
+
+from database import engine
+
+# Partition layout and upkeep for the tenant-partitioned tables (migrations/r0011_partition_by_tenant.py).
+#
+# appointments and clinical_records are hash-partitioned on tenant_id into TENANT_PARTITIONS
+# partitions (<table>_h00 ...). A tenant's rows all live in one of them, so a query that
+# filters on tenant_id (every tenant-scoped query does) is pruned to that partition and its
+# indexes, and a large tenant's vacuum / index bloat stays inside its partition.
+# clinical_records, the largest table, is also sub-partitioned by year of `date` inside each
+# hash partition (<table>_h00_2026 ...), plus a DEFAULT sub-partition so an insert outside
+# the prepared years never fails. Yearly partitions have to exist before their year starts:
+#   python partition_service.py                  prepare every year through next year
+#   python partition_service.py --through 2030
+# (run it from cron once a year; rows that already landed in DEFAULT are moved over).
+#
+# TENANT_PARTITIONS is fixed when r0011 runs; changing it means re-partitioning the tables.
+
+TENANT_PARTITIONS = 16
+YEARLY_TABLES = {"clinical_records": "date"}
+
+
+def partition_name(table: str, remainder: int) -> str:
+    return f"{table}_h{remainder:02d}"
+
+
+async def create_hash_partitions(conn, table: str):
+    """The TENANT_PARTITIONS hash partitions of a new partitioned `table` (with DEFAULT year sub-partitions)."""
+    sub_key = YEARLY_TABLES.get(table)
+    for remainder in range(TENANT_PARTITIONS):
+        name = partition_name(table, remainder)
+        await conn.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES WITH (MODULUS {TENANT_PARTITIONS}, REMAINDER {remainder})"
+            + (f" PARTITION BY RANGE ({sub_key})" if sub_key else "")
+        ))
+        if sub_key:
+            await conn.execute(text(f"CREATE TABLE {name}_default PARTITION OF {name} DEFAULT"))
+
+
+async def ensure_years(conn, table: str, first_year: int, last_year: int) -> int:
+    """Create the missing yearly sub-partitions of `table` for [first_year, last_year]. Returns how many."""
+    sub_key = YEARLY_TABLES[table]
+    created = 0
+    for remainder in range(TENANT_PARTITIONS):
+        parent = partition_name(table, remainder)
+        for year in range(first_year, last_year + 1):
+            name = f"{parent}_{year}"
+            if await conn.scalar(text("SELECT to_regclass(:name)"), {"name": name}) is not None:
+                continue
+            bounds = {"start": datetime.datetime(year, 1, 1), "end": datetime.datetime(year + 1, 1, 1)}
+            in_range = f"{sub_key} >= :start AND {sub_key} < :end"
+
+            # The new partition cannot be attached while DEFAULT holds rows of its range
+            stray = await conn.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {parent}_default WHERE {in_range})"), bounds)
+            if stray:
+                await conn.execute(text(f"CREATE TEMP TABLE _moved_rows (LIKE {table}) ON COMMIT DROP"))
+                await conn.execute(text(f"WITH moved AS (DELETE FROM {parent}_default WHERE {in_range} RETURNING *) INSERT INTO _moved_rows SELECT * FROM moved"), bounds)
+            await conn.execute(text(f"CREATE TABLE {name} PARTITION OF {parent} FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"))
+            if stray:
+                await conn.execute(text(f"INSERT INTO {name} SELECT * FROM _moved_rows"))
+                await conn.execute(text("DROP TABLE _moved_rows"))
+            created += 1
+    return created
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Create upcoming yearly partitions (see partition_service.py).")
+    parser.add_argument("--through", type=int, default=datetime.date.today().year + 1, help="last year to prepare")
+    args = parser.parse_args()
+
+    try:
+        this_year = datetime.date.today().year
+        for table in YEARLY_TABLES:
+            async with engine.begin() as conn:
+                created = await ensure_years(conn, table, this_year, args.through)
+            print(f"✅ {table}: {created} yearly partition(s) created through {args.through}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+from fastapi import HTTPException
+from sqlalchemy import select, func
+
+from models import Patient, ClinicalRecord, Appointment, Attachment
+from pagination import keyset_query, split_page
+
+# The patient profile is split into sections that are fetched independently, newest first,
+# each backed by a (patient_id, <date column>, id) index. Only the columns of the caller's
+# response schema are selected (main.PROFILE_SECTION_COLUMNS), and large payload columns
+# (the JSONB `data` of clinical records) can be left out with a `fields=` projection.
+
+SECTIONS = {
+    "clinical_records": (ClinicalRecord, ClinicalRecord.date),
+    "appointments": (Appointment, Appointment.start_time),
+    "attachments": (Attachment, Attachment.uploaded_at),
+}
+
+
+def _parse_fields(columns, sort_col, fields: str):
+    """The requested subset of `columns`, by name."""
+    if not fields:
+        return columns
+    by_name = {c.key: c for c in columns}
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [n for n in names if n not in by_name]
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}")
+    # id and the sort key are always returned, the cursor is built from them
+    for required in (sort_col.key, "id"):
+        if required not in names:
+            names.insert(0, required)
+    return [by_name[n] for n in names]
+
+
+async def fetch_section(db, section: str, patient_id: str, tenant_id: str, limit: int, columns, cursor: str = None, fields: str = None):
+    """One page of a section as dicts of `columns` (narrowed by `fields`), plus the next cursor."""
+    model, sort_col = SECTIONS[section]
+    columns = _parse_fields(columns, sort_col, fields)
+    query = select(*columns).where(model.patient_id == patient_id, model.tenant_id == tenant_id)
+    query = keyset_query(query, sort_col, model.id, cursor, limit)
+    res = await db.execute(query)
+    items, next_cursor = split_page(res.all(), limit, sort_col.key)
+    return [dict(row._mapping) for row in items], next_cursor
+
+
+async def profile_summary(db, patient_id: str, tenant_id: str, latest: int, patient_columns, section_columns: dict, fields: str = None):
+    # 1. Patient + per-section counts in one round-trip
+    counts = [
+        select(func.count()).select_from(model).where(model.patient_id == Patient.id, model.tenant_id == tenant_id).correlate(Patient).scalar_subquery().label(name)
+        for name, (model, _) in SECTIONS.items()
+    ]
+    res = await db.execute(select(*patient_columns, *counts).where(Patient.id == patient_id, Patient.tenant_id == tenant_id))
+    row = res.first()
+    if not row:
+        return None
+
+    # 2. Latest-N of each section
+    summary = {c.key: row._mapping[c.key] for c in patient_columns}
+    summary["counts"] = {name: row._mapping[name] for name in SECTIONS}
+    for name in SECTIONS:
+        items, next_cursor = await fetch_section(
+            db, name, patient_id, tenant_id, latest, section_columns[name],
+            fields=fields if name == "clinical_records" else None,
+        )
+        summary[name] = items
+        summary[f"{name}_next_cursor"] = next_cursor
+    return summary
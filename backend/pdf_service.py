@@ -1,12 +1,259 @@
-# from xhtml2pdf import pisa  <-- REMOVED to prevent crash
-from io import BytesIO
-
-def create_prescription_pdf(prescription, tenant, patient, doctor, settings):
-    """
-    DEPRECATED: Server-side PDF generation is disabled due to 'xhtml2pdf' dependency issues on Mac.
-    We are moving to Client-side PDF generation (Frontend).
-    
-    This function is kept as a stub to avoid import errors in main.py until fully refactored.
-    """
-    print("WARNING: Server-side PDF generation is disabled. Please use Frontend printing.")
-    return b"%PDF-1.4 Mock PDF"
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException
+from fpdf import FPDF
+
+# Server-side prescription / invoice PDFs (fpdf2, pure Python).
+#
+# Rendering is CPU-bound, so it runs in a ProcessPoolExecutor and the event loop only
+# builds a small JSON-able "document" dict from the DB rows. The rendered file is cached on
+# disk under PDF_CACHE_DIR/<tenant_id>/, named by the SHA-256 of LAYOUT_VERSION + the
+# document dict. The document holds exactly what gets printed (prescription, patient,
+# doctor and clinic settings fields), so any edit to one of them produces a new key and a
+# reprint of unchanged data is a plain file send. Nothing has to be invalidated; files of
+# superseded versions are only unused, and a tenant purge removes the tenant's directory.
+#   PDF_WORKERS       render processes; 0 renders inline on the event loop (benchmarks only)
+#   PDF_QUEUE_LIMIT   renders allowed to wait for a worker before we answer 503
+#   PDF_BATCH_LIMIT   most prescriptions in one daily batch file
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "pdf_cache")
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(2, os.cpu_count() or 1))))
+PDF_QUEUE_LIMIT = int(os.getenv("PDF_QUEUE_LIMIT", "64"))
+PDF_BATCH_LIMIT = int(os.getenv("PDF_BATCH_LIMIT", "500"))
+
+LAYOUT_VERSION = "1"  # bump when the layout changes: every cached file is re-rendered
+
+_executor = None
+_in_flight = 0
+_pending = {}  # cache key -> Future, so concurrent prints of one document render once
+
+
+# --- Documents (event loop side) ---
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def clinic_doc(tenant, settings) -> dict:
+    return {
+        "name": settings.clinic_name if settings and settings.clinic_name else tenant.name,
+        "address": settings.address if settings else None,
+        "phone": settings.phone if settings else None,
+        "website": settings.website if settings else None,
+    }
+
+
+def patient_doc(patient) -> dict:
+    if patient is None:
+        return {"name": "Unknown patient"}
+    return {
+        "name": patient.name, "mrn": patient.mrn, "dob": _iso(patient.dob), "gender": patient.gender,
+        "mobile": patient.mobile, "allergies": list(patient.allergies or []),
+    }
+
+
+def prescription_doc(rx, patient, doctor, tenant, settings) -> dict:
+    return {
+        "id": rx.id,
+        "date": _iso(rx.appointment.start_time if rx.appointment is not None else rx.created_at),
+        "medications": list(rx.medications or []),
+        "notes": rx.notes,
+        "patient": patient_doc(patient),
+        "doctor": doctor.username if doctor else None,
+        "clinic": clinic_doc(tenant, settings),
+    }
+
+
+def invoice_doc(inv, patient, tenant, settings) -> dict:
+    return {
+        "id": inv.id,
+        "date": _iso(inv.created_at),
+        "status": inv.status,
+        "line_items": list(inv.line_items or []),
+        "total_amount": inv.total_amount,
+        "patient": patient_doc(patient),
+        "clinic": clinic_doc(tenant, settings),
+    }
+
+
+def cache_key(kind: str, docs: list) -> str:
+    payload = json.dumps({"layout": LAYOUT_VERSION, "kind": kind, "docs": docs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _cache_path(tenant_id: str, key: str) -> str:
+    return os.path.join(PDF_CACHE_DIR, tenant_id, key[:2], f"{key}.pdf")
+
+
+# --- Rendering (worker process side) ---
+
+_PUNCTUATION = str.maketrans({"\u2013": "-", "\u2014": "-", "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"', "\u2022": "-"})
+
+
+def _text(value) -> str:
+    # Core PDF fonts are latin-1 only
+    text = str(value if value is not None else "").translate(_PUNCTUATION)
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+
+def _age(dob, on):
+    if not dob or not on:
+        return None
+    dob, on = datetime.date.fromisoformat(dob), datetime.date.fromisoformat(on[:10])
+    return on.year - dob.year - ((on.month, on.day) < (dob.month, dob.day))
+
+
+def _header(pdf, clinic, title, doc_date):
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 8, _text(clinic["name"]), new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", "", 9)
+    for line in (clinic.get("address"), " | ".join(filter(None, (clinic.get("phone"), clinic.get("website"))))):
+        if line:
+            pdf.multi_cell(0, 4.5, _text(line), new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(2)
+    pdf.line(pdf.l_margin, pdf.get_y(), pdf.w - pdf.r_margin, pdf.get_y())
+    pdf.ln(3)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(pdf.epw / 2, 7, _text(title))
+    pdf.set_font("Helvetica", "", 10)
+    pdf.cell(pdf.epw / 2, 7, _text(f"Date: {doc_date[:10] if doc_date else ''}"), align="R", new_x="LMARGIN", new_y="NEXT")
+
+
+def _patient_block(pdf, patient, doc_date):
+    age = _age(patient.get("dob"), doc_date)
+    details = [patient["name"]]
+    if patient.get("mrn"):
+        details.append(f"MRN {patient['mrn']}")
+    if age is not None or patient.get("gender"):
+        details.append(" / ".join(filter(None, (f"{age} y" if age is not None else None, patient.get("gender")))))
+    if patient.get("mobile"):
+        details.append(patient["mobile"])
+    pdf.set_font("Helvetica", "", 10)
+    pdf.multi_cell(0, 5, _text("Patient: " + "  |  ".join(details)), new_x="LMARGIN", new_y="NEXT")
+    if patient.get("allergies"):
+        pdf.set_font("Helvetica", "B", 10)
+        pdf.multi_cell(0, 5, _text("Allergies: " + ", ".join(map(str, patient["allergies"]))), new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(3)
+
+
+def _prescription_page(pdf, doc):
+    pdf.add_page()
+    _header(pdf, doc["clinic"], "Prescription", doc["date"])
+    _patient_block(pdf, doc["patient"], doc["date"])
+
+    pdf.set_font("Helvetica", "B", 20)
+    pdf.cell(0, 10, "Rx", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", "", 10)
+    with pdf.table(col_widths=(40, 20, 20, 20), line_height=6) as table:
+        table.row(("Medicine", "Dose", "Frequency", "Duration"))
+        for med in doc["medications"]:
+            med = med if isinstance(med, dict) else {"drug": med}
+            table.row(tuple(_text(med.get(field)) for field in ("drug", "dose", "freq", "duration")))
+
+    if doc.get("notes"):
+        pdf.ln(4)
+        pdf.set_font("Helvetica", "B", 10)
+        pdf.cell(0, 6, "Advice", new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("Helvetica", "", 10)
+        pdf.multi_cell(0, 5, _text(doc["notes"]), new_x="LMARGIN", new_y="NEXT")
+
+    pdf.ln(16)
+    pdf.set_font("Helvetica", "", 10)
+    pdf.cell(0, 5, _text(f"Dr. {doc['doctor']}" if doc.get("doctor") else ""), align="R", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", "", 8)
+    pdf.cell(0, 4, _text(f"Ref {doc['id']}"), align="R")
+
+
+def _invoice_page(pdf, doc):
+    pdf.add_page()
+    _header(pdf, doc["clinic"], f"Invoice #{doc['id'][:8].upper()}", doc["date"])
+    _patient_block(pdf, doc["patient"], doc["date"])
+
+    pdf.set_font("Helvetica", "", 10)
+    with pdf.table(col_widths=(75, 25), line_height=6, text_align=("LEFT", "RIGHT")) as table:
+        table.row(("Description", "Amount"))
+        for item in doc["line_items"]:
+            table.row((_text(item.get("description")), f"{float(item.get('amount') or 0):,.2f}"))
+        table.row(("Total", f"{float(doc['total_amount'] or 0):,.2f}"))
+
+    pdf.ln(4)
+    pdf.cell(0, 6, _text(f"Status: {(doc.get('status') or '').upper()}"), new_x="LMARGIN", new_y="NEXT")
+
+
+PAGE_RENDERERS = {"prescription": _prescription_page, "invoice": _invoice_page}
+
+
+def _render_file(kind: str, docs: list, path: str) -> str:
+    pdf = FPDF(format="A4")
+    pdf.set_auto_page_break(True, margin=15)
+    for doc in docs:
+        PAGE_RENDERERS[kind](pdf, doc)
+
+    # Write next to the target and rename, so readers never see a half-written file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pdf.output(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+# --- Public API ---
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _executor
+
+
+async def _render_in_pool(kind, docs, path):
+    global _in_flight
+    if PDF_WORKERS <= 0:
+        return _render_file(kind, docs, path)
+
+    if _in_flight >= PDF_WORKERS + PDF_QUEUE_LIMIT:
+        raise HTTPException(503, "PDF rendering busy, please retry", headers={"Retry-After": "2"})
+
+    _in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), _render_file, kind, docs, path)
+    except BrokenProcessPool:
+        shutdown()  # a worker died; start a fresh pool on the next render
+        raise HTTPException(503, "PDF rendering restarting, please retry", headers={"Retry-After": "2"})
+    finally:
+        _in_flight -= 1
+
+
+async def render(tenant_id: str, kind: str, docs: list):
+    """Path of the cached PDF for these documents (one page each) and its cache key."""
+    key = cache_key(kind, docs)
+    path = _cache_path(tenant_id, key)
+    if os.path.exists(path):
+        return path, key
+
+    future = _pending.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_render_in_pool(kind, docs, path))
+        _pending[key] = future
+        future.add_done_callback(lambda _: _pending.pop(key, None))
+    await asyncio.shield(future)
+    return path, key
+
+
+def drop_tenant_cache(tenant_id: str):
+    shutil.rmtree(os.path.join(PDF_CACHE_DIR, tenant_id), ignore_errors=True)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
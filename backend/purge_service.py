@@ -0,0 +1,125 @@
+import asyncio
+import datetime
+import logging
+import os
+
+from sqlalchemy import select, delete, update, text
+
+import attachment_store
+import auth_cache
+import mrn_allocator
+import pdf_service
+import stats_service
+from database import engine, SessionLocal
+from models import Tenant, TenantSettings, User, Patient, ClinicalRecord, Appointment, Attachment, Prescription, Invoice, TenantPurgeJob, TenantMrnCounter
+
+# Tenant deletion as a background job. Rows are deleted table by table in FK order, in
+# batches of PURGE_BATCH_SIZE with a commit (and a progress update on the job row) per
+# batch, so no lock is held for longer than one batch and other tenants are unaffected.
+# Jobs are resumable: deletes are idempotent and unfinished jobs are picked up again at
+# startup. A session-level advisory lock makes sure only one worker runs a given job.
+# appointments and clinical_records are hash-partitioned on tenant_id, but a partition holds
+# many tenants, so a purge still deletes rows; they all come from one partition.
+
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "1000"))
+PURGE_BATCH_PAUSE = float(os.getenv("PURGE_BATCH_PAUSE", "0.05"))  # seconds between batches
+
+# Children before parents
+PURGE_ORDER = [Attachment, Prescription, Invoice, ClinicalRecord, Appointment, Patient, User, TenantSettings]
+
+_tasks = set()
+
+
+async def enqueue_purge(db, tenant: Tenant, requested_by: str) -> TenantPurgeJob:
+    """Create (or re-arm a failed) purge job and lock the tenant's users out immediately."""
+    res = await db.execute(select(TenantPurgeJob).where(TenantPurgeJob.tenant_id == tenant.id, TenantPurgeJob.status != "done"))
+    job = res.scalars().first()
+    if job is None:
+        job = TenantPurgeJob(tenant_id=tenant.id, tenant_name=tenant.name, requested_by=requested_by, deleted={})
+        db.add(job)
+    elif job.status == "failed":
+        job.status, job.error = "pending", None
+
+    await db.execute(update(User).where(User.tenant_id == tenant.id).values(is_active=False))
+    await db.commit()
+    auth_cache.invalidate_tenant(tenant.id)
+    start(job.id)
+    return job
+
+
+def start(job_id: str):
+    task = asyncio.create_task(run_job(job_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def resume_unfinished():
+    async with SessionLocal() as db:
+        res = await db.execute(select(TenantPurgeJob.id).where(TenantPurgeJob.status.in_(["pending", "running"])))
+        for job_id in res.scalars():
+            start(job_id)
+
+
+async def run_job(job_id: str):
+    # AUTOCOMMIT so holding the lock does not keep a transaction open for the whole purge
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        key = {"k": f"tenant-purge:{job_id}"}
+        if not await lock_conn.scalar(text("SELECT pg_try_advisory_lock(hashtext(:k))"), key):
+            return  # another worker owns this job
+        try:
+            await _purge(job_id)
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext(:k))"), key)
+
+
+async def _purge(job_id: str):
+    async with SessionLocal() as db:
+        job = await db.get(TenantPurgeJob, job_id)
+        if job is None or job.status == "done":
+            return
+        tenant_id = job.tenant_id
+        job.status = "running"
+        await db.commit()
+
+        try:
+            for model in PURGE_ORDER:
+                table = model.__table__
+                while True:
+                    batch = select(table.c.id).where(table.c.tenant_id == tenant_id).limit(PURGE_BATCH_SIZE).scalar_subquery()
+                    # tenant_id on the DELETE too: it prunes appointments / clinical_records to one partition
+                    res = await db.execute(delete(table).where(table.c.tenant_id == tenant_id, table.c.id.in_(batch)))
+                    _progress(job, table.name, res.rowcount)
+                    await db.commit()
+                    if res.rowcount < PURGE_BATCH_SIZE:
+                        break
+                    await asyncio.sleep(PURGE_BATCH_PAUSE)
+
+            await stats_service.clear_tenant(db, tenant_id)
+            await db.execute(delete(TenantMrnCounter).where(TenantMrnCounter.tenant_id == tenant_id))
+            await db.execute(delete(Tenant).where(Tenant.id == tenant_id))
+            _progress(job, "tenants", 1)
+            job.status = "done"
+            job.current_table = None
+            job.finished_at = datetime.datetime.utcnow()
+            await db.commit()
+            auth_cache.invalidate_tenant(tenant_id)
+            mrn_allocator.forget_tenant(tenant_id)
+            await asyncio.to_thread(pdf_service.drop_tenant_cache, tenant_id)
+            await attachment_store.delete_tenant(tenant_id)
+        except Exception as exc:
+            logging.exception("Tenant purge %s failed", job_id)
+            await db.rollback()
+            await db.execute(
+                update(TenantPurgeJob).where(TenantPurgeJob.id == job_id)
+                .values(status="failed", error=str(exc), updated_at=datetime.datetime.utcnow())
+            )
+            await db.commit()
+
+
+def _progress(job: TenantPurgeJob, table_name: str, rows: int):
+    deleted = dict(job.deleted or {})
+    deleted[table_name] = deleted.get(table_name, 0) + max(rows, 0)
+    job.deleted = deleted  # reassign so the JSONB change is flushed
+    job.current_table = table_name
+    job.updated_at = datetime.datetime.utcnow()
@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+
+from sqlalchemy import event, text
+
+import metrics
+from database import engine, replica_engine, SessionLocal, ReplicaSessionLocal
+
+# Routing of read-only endpoints (main.get_read_db) between the primary and the optional
+# streaming replica (DATABASE_REPLICA_URL, see database.py). A read goes to the replica
+# unless one of these holds, in which case it goes to the primary:
+#
+# - Replica unhealthy: a background task probes it every DB_REPLICA_CHECK_INTERVAL seconds
+#   (requests never wait for a probe). A failed or slow probe, a dropped connection on the
+#   replica pool, or no successful probe for three intervals marks it unusable until the
+#   next good probe. pool_pre_ping still guards each checkout.
+# - Replica lagging: replay is more than DB_REPLICA_MAX_LAG seconds behind, or the lag is
+#   unknown (WAL receiver not running). Lag is the age of the last replayed transaction,
+#   or 0 when everything received has been replayed (an idle primary is not lag).
+# - Read-your-writes: the user committed a write in the last DB_READ_YOUR_WRITES_WINDOW
+#   seconds, so the page they land on after saving shows the change. Writes are seen on
+#   the primary engine's commit (any INSERT / UPDATE / DELETE / COPY in the transaction)
+#   and attributed to the user set by main.get_current_user. Like auth_cache.py this is
+#   per worker: a write handled by another worker is not seen here, so keep the window
+#   well above the usual lag rather than relying on it alone.
+#
+# Endpoints that write (including lazily filled rollups such as /stats/growth) stay on
+# get_db. Without DATABASE_REPLICA_URL every read uses the primary.
+
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "1.0"))                    # seconds of replay lag tolerated
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "2.0"))      # seconds between probes
+DB_REPLICA_CHECK_TIMEOUT = float(os.getenv("DB_REPLICA_CHECK_TIMEOUT", "1.0"))        # a slower probe counts as failed
+DB_READ_YOUR_WRITES_WINDOW = float(os.getenv("DB_READ_YOUR_WRITES_WINDOW", "10.0"))   # seconds a writer reads from the primary
+READ_YOUR_WRITES_MAX_ENTRIES = 100000
+
+LAG_SQL = text("""
+    SELECT pg_is_in_recovery(),
+           CASE WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver) THEN NULL
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+           END
+""")
+
+WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "MERGE", "COPY")
+
+ROUTED = metrics.Counter("db_read_routing_total", "Read-only sessions by target database and reason.", ("target", "reason"))
+
+
+class _ReplicaState:
+    __slots__ = ("usable", "lag", "checked_at", "warned_not_replica")
+
+    def __init__(self):
+        self.usable = False       # last probe succeeded
+        self.lag = None           # seconds, None = unknown
+        self.checked_at = 0.0     # monotonic time of the last successful probe
+        self.warned_not_replica = False
+
+
+_replica = _ReplicaState()
+_recent_writes = {}  # user_id -> monotonic time of the last committed write
+_request_user = contextvars.ContextVar("read_routing_user", default=None)
+_task = None
+
+
+# --- Routing ---
+
+def set_user(user_id: str):
+    """Attribute this request's writes to `user_id` (called by get_current_user)."""
+    _request_user.set(user_id)
+
+
+def note_write(user_id: str):
+    """Send `user_id`'s reads to the primary for the read-your-writes window."""
+    if DB_READ_YOUR_WRITES_WINDOW <= 0 or not user_id:
+        return
+    now = time.monotonic()
+    if len(_recent_writes) >= READ_YOUR_WRITES_MAX_ENTRIES:
+        for uid, at in list(_recent_writes.items()):
+            if now - at > DB_READ_YOUR_WRITES_WINDOW:
+                del _recent_writes[uid]
+        if len(_recent_writes) >= READ_YOUR_WRITES_MAX_ENTRIES:
+            _recent_writes.clear()  # everyone briefly reads from the primary, which is always correct
+    _recent_writes[user_id] = now
+
+
+def route(user_id: str):
+    """(target, reason) for a read-only session of `user_id`."""
+    if ReplicaSessionLocal is None:
+        return "primary", "no_replica"
+    wrote_at = _recent_writes.get(user_id)
+    if wrote_at is not None:
+        if time.monotonic() - wrote_at < DB_READ_YOUR_WRITES_WINDOW:
+            return "primary", "recent_write"
+        _recent_writes.pop(user_id, None)
+    if not _replica.usable or time.monotonic() - _replica.checked_at > 3 * DB_REPLICA_CHECK_INTERVAL:
+        return "primary", "replica_unhealthy"
+    if _replica.lag is None or _replica.lag > DB_REPLICA_MAX_LAG:
+        return "primary", "replica_lagging"
+    return "replica", "ok"
+
+
+def session_factory_for(user_id: str):
+    target, reason = route(user_id)
+    ROUTED.inc(target, reason)
+    return ReplicaSessionLocal if target == "replica" else SessionLocal
+
+
+# --- Write tracking (primary engine) ---
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _note_dml(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip()[:6].upper().startswith(WRITE_VERBS):
+        conn.info["read_routing_wrote"] = True
+
+
+@event.listens_for(engine.sync_engine, "commit")
+def _on_commit(conn):
+    if conn.info.pop("read_routing_wrote", False):
+        note_write(_request_user.get())
+
+
+@event.listens_for(engine.sync_engine, "rollback")
+def _on_rollback(conn):
+    conn.info.pop("read_routing_wrote", None)
+
+
+# --- Replica health ---
+
+async def check_replica():
+    """Probe the replica once and update the routing state. Returns (usable, lag)."""
+    try:
+        async with replica_engine.connect() as conn:
+            in_recovery, lag = (await asyncio.wait_for(conn.execute(LAG_SQL), DB_REPLICA_CHECK_TIMEOUT)).one()
+    except Exception as exc:
+        if _replica.usable:
+            logging.warning("Read replica unusable, reads go to the primary: %s", exc)
+        _replica.usable = False
+        return False, None
+
+    if not in_recovery and not _replica.warned_not_replica:
+        logging.warning("DATABASE_REPLICA_URL points at a server that is not in recovery (not a replica)")
+        _replica.warned_not_replica = True
+    if not _replica.usable:
+        logging.info("Read replica usable (lag %s s)", lag)
+    _replica.usable = True
+    _replica.lag = None if lag is None else float(lag)
+    _replica.checked_at = time.monotonic()
+    return True, _replica.lag
+
+
+async def _health_loop():
+    while True:
+        await check_replica()
+        await asyncio.sleep(DB_REPLICA_CHECK_INTERVAL)
+
+
+def start_health_checks():
+    global _task
+    if replica_engine is not None and _task is None:
+        _task = asyncio.create_task(_health_loop())
+
+
+def stop_health_checks():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
+
+
+if replica_engine is not None:
+    @event.listens_for(replica_engine.sync_engine, "handle_error")
+    def _replica_error(context):
+        # Stop routing to a replica that dropped a connection; the next good probe restores it
+        if context.is_disconnect and _replica.usable:
+            logging.warning("Read replica connection lost, reads go to the primary")
+            _replica.usable = False
+
+    metrics.Gauge("db_replica_lag_seconds", "Replay lag of the read replica at the last probe (-1 = unknown / unusable).",
+                  collect=lambda: _replica.lag if _replica.usable and _replica.lag is not None else -1)
@@ -0,0 +1,189 @@
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+import uuid
+
+# Non-blocking structured logging. Application code logs as usual; the QueueHandler on the
+# root logger only attaches request context and puts the record on an in-memory queue, and a
+# QueueListener thread does the message formatting, JSON encoding and file writes. The queue
+# is bounded and full-queue records are dropped (and counted), so a slow or stalled log
+# volume can never block the event loop.
+#
+# Every line carries request_id / tenant_id / route. A pure ASGI middleware assigns the
+# request id (honouring an incoming X-Request-ID), times the request and writes one access
+# line per request. Per-route sampling (LOG_SAMPLE_RATES) applies to the access line and to
+# INFO/DEBUG records inside the request; warnings, errors, 5xx and slow requests always pass.
+
+LOG_FILE = os.getenv("LOG_FILE", "backend_debug.log")  # "-" = stderr
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_DEFAULT = float(os.getenv("LOG_SAMPLE_DEFAULT", "1.0"))
+LOG_SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", "1000"))  # always log requests slower than this
+
+# Route template -> fraction of requests logged, e.g. "/ping-check=0,/users/me=0.05"
+LOG_SAMPLE_RATES = {
+    route.strip(): float(rate)
+    for route, _, rate in (item.partition("=") for item in os.getenv("LOG_SAMPLE_RATES", "").split(",") if "=" in item)
+}
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+access_logger = logging.getLogger("access")
+
+# Mutable per-request dict: tenant_id is filled in later by get_current_user, and a dict
+# shared by reference stays visible to the middleware whatever context copies happen below.
+_request_ctx = contextvars.ContextVar("request_ctx", default=None)
+
+_listener = None
+dropped_records = 0
+
+
+def route_of(scope) -> str:
+    # FastAPI puts the matched APIRoute in the scope; its template keeps cardinality low
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "")
+
+
+def _sample_rate(route: str) -> float:
+    return LOG_SAMPLE_RATES.get(route, LOG_SAMPLE_DEFAULT)
+
+
+def _is_sampled(ctx) -> bool:
+    if ctx["sampled"] is None:
+        ctx["sampled"] = random.random() < _sample_rate(route_of(ctx["scope"]))
+    return ctx["sampled"]
+
+
+def set_tenant(tenant_id: str):
+    ctx = _request_ctx.get()
+    if ctx is not None:
+        ctx["tenant_id"] = tenant_id
+
+
+def current_tenant():
+    ctx = _request_ctx.get()
+    return ctx["tenant_id"] if ctx else None
+
+
+def current_request_id():
+    ctx = _request_ctx.get()
+    return ctx["request_id"] if ctx else None
+
+
+# --- Handlers ---
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Runs on the calling thread: attach request context, sample, enqueue. No formatting."""
+
+    def prepare(self, record):
+        # The stock prepare() formats the message here; leave msg/args for the listener
+        ctx = _request_ctx.get()
+        if ctx is not None:
+            record.request_id = ctx["request_id"]
+            record.tenant_id = ctx["tenant_id"]
+            record.route = route_of(ctx["scope"])
+        return record
+
+    def handle(self, record):
+        ctx = _request_ctx.get()
+        if ctx is not None and record.levelno < logging.WARNING and record.name != access_logger.name and not _is_sampled(ctx):
+            return False
+        return super().handle(record)
+
+    def enqueue(self, record):
+        global dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Runs on the listener thread."""
+
+    FIELDS = ("request_id", "tenant_id", "route", "method", "status", "duration_ms")
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """Route all logging through the queue. Idempotent; call once at import of the app."""
+    global _listener
+    if _listener is not None:
+        return
+    target = logging.StreamHandler() if LOG_FILE == "-" else logging.FileHandler(LOG_FILE)
+    target.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(ContextQueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, target, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush what is queued and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# --- Middleware ---
+
+class RequestLoggingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(REQUEST_ID_HEADER.lower().encode(), b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        ctx = {"request_id": request_id, "tenant_id": None, "scope": scope, "sampled": None}
+        token = _request_ctx.set(ctx)
+        status_code = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(REQUEST_ID_HEADER.encode(), request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = round((time.perf_counter() - t0) * 1000, 2)
+            if status_code >= 500 or duration_ms >= LOG_SLOW_REQUEST_MS or _is_sampled(ctx):
+                access_logger.info(
+                    "%s %s %s", scope["method"], route_of(scope), status_code,
+                    extra={"method": scope["method"], "status": status_code, "duration_ms": duration_ms},
+                )
+            _request_ctx.reset(token)
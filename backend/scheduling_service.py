@@ -0,0 +1,70 @@
+import datetime
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+# Doctor availability / double-booking. Overlaps are prevented by the database itself:
+# migrations/r0006_scheduling_constraint.py adds an exclusion constraint
+#     EXCLUDE USING gist (doctor_id WITH =, tsrange(start_time, end_time, '[)') WITH &&)
+#     WHERE (status <> 'cancelled')
+# so two concurrent bookings of the same slot cannot both commit, and its GiST index
+# answers the "is this doctor busy in [a, b)" probes used for free-slot search below.
+# Since appointments are partitioned by tenant (r0011) the constraint and the probes also
+# carry tenant_id.
+#
+# start_time is `timestamp without time zone`: naive times are stored as sent, and aware
+# ones (the frontend sends UTC ISO strings) are converted to the database session TimeZone.
+# "Now" for hiding past slots is therefore LOCALTIMESTAMP, the same clock, not the app
+# server's utcnow().
+
+OVERLAP_CONSTRAINT = "ex_appointments_doctor_overlap"
+DEFAULT_SLOT_MINUTES = 30
+
+# Candidate slots per doctor per day within working hours, minus anything overlapping a
+# non-cancelled appointment. One round-trip for any number of doctors and days.
+FREE_SLOTS_SQL = text("""
+    SELECT d.id AS doctor_id, s AS slot_start, s + make_interval(mins => :slot) AS slot_end
+    FROM users d
+    CROSS JOIN generate_series(CAST(:start_date AS timestamp), CAST(:end_date AS timestamp), interval '1 day') AS day
+    CROSS JOIN LATERAL generate_series(
+        CAST(day AS date) + CAST(:day_start AS time),
+        CAST(day AS date) + CAST(:day_end AS time) - make_interval(mins => :slot),
+        make_interval(mins => :slot)
+    ) AS s
+    WHERE d.id = ANY(CAST(:doctor_ids AS varchar[]))
+      AND d.tenant_id = :tenant_id
+      AND s >= COALESCE(CAST(:not_before AS timestamp), LOCALTIMESTAMP)
+      AND NOT EXISTS (
+          SELECT 1 FROM appointments a
+          WHERE a.tenant_id = :tenant_id
+            AND a.doctor_id = d.id
+            AND a.status <> 'cancelled'
+            AND tsrange(a.start_time, a.end_time, '[)') && tsrange(s, s + make_interval(mins => :slot), '[)')
+      )
+    ORDER BY d.id, s
+""")
+
+
+def is_overlap_violation(exc: IntegrityError) -> bool:
+    # psycopg raises ExclusionViolation (SQLSTATE 23P01) naming the constraint
+    return getattr(exc.orig, "sqlstate", None) == "23P01" or OVERLAP_CONSTRAINT in str(exc.orig)
+
+
+async def free_slots(db, tenant_id: str, doctor_ids, start_date: datetime.date, end_date: datetime.date,
+                     slot_minutes: int = DEFAULT_SLOT_MINUTES, day_start: datetime.time = datetime.time(9, 0),
+                     day_end: datetime.time = datetime.time(17, 0), not_before: datetime.datetime = None):
+    """Free slots per doctor id; slots before `not_before` (default: now, database clock) are left out."""
+    res = await db.execute(FREE_SLOTS_SQL, {
+        "tenant_id": tenant_id,
+        "doctor_ids": list(doctor_ids),
+        "start_date": start_date,
+        "end_date": end_date,
+        "slot": slot_minutes,
+        "day_start": day_start,
+        "day_end": day_end,
+        "not_before": not_before,
+    })
+    slots = {doctor_id: [] for doctor_id in doctor_ids}
+    for row in res:
+        slots[row.doctor_id].append({"start": row.slot_start, "end": row.slot_end})
+    return slots
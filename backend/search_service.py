@@ -0,0 +1,93 @@
+import re
+
+from sqlalchemy import select, func, or_, case, desc, text
+
+from models import Patient
+
+# Patient search for the front desk. Every query is tenant-scoped and index-backed
+# (see migrations/r0003_search_indexes.py for the indexes this relies on):
+#   1. exact MRN          -> (tenant_id, mrn)
+#   2. exact mobile       -> (tenant_id, mobile)
+#   3. short prefix (<3)  -> (tenant_id, lower(name) text_pattern_ops), (tenant_id, mrn text_pattern_ops)
+#   4. substring / fuzzy  -> GIN (tenant_id, name gin_trgm_ops), GIN (tenant_id, mrn gin_trgm_ops)
+# Results of 4 are ranked: exact > prefix > trigram similarity. A 1-2 character prefix
+# matches thousands of rows in a large clinic and similarity means nothing at that length,
+# so 3 returns name matches, then MRN matches, each in index order (~<~ is the order of
+# text_pattern_ops, whatever the collation): the scan stops after skip + limit rows
+# instead of fetching and sorting every match.
+
+MRN_PATTERN = re.compile(r"^PT-[A-Z0-9]+$")
+MOBILE_PATTERN = re.compile(r"^\+?[\d\s\-()]{6,}$")
+MIN_TRIGRAM_LENGTH = 3  # pg_trgm cannot use the index for shorter needles
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+TYPEAHEAD_COLUMNS = (Patient.id, Patient.name, Patient.mrn)
+
+
+def _base_query(tenant_id: str, columns):
+    return select(*columns).where(Patient.tenant_id == tenant_id)
+
+
+async def _fetch(db, stmt):
+    res = await db.execute(stmt)
+    return res.all()
+
+
+async def search_patients(db, tenant_id: str, q: str, limit: int = 20, skip: int = 0, typeahead: bool = False, columns=None):
+    """Rows of `columns` (default: every patient column; id / name / MRN for typeahead)."""
+    term = q.strip()
+    if not term:
+        return []
+    columns = TYPEAHEAD_COLUMNS if typeahead else (columns or tuple(Patient.__table__.columns))
+
+    # 1. MRN fast path
+    upper = term.upper()
+    if MRN_PATTERN.match(upper):
+        rows = await _fetch(db, _base_query(tenant_id, columns).where(Patient.mrn == upper).offset(skip).limit(limit))
+        if rows:
+            return rows
+
+    # 2. Mobile fast path (stored as typed, so try the raw input and the bare digits)
+    if MOBILE_PATTERN.match(term):
+        digits = re.sub(r"\D", "", term)
+        stmt = _base_query(tenant_id, columns).where(Patient.mobile.in_({term, digits}))
+        rows = await _fetch(db, stmt.order_by(Patient.name, Patient.id).offset(skip).limit(limit))
+        if rows:
+            return rows
+
+    lowered = term.lower()
+    name_prefix = _escape_like(lowered) + "%"
+    mrn_prefix = _escape_like(upper) + "%"
+    lower_name = func.lower(Patient.name)
+
+    # 3. Short prefix: names first, then MRNs, both read in index order
+    if len(term) < MIN_TRIGRAM_LENGTH:
+        names_match = lower_name.like(name_prefix, escape="\\")
+        stmt = _base_query(tenant_id, columns).where(names_match)
+        rows = await _fetch(db, stmt.order_by(text("lower(patients.name) USING ~<~"), Patient.id).limit(skip + limit))
+        if len(rows) < skip + limit:
+            stmt = _base_query(tenant_id, columns).where(Patient.mrn.like(mrn_prefix, escape="\\"), ~names_match)
+            rows += await _fetch(db, stmt.order_by(text("patients.mrn USING ~<~")).limit(skip + limit - len(rows)))
+        return rows[skip:]
+
+    # 4. Ranked substring / fuzzy match
+    contains = "%" + _escape_like(term) + "%"
+    match = or_(Patient.name.ilike(contains, escape="\\"), Patient.mrn.ilike(contains, escape="\\"))
+    rank = case(
+        (Patient.mrn == upper, 0),
+        (lower_name == lowered, 1),
+        (lower_name.like(name_prefix, escape="\\"), 2),
+        else_=3,
+    )
+    stmt = (
+        _base_query(tenant_id, columns)
+        .where(match)
+        .order_by(rank, desc(func.similarity(Patient.name, term)), Patient.name, Patient.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return await _fetch(db, stmt)
@@ -0,0 +1,159 @@
+import asyncio
+import datetime
+import logging
+import os
+
+from sqlalchemy import select, delete, func, text, literal
+from sqlalchemy.dialects.postgresql import insert
+
+from database import engine, SessionLocal
+from models import Tenant, TenantStats, TenantDailyAppointments, Patient, User, Appointment
+
+# Dashboard counters. Write endpoints bump per-tenant rollup rows inside their own
+# transaction (create_patient, add_user, schedule_appointment, ...), so /stats/overview is
+# a primary-key lookup instead of count(*) scans. A periodic reconciliation recomputes the
+# rollups from the source tables to absorb drift from scripts / manual SQL.
+# There is deliberately no single platform-wide row: every write in every tenant would
+# contend on it. The super-admin view sums the per-tenant rows (one row per clinic).
+
+STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "3600"))  # seconds, 0 disables
+STATS_RECONCILE_DAYS_BACK = 7
+STATS_RECONCILE_DAYS_AHEAD = 60
+
+_task = None
+
+
+async def bump(db, tenant_id: str, patients: int = 0, users: int = 0, admins: int = 0):
+    """Add deltas to a tenant's counters in the caller's transaction (db: session or connection)."""
+    stmt = insert(TenantStats).values(tenant_id=tenant_id, patients=patients, users=users, admins=admins, updated_at=datetime.datetime.utcnow())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TenantStats.tenant_id],
+        set_={
+            "patients": TenantStats.patients + patients,
+            "users": TenantStats.users + users,
+            "admins": TenantStats.admins + admins,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def bump_appointments(db, tenant_id: str, day: datetime.date, delta: int = 1):
+    stmt = insert(TenantDailyAppointments).values(tenant_id=tenant_id, day=day, appointments=delta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TenantDailyAppointments.tenant_id, TenantDailyAppointments.day],
+        set_={"appointments": TenantDailyAppointments.appointments + delta},
+    )
+    await db.execute(stmt)
+
+
+async def clear_tenant(db, tenant_id: str):
+    await db.execute(delete(TenantStats).where(TenantStats.tenant_id == tenant_id))
+    await db.execute(delete(TenantDailyAppointments).where(TenantDailyAppointments.tenant_id == tenant_id))
+
+
+# --- Reads ---
+
+async def tenant_overview(db, tenant_id: str, today: datetime.date):
+    res = await db.execute(
+        select(TenantStats.patients, TenantStats.users, TenantDailyAppointments.appointments)
+        .select_from(TenantStats)
+        .outerjoin(TenantDailyAppointments, (TenantDailyAppointments.tenant_id == TenantStats.tenant_id) & (TenantDailyAppointments.day == today))
+        .where(TenantStats.tenant_id == tenant_id)
+    )
+    row = res.first()
+    if row is None:
+        return 0, 0, 0
+    return row.patients, row.users, row.appointments or 0
+
+
+async def platform_overview(db):
+    clinic = Tenant.is_super_admin == False
+    res = await db.execute(
+        select(
+            func.count(Tenant.id).filter(clinic),
+            func.coalesce(func.sum(TenantStats.patients), 0),
+            func.coalesce(func.sum(TenantStats.admins).filter(clinic), 0),
+        ).select_from(Tenant).outerjoin(TenantStats, TenantStats.tenant_id == Tenant.id)
+    )
+    return res.one()
+
+
+# --- Reconciliation ---
+
+async def reconcile_tenant(db, tenant_id: str, today: datetime.date):
+    # Lock the rollup row first: concurrent bumps wait for us, and the counts below (new
+    # snapshot per statement under READ COMMITTED) include every bump committed before.
+    await db.execute(select(TenantStats.tenant_id).where(TenantStats.tenant_id == tenant_id).with_for_update())
+    patients = select(func.count(Patient.id)).where(Patient.tenant_id == tenant_id).scalar_subquery()
+    users = select(func.count(User.id)).where(User.tenant_id == tenant_id).scalar_subquery()
+    admins = select(func.count(User.id)).where(User.tenant_id == tenant_id, User.roles.contains(["admin"])).scalar_subquery()
+    stmt = insert(TenantStats).from_select(
+        ["tenant_id", "patients", "users", "admins", "updated_at"],
+        select(literal(tenant_id), patients, users, admins, func.now()),
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[TenantStats.tenant_id],
+        set_={"patients": stmt.excluded.patients, "users": stmt.excluded.users, "admins": stmt.excluded.admins, "updated_at": stmt.excluded.updated_at},
+    ))
+
+    # Daily appointment counts for a window around today (older days never change on the dashboard)
+    start = today - datetime.timedelta(days=STATS_RECONCILE_DAYS_BACK)
+    end = today + datetime.timedelta(days=STATS_RECONCILE_DAYS_AHEAD)
+    await db.execute(delete(TenantDailyAppointments).where(
+        TenantDailyAppointments.tenant_id == tenant_id, TenantDailyAppointments.day >= start, TenantDailyAppointments.day < end,
+    ))
+    day = func.date(Appointment.start_time)
+    await db.execute(insert(TenantDailyAppointments).from_select(
+        ["tenant_id", "day", "appointments"],
+        select(literal(tenant_id), day, func.count()).where(
+            Appointment.tenant_id == tenant_id, Appointment.start_time >= start, Appointment.start_time < end,
+        ).group_by(day),
+    ))
+
+
+async def reconcile_all():
+    today = datetime.date.today()
+    # Session-level advisory lock on an AUTOCOMMIT connection: only one worker reconciles,
+    # without holding a transaction open for the whole pass
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        if not await lock_conn.scalar(text("SELECT pg_try_advisory_lock(hashtext('stats-reconcile'))")):
+            return
+        try:
+            async with SessionLocal() as db:
+                tenant_ids = (await db.execute(select(Tenant.id))).scalars().all()
+            for tenant_id in tenant_ids:
+                # One short transaction per tenant
+                async with SessionLocal() as db:
+                    await reconcile_tenant(db, tenant_id, today)
+                    await db.commit()
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext('stats-reconcile'))"))
+
+
+async def _reconcile_loop():
+    # Fill the rollups right away on a fresh install, otherwise wait for the first interval
+    async with SessionLocal() as db:
+        seeded = await db.scalar(select(TenantStats.tenant_id).limit(1)) is not None
+    if seeded:
+        await asyncio.sleep(STATS_RECONCILE_INTERVAL)
+    while True:
+        try:
+            await reconcile_all()
+        except Exception:
+            logging.exception("Stats reconciliation failed")
+        await asyncio.sleep(STATS_RECONCILE_INTERVAL)
+
+
+def start_reconciler():
+    global _task
+    if STATS_RECONCILE_INTERVAL > 0 and _task is None:
+        _task = asyncio.create_task(_reconcile_loop())
+
+
+def stop_reconciler():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
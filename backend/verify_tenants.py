@@ -1,11 +1,11 @@
-import requests
+import httpx
 
 BASE_URL = "http://localhost:8000"
 
 def verify():
     # 1. Login
     print("🔑 Logging in as Admin...")
-    resp = requests.post(f"{BASE_URL}/auth/token", data={"username": "admin", "password": "admin"})
+    resp = httpx.post(f"{BASE_URL}/token", data={"username": "admin", "password": "admin"})
     if resp.status_code != 200:
         print(f"❌ Login Failed: {resp.text}")
         return
@@ -15,7 +15,8 @@ def verify():
 
     # 2. List Tenants (Should find HQ)
     print("\n📋 Listing Tenants...")
-    resp = requests.get(f"{BASE_URL}/tenants", headers=headers)
+    resp = httpx.get(f"{BASE_URL}/tenants", headers=headers)
+    tenants = []
     if resp.status_code == 200:
         tenants = resp.json()
         print(f"✅ Found {len(tenants)} tenants.")
@@ -26,12 +27,13 @@ def verify():
 
     # 3. Create Tenant
     print("\n⚡ Creating 'Apollo Clinic'...")
-    new_tenant = {"name": "Apollo Clinic", "domain": "apollo"}
-    resp = requests.post(f"{BASE_URL}/tenants", json=new_tenant, headers=headers)
+    if any(t["name"] == "Apollo Clinic" for t in tenants):
+        print("⚠️  Tenant already exists (Skipping creation).")
+        return
+    new_tenant = {"name": "Apollo Clinic", "admin_username": "apollo-admin", "admin_password": "apollo-admin"}
+    resp = httpx.post(f"{BASE_URL}/tenants", json=new_tenant, headers=headers)
     if resp.status_code == 200:
         print("✅ Tenant Created!")
-    elif resp.status_code == 400 and "already exists" in resp.text:
-       print("⚠️  Tenant already exists (Skipping creation).")
     else:
         print(f"❌ Create Failed: {resp.text}")
 
@@ -0,0 +1,215 @@
+import datetime
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from models import ClinicalRecord
+
+# Server-side vitals time series. Vitals are ClinicalRecord rows (type "Vitals"/"vitals")
+# with a free-form JSONB `data` blob, e.g. {"bp": "120/80", "hr": 72, "temp": "98.6 F"}.
+# Numeric fields are extracted, bucketed with NumPy (min/max/mean/last) and downsampled
+# with LTTB so a chart never receives more than `points` points.
+# "a/b" readings are split into <field>_systolic / <field>_diastolic.
+
+VITALS_TYPES = ("Vitals", "vitals")
+BUCKETS = {
+    "raw": None,
+    "hour": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+}
+VITALS_CACHE_TTL = float(os.getenv("VITALS_CACHE_TTL", "30"))  # also bounds staleness after another worker's writes
+VITALS_CACHE_MAX_ENTRIES = int(os.getenv("VITALS_CACHE_MAX_ENTRIES", "2000"))
+
+_NUMBER = re.compile(r"^\s*(-?\d+(?:\.\d+)?)")
+_RATIO = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)")
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+# --- Extraction ---
+
+def _numeric(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        m = _NUMBER.match(value)
+        if m:
+            return float(m.group(1))
+    return None
+
+
+def extract_numeric(data) -> dict:
+    out = {}
+    if not isinstance(data, dict):
+        return out
+    for key, value in data.items():
+        if isinstance(value, str):
+            m = _RATIO.match(value)
+            if m:
+                out[f"{key}_systolic"] = float(m.group(1))
+                out[f"{key}_diastolic"] = float(m.group(2))
+                continue
+        number = _numeric(value)
+        if number is not None:
+            out[key] = number
+    return out
+
+
+def _timestamp(dt: datetime.datetime) -> float:
+    return (dt - _EPOCH).total_seconds() if dt.tzinfo is None else dt.timestamp()
+
+
+def _to_arrays(samples):
+    """[(datetime, value)] sorted by time -> (float64 seconds, float64 values)."""
+    if not samples:
+        return np.empty(0), np.empty(0)
+    ts = np.fromiter((_timestamp(t) for t, _ in samples), dtype=np.float64, count=len(samples))
+    vals = np.fromiter((v for _, v in samples), dtype=np.float64, count=len(samples))
+    return ts, vals
+
+
+# --- Aggregation ---
+
+def aggregate(ts: np.ndarray, vals: np.ndarray, bucket_seconds):
+    """Bucket a time-sorted series. Returns dict of equally sized arrays (t = bucket start)."""
+    if ts.size == 0:
+        empty = np.empty(0)
+        return {"t": empty, "min": empty, "max": empty, "mean": empty, "last": empty, "count": empty}
+    if bucket_seconds is None:
+        return {"t": ts, "min": vals, "max": vals, "mean": vals, "last": vals, "count": np.ones_like(vals)}
+
+    bucket_ids = np.floor(ts / bucket_seconds).astype(np.int64)
+    boundaries = np.flatnonzero(np.diff(bucket_ids)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [ts.size]))
+    counts = (ends - starts).astype(np.float64)
+    return {
+        "t": bucket_ids[starts].astype(np.float64) * bucket_seconds,
+        "min": np.minimum.reduceat(vals, starts),
+        "max": np.maximum.reduceat(vals, starts),
+        "mean": np.add.reduceat(vals, starts) / counts,
+        "last": vals[ends - 1],
+        "count": counts,
+    }
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that preserve the visual shape."""
+    n = x.size
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = edges[i + 1], (edges[i + 2] if i + 2 < edges.size else n)
+        avg_x = x[nxt_lo:nxt_hi].mean() if nxt_hi > nxt_lo else x[n - 1]
+        avg_y = y[nxt_lo:nxt_hi].mean() if nxt_hi > nxt_lo else y[n - 1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area)) if hi > lo else lo
+        selected[i + 1] = a
+    return np.unique(selected)
+
+
+def build_series(samples, bucket: str, points: int) -> dict:
+    ts, vals = _to_arrays(samples)
+    agg = aggregate(ts, vals, BUCKETS[bucket])
+    keep = lttb_indices(agg["t"], agg["mean"], points)
+    return {
+        "t": [datetime.datetime.utcfromtimestamp(t).isoformat() for t in agg["t"][keep]],
+        "min": agg["min"][keep].round(2).tolist(),
+        "max": agg["max"][keep].round(2).tolist(),
+        "mean": agg["mean"][keep].round(2).tolist(),
+        "last": agg["last"][keep].round(2).tolist(),
+        "count": agg["count"][keep].astype(int).tolist(),
+    }
+
+
+# --- Cache (per patient / per tenant) ---
+# Keys always start with the tenant, so a patient id from another tenant can never hit an
+# entry. The cache is per worker: add_clinical_record and record imports drop this
+# worker's entries, other workers see the change when theirs expire (VITALS_CACHE_TTL).
+
+_cache = OrderedDict()  # (scope, tenant_id, patient_id or None, params) -> (expires_at, result)
+
+
+def _cache_get(key):
+    entry = _cache.get(key)
+    if entry is None or entry[0] < time.monotonic():
+        _cache.pop(key, None)
+        return None
+    _cache.move_to_end(key)
+    return entry[1]
+
+
+def _cache_put(key, value):
+    _cache[key] = (time.monotonic() + VITALS_CACHE_TTL, value)
+    while len(_cache) > VITALS_CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+
+def invalidate(tenant_id: str, patient_id: Optional[str] = None):
+    """Drop the tenant's cohort series and one patient's series (every patient's without `patient_id`)."""
+    for key in [k for k in _cache if k[1] == tenant_id and (k[0] == "cohort" or patient_id is None or k[2] == patient_id)]:
+        _cache.pop(key, None)
+
+
+# --- Queries ---
+
+def _base_query(columns, tenant_id, start, end):
+    query = select(*columns).where(ClinicalRecord.tenant_id == tenant_id, ClinicalRecord.type.in_(VITALS_TYPES))
+    if start: query = query.where(ClinicalRecord.date >= start)
+    if end: query = query.where(ClinicalRecord.date < end)
+    return query.order_by(ClinicalRecord.date)
+
+
+async def patient_series(db, tenant_id: str, patient_id: str, fields, bucket: str, points: int, start=None, end=None):
+    key = ("patient", tenant_id, patient_id, (tuple(fields or ()), bucket, points, start, end))
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    query = _base_query((ClinicalRecord.date, ClinicalRecord.data), tenant_id, start, end)
+    res = await db.execute(query.where(ClinicalRecord.patient_id == patient_id))
+
+    samples = {}
+    for date, data in res:
+        for field, value in extract_numeric(data).items():
+            if not fields or field in fields:
+                samples.setdefault(field, []).append((date, value))
+
+    result = {field: build_series(s, bucket, points) for field, s in sorted(samples.items())}
+    _cache_put(key, result)
+    return result
+
+
+async def cohort_series(db, tenant_id: str, field: str, bucket: str, points: int, start=None, end=None):
+    key = ("cohort", tenant_id, None, (field, bucket, points, start, end))
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    # Only ship the one JSONB key we need (blood pressure is stored as "sys/dia" under the base key)
+    base_key = re.sub(r"_(systolic|diastolic)$", "", field)
+    query = _base_query((ClinicalRecord.date, ClinicalRecord.data[base_key]), tenant_id, start, end)
+    res = await db.execute(query.where(ClinicalRecord.data.has_key(base_key)))
+
+    samples = []
+    for date, value in res:
+        number = extract_numeric({base_key: value}).get(field)
+        if number is not None:
+            samples.append((date, number))
+
+    result = build_series(samples, bucket, points)
+    _cache_put(key, result)
+    return result
@@ -43,6 +43,19 @@ interface PatientProfile {
     clinical_records: ClinicalRecord[]
     appointments: Appointment[]
     attachments: Attachment[]
+    counts?: { clinical_records: number, appointments: number, attachments: number }
+    clinical_records_next_cursor?: string | null
+    appointments_next_cursor?: string | null
+    attachments_next_cursor?: string | null
+}
+
+type Section = "clinical_records" | "appointments" | "attachments"
+
+// The profile carries the latest items of each section; older ones are paged from these endpoints
+const SECTION_PATHS: Record<Section, string> = {
+    clinical_records: "records",
+    appointments: "appointments",
+    attachments: "attachments",
 }
 
 export default function PatientProfile() {
@@ -54,6 +67,7 @@ export default function PatientProfile() {
     const [uploadOpen, setUploadOpen] = useState(false)
     const [fileName, setFileName] = useState("")
     const [fileType, setFileType] = useState("pdf") // Simple select
+    const [file, setFile] = useState<File | null>(null)
 
     const [currentUser, setCurrentUser] = useState<any>(null)
 
@@ -86,20 +100,56 @@ export default function PatientProfile() {
         }
     }
 
-    const handleUpload = async () => {
+    const loadMore = async (section: Section) => {
+        const cursorKey = `${section}_next_cursor` as const
+        const cursor = patient?.[cursorKey]
+        if (!patient || !cursor) return
         try {
             const token = localStorage.getItem("token")
-            await axios.post(`http://127.0.0.1:8000/patients/${id}/attachments`, null, {
-                params: { file_name: fileName, file_type: fileType },
+            const res = await axios.get(`http://127.0.0.1:8000/patients/${id}/${SECTION_PATHS[section]}`, {
+                params: { cursor, limit: 50 },
                 headers: { Authorization: `Bearer ${token}` }
             })
+            setPatient(prev => prev && ({
+                ...prev,
+                [section]: [...(prev[section] as any[]), ...res.data],
+                [cursorKey]: res.headers["x-next-cursor"] ?? null,
+            }))
+        } catch (err) {
+            alert("Failed to load more")
+        }
+    }
+
+    const handleUpload = async () => {
+        if (!file) return alert("Choose a file first")
+        try {
+            const token = localStorage.getItem("token")
+            // Raw body (not multipart): the backend streams it straight to storage
+            await axios.post(`http://127.0.0.1:8000/patients/${id}/attachments`, file, {
+                params: { file_name: fileName || file.name, file_type: fileType },
+                headers: { Authorization: `Bearer ${token}`, "Content-Type": file.type || "application/octet-stream" }
+            })
             setUploadOpen(false)
+            setFile(null)
             fetchProfile()
         } catch (err) {
             alert("Upload failed")
         }
     }
 
+    const openAttachment = async (attachmentId: string) => {
+        try {
+            const token = localStorage.getItem("token")
+            const res = await axios.get(`http://127.0.0.1:8000/attachments/${attachmentId}/content`, {
+                headers: { Authorization: `Bearer ${token}` },
+                responseType: 'blob'
+            })
+            window.open(window.URL.createObjectURL(res.data), "_blank")
+        } catch (err) {
+            alert("Failed to open file")
+        }
+    }
+
     if (loading) return <div className="p-8">Loading profile...</div>
     if (!patient) return <div className="p-8">Patient not found</div>
 
@@ -142,7 +192,7 @@ export default function PatientProfile() {
                 <Tabs defaultValue="timeline" className="w-full">
                     <TabsList>
                         <TabsTrigger value="timeline">Clinical Timeline</TabsTrigger>
-                        <TabsTrigger value="attachments">Attachments ({patient.attachments?.length || 0})</TabsTrigger>
+                        <TabsTrigger value="attachments">Attachments ({patient.counts?.attachments ?? patient.attachments?.length ?? 0})</TabsTrigger>
                         <TabsTrigger value="info">Demographics</TabsTrigger>
                     </TabsList>
 
@@ -200,6 +250,19 @@ export default function PatientProfile() {
                                 ))}
 
                                 {(patient.appointments?.length === 0 && patient.clinical_records?.length === 0) && <p className="text-zinc-500 italic">No history.</p>}
+
+                                <div className="flex gap-2">
+                                    {patient.clinical_records_next_cursor && (
+                                        <Button variant="outline" size="sm" onClick={() => loadMore("clinical_records")}>
+                                            <Clock className="h-4 w-4 mr-2" /> Older records ({patient.clinical_records.length} of {patient.counts?.clinical_records})
+                                        </Button>
+                                    )}
+                                    {patient.appointments_next_cursor && (
+                                        <Button variant="outline" size="sm" onClick={() => loadMore("appointments")}>
+                                            <Clock className="h-4 w-4 mr-2" /> Older visits ({patient.appointments.length} of {patient.counts?.appointments})
+                                        </Button>
+                                    )}
+                                </div>
                             </div>
                         </TabsContent>
                     ) : (
@@ -222,6 +285,10 @@ export default function PatientProfile() {
                                         <DialogTitle>Upload Document</DialogTitle>
                                     </DialogHeader>
                                     <div className="space-y-4 py-2">
+                                        <div className="grid gap-2">
+                                            <Label>File</Label>
+                                            <Input type="file" onChange={e => setFile(e.target.files?.[0] ?? null)} />
+                                        </div>
                                         <div className="grid gap-2">
                                             <Label>File Name</Label>
                                             <Input value={fileName} onChange={e => setFileName(e.target.value)} placeholder="e.g. Lab Report 001" />
@@ -243,7 +310,7 @@ export default function PatientProfile() {
 
                         <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
                             {patient.attachments?.map(file => (
-                                <Card key={file.id} className="hover:bg-zinc-50 cursor-pointer">
+                                <Card key={file.id} className="hover:bg-zinc-50 cursor-pointer" onClick={() => openAttachment(file.id)}>
                                     <CardContent className="p-4 flex flex-col items-center text-center gap-2">
                                         <div className="bg-orange-100 text-orange-600 p-3 rounded-full">
                                             <Paperclip className="h-6 w-6" />
@@ -255,6 +322,11 @@ export default function PatientProfile() {
                             ))}
                             {patient.attachments?.length === 0 && <p className="col-span-4 text-center text-zinc-400 py-8">No files uploaded.</p>}
                         </div>
+                        {patient.attachments_next_cursor && (
+                            <div className="flex justify-center mt-4">
+                                <Button variant="outline" size="sm" onClick={() => loadMore("attachments")}>Load more files</Button>
+                            </div>
+                        )}
                     </TabsContent>
                 </Tabs>
             </div>